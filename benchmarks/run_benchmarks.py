@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+Time every pipeline stage and the planner's hot functions, offline.
+
+Usage:
+    python3 benchmarks/run_benchmarks.py                          # real data + synth-400
+    python3 benchmarks/run_benchmarks.py --dataset synth-10000 --repeat 3 --skip-render
+    python3 benchmarks/run_benchmarks.py --save-baseline          # store benchmarks/baseline.json
+    python3 benchmarks/run_benchmarks.py --compare                # exit 1 on regressions
+
+Datasets (`--dataset`, repeatable):
+    real       the raw xlsx/docx/bus inputs, built with build_bus_routes,
+               build_lodging and build_tournament
+    synth-N    N squads from `scripts/synth_event.py` (schools, halls and
+               routes scale with N, fixed seed)
+
+Each dataset is built in its own temp directory: the scripts' path constants
+are pointed there for the run, so `data/build` and `output/` are left alone.
+The stages are the ones in `pipeline.py` (with `synth_event` in place of the
+three raw builds), timed once each. On the finished `event_planner.db` the
+hot functions (`load_lookup_data`, `list_trips`, `find_multi_leg_trip`,
+`plan_game_travel`, `render_pdf`), the per-squad and per-game lookups the
+planner and renderer run against the views (kind "query", see ACCESS_PATHS)
+and full reads of the expensive views are timed `--repeat` times; one
+sample is a fixed batch of calls, and the best and median sample are kept.
+Save a baseline before a schema or view change and `--compare` after it to
+see each query's before/after latency.
+
+Results are written as JSON (`output/benchmarks/benchmark_<timestamp>.json`
+by default). `--compare` checks the best time of each benchmark against the
+baseline and fails when it is more than `--tolerance` slower and at least
+`--min-delta` seconds slower; new or missing benchmarks are listed but do not
+fail. Baselines are per machine: save one before a change, compare after it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_bus_routes  # noqa: E402
+import build_event_db  # noqa: E402
+import build_lodging  # noqa: E402
+import build_tournament  # noqa: E402
+import generate_all_pdfs  # noqa: E402
+import generate_itineraries  # noqa: E402
+import map_team_aliases  # noqa: E402
+import render_pdf  # noqa: E402
+import synth_event  # noqa: E402
+from pipeline import STAGES  # noqa: E402
+
+RESULTS_VERSION = 1
+BASELINE_PATH = ROOT / "benchmarks" / "baseline.json"
+RESULTS_DIR = ROOT / "output" / "benchmarks"
+DEFAULT_DATASETS = ["real", "synth-400"]
+SYNTH_DATASET = re.compile(r"synth-(\d+)$")
+SYNTH_SEED = 2025
+
+RAW_STAGES = ("build_bus_routes", "build_lodging", "build_tournament")
+EXPENSIVE_VIEWS = (
+    "vw_team_alignment",
+    "vw_team_games",
+    "vw_team_game_sequence",
+    "vw_game_transport_candidates",
+    "vw_team_itinerary_flat",
+    "vw_manual_transport_needs",
+    "vw_bus_load_summary",
+)
+# Upper bounds on the calls in one sample, so synth-10000 stays in minutes.
+MAX_TRIP_QUERIES = 600
+MAX_PLANNED_ALIASES = 120
+MAX_LOOKUPS = 300
+RENDER_SAMPLE = 10
+QUERY_START_TIMES = (8 * 60, 12 * 60, 16 * 60)
+# (name, lookup, argument): lookups run once per squad ("alias"), per squad
+# and game ("alias_game") or per game ("game").
+ACCESS_PATHS: Tuple[Tuple[str, Callable[..., object], str], ...] = (
+    ("fetch_games_for_alias", generate_itineraries.fetch_games_for_alias, "alias"),
+    ("fetch_game_bus_candidates", generate_itineraries.fetch_game_bus_candidates, "alias_game"),
+    ("affected_alias_ids", lambda conn, game_id: generate_itineraries.affected_alias_ids(conn, [game_id]), "game"),
+    ("fetch_itinerary", render_pdf.fetch_itinerary, "alias"),
+    ("fetch_manual_segments", render_pdf.fetch_manual_segments, "alias"),
+    ("fetch_games", render_pdf.fetch_games, "alias"),
+)
+
+# (module, attribute, file name) for every path a stage reads or writes under data/build or output/.
+WORKSPACE_PATHS = (
+    (build_bus_routes, "DB_FILE", "bus_routes.db"),
+    (build_lodging, "DB_PATH", "lodging.db"),
+    (build_tournament, "DB_PATH", "tournament.db"),
+    (build_event_db, "BUS_DB", "bus_routes.db"),
+    (build_event_db, "LODGING_DB", "lodging.db"),
+    (build_event_db, "TOURNAMENT_DB", "tournament.db"),
+    (build_event_db, "TARGET_DB", "event_planner.db"),
+    (map_team_aliases, "DB_PATH", "event_planner.db"),
+    (generate_itineraries, "DB_PATH", "event_planner.db"),
+    (render_pdf, "DB_PATH", "event_planner.db"),
+    (generate_all_pdfs, "DB_PATH", "event_planner.db"),
+    (generate_all_pdfs, "OUTPUT_DIR", "itineraries"),
+    (generate_all_pdfs, "MANIFEST_PATH", "itineraries.manifest.json"),
+)
+
+
+@dataclass
+class Result:
+    dataset: str
+    kind: str  # "stage", "function", "query" or "view"
+    name: str
+    calls: int  # calls per sample
+    samples: int
+    best: float
+    median: float
+
+    @property
+    def key(self) -> str:
+        return f"{self.dataset}/{self.kind}/{self.name}"
+
+
+def synth_arguments(squads: int) -> List[str]:
+    """synth_event.py arguments for `squads`, scaled so courts and routes still fit."""
+    return [
+        "--teams", str(squads),
+        "--schools", str(max(4, squads // 100)),
+        "--halls", str(max(6, math.ceil(squads * 6 / 1000))),
+        "--routes", str(max(3, math.ceil(squads / 400))),
+        "--seed", str(SYNTH_SEED),
+    ]
+
+
+@contextlib.contextmanager
+def workspace(directory: Path) -> Iterator[Path]:
+    """Point every script's build and output paths into `directory`; yields the event_planner.db path."""
+    saved = [(module, attribute, getattr(module, attribute)) for module, attribute, _ in WORKSPACE_PATHS]
+    for module, attribute, name in WORKSPACE_PATHS:
+        setattr(module, attribute, directory / name)
+    try:
+        yield directory / "event_planner.db"
+    finally:
+        for module, attribute, value in saved:
+            setattr(module, attribute, value)
+
+
+def time_samples(dataset: str, kind: str, name: str, run: Callable[[], object], repeat: int, calls: int = 1) -> Result:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - started)
+    return Result(dataset, kind, name, calls, repeat, min(samples), statistics.median(samples))
+
+
+def evenly(items: Sequence, limit: int) -> List:
+    """At most `limit` items spread evenly over `items`, in order."""
+    if len(items) <= limit:
+        return list(items)
+    step = len(items) / limit
+    return [items[int(index * step)] for index in range(limit)]
+
+
+def run_stages(dataset: str, directory: Path, quiet: bool, skip_render: bool = False) -> List[Result]:
+    stage_args = argparse.Namespace(force=True, jobs=1, stop_after=None)
+    stages: List[Tuple[str, Callable[[], None]]] = []
+    match = SYNTH_DATASET.match(dataset)
+    if match:
+        arguments = synth_arguments(int(match.group(1))) + ["--out-dir", str(directory)]
+        stages.append(("synth_event", lambda: synth_event.main(arguments)))
+    for stage in STAGES:
+        if (match and stage.name in RAW_STAGES) or (skip_render and stage.name == "render"):
+            continue
+        stages.append((stage.name, lambda stage=stage: stage.run(stage_args)))
+
+    results = []
+    for name, run in stages:
+        if name == "render" and not render_pdf.HAS_FPDF:
+            print(f"  {dataset}: skipping render (fpdf2 not installed)")
+            continue
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            result = time_samples(dataset, "stage", name, run, repeat=1)
+        print(f"  {dataset}: {name:22} {result.best:8.3f}s")
+        results.append(result)
+    return results
+
+
+def trip_queries(conn: sqlite3.Connection, lookup: generate_itineraries.LookupData) -> List[Tuple[str, int, int, int]]:
+    """(service_day, origin, destination, earliest departure) between every school and hall stop, both ways."""
+    days = [row[0] for row in conn.execute("SELECT DISTINCT service_day FROM transport_trip_instances ORDER BY 1")]
+    schools = sorted(set(lookup.school_stop_map.values()))
+    halls = sorted(set(lookup.hall_stop_map.values()))
+    queries = [
+        (day, origin, destination, start)
+        for day in days
+        for school in schools
+        for hall in halls
+        if school != hall
+        for origin, destination in ((school, hall), (hall, school))
+        for start in QUERY_START_TIMES
+    ]
+    return evenly(queries, MAX_TRIP_QUERIES)
+
+
+def run_access_paths(
+    dataset: str,
+    conn: sqlite3.Connection,
+    alias_games: List[Tuple[sqlite3.Row, List[sqlite3.Row]]],
+    repeat: int,
+) -> List[Result]:
+    """Time every ACCESS_PATHS lookup over up to MAX_LOOKUPS arguments taken from the sampled squads."""
+    pairs = [(alias["alias_id"], game["game_id"]) for alias, games in alias_games for game in games]
+    arguments = {
+        "alias": [(alias["alias_id"],) for alias, _ in alias_games],
+        "alias_game": evenly(pairs, MAX_LOOKUPS),
+        "game": [(game_id,) for game_id in evenly(sorted({game_id for _, game_id in pairs}), MAX_LOOKUPS)],
+    }
+    results = []
+    for name, lookup, argument in ACCESS_PATHS:
+        calls = arguments[argument]
+
+        def run_lookups(lookup: Callable[..., object] = lookup, calls: List[tuple] = calls) -> None:
+            for call in calls:
+                lookup(conn, *call)
+
+        results.append(time_samples(dataset, "query", name, run_lookups, repeat, len(calls)))
+    return results
+
+
+def run_hot_paths(dataset: str, db_path: Path, directory: Path, repeat: int) -> List[Result]:
+    conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        results = [time_samples(dataset, "function", "load_lookup_data", lambda: generate_itineraries.load_lookup_data(conn), repeat)]
+        lookup = generate_itineraries.load_lookup_data(conn)
+        timetable = lookup.timetable
+
+        queries = trip_queries(conn, lookup)
+
+        def list_all_trips() -> None:
+            for day, origin, destination, start in queries:
+                generate_itineraries.list_trips(timetable, day, origin, destination, start)
+
+        def find_all_journeys() -> None:
+            tracker = generate_itineraries.BusLoadTracker(generate_itineraries.BUS_CAPACITY_LIMIT)
+            for day, origin, destination, start in queries:
+                generate_itineraries.find_multi_leg_trip(
+                    timetable, tracker, day, origin, destination, start, None, 1, "benchmark", "benchmark", None
+                )
+
+        results.append(time_samples(dataset, "function", "list_trips", list_all_trips, repeat, len(queries)))
+        results.append(time_samples(dataset, "function", "find_multi_leg_trip", find_all_journeys, repeat, len(queries)))
+
+        aliases = evenly(generate_itineraries.fetch_aliases(conn), MAX_PLANNED_ALIASES)
+        alias_games = [(alias, generate_itineraries.fetch_games_for_alias(conn, alias["alias_id"])) for alias in aliases]
+        game_count = sum(len(games) for _, games in alias_games)
+
+        def plan_all_games() -> None:
+            tracker = generate_itineraries.BusLoadTracker(generate_itineraries.BUS_CAPACITY_LIMIT)
+            for alias, games in alias_games:
+                for game in games:
+                    generate_itineraries.plan_game_travel(conn, tracker, alias, lookup, None, None, game)
+
+        results.append(time_samples(dataset, "function", "plan_game_travel", plan_all_games, repeat, game_count))
+        results.extend(run_access_paths(dataset, conn, alias_games, repeat))
+
+        if render_pdf.HAS_FPDF:
+            alias_ids = sorted(render_pdf.fetch_all_headers(conn))[:RENDER_SAMPLE]
+            headers = render_pdf.fetch_all_headers(conn, alias_ids)
+            itineraries = render_pdf.fetch_all_itineraries(conn, alias_ids)
+            manual = render_pdf.fetch_all_manual_segments(conn, alias_ids)
+            games = render_pdf.fetch_all_games(conn, alias_ids)
+            fonts = render_pdf.FontCache()
+            pdf_dir = directory / "benchmark_pdfs"
+            pdf_dir.mkdir(exist_ok=True)
+
+            def render_sample() -> None:
+                for alias_id in alias_ids:
+                    render_pdf.render_pdf(
+                        headers[alias_id],
+                        itineraries.get(alias_id, []),
+                        manual.get(alias_id, []),
+                        games.get(alias_id, []),
+                        pdf_dir / f"{alias_id}.pdf",
+                        fonts=fonts,
+                    )
+
+            results.append(time_samples(dataset, "function", "render_pdf", render_sample, repeat, len(alias_ids)))
+
+        for view in EXPENSIVE_VIEWS:
+            results.append(time_samples(dataset, "view", view, lambda: conn.execute(f"SELECT * FROM {view}").fetchall(), repeat))
+    finally:
+        conn.close()
+
+    for result in results:
+        print(f"  {dataset}: {result.name:28} best {result.best:8.4f}s  median {result.median:8.4f}s  ({result.calls} calls)")
+    return results
+
+
+def run_dataset(dataset: str, repeat: int, quiet: bool, skip_render: bool = False) -> List[Result]:
+    print(f"==> {dataset}")
+    with tempfile.TemporaryDirectory(prefix="eyc-bench-") as tmp:
+        directory = Path(tmp)
+        with workspace(directory) as db_path:
+            results = run_stages(dataset, directory, quiet, skip_render)
+            results.extend(run_hot_paths(dataset, db_path, directory, repeat))
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def write_results(path: Path, results: List[Result], repeat: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "repeat": repeat,
+        "environment": environment(),
+        "results": [asdict(result) for result in results],
+    }
+    path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def load_results(path: Path) -> Tuple[Dict[str, str], List[Result]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != RESULTS_VERSION:
+        raise SystemExit(f"{path}: unsupported results version {data.get('version')}")
+    return data.get("environment", {}), [Result(**entry) for entry in data["results"]]
+
+
+def compare_results(
+    current: List[Result], baseline: List[Result], tolerance: float, min_delta: float
+) -> List[Dict]:
+    """One row per benchmark in either run; status is ok, faster, regression, new or missing."""
+    previous = {result.key: result for result in baseline}
+    rows = []
+    for result in current:
+        base = previous.pop(result.key, None)
+        if base is None:
+            rows.append({"key": result.key, "baseline": None, "current": result.best, "ratio": None, "status": "new"})
+            continue
+        ratio = result.best / base.best if base.best > 0 else math.inf
+        delta = result.best - base.best
+        if ratio > 1 + tolerance and delta >= min_delta:
+            status = "regression"
+        elif ratio < 1 / (1 + tolerance) and -delta >= min_delta:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"key": result.key, "baseline": base.best, "current": result.best, "ratio": ratio, "status": status})
+    for key, base in previous.items():
+        rows.append({"key": key, "baseline": base.best, "current": None, "ratio": None, "status": "missing"})
+    return rows
+
+
+def print_comparison(rows: List[Dict]) -> None:
+    print(f"\n{'Benchmark':58} {'Baseline':>10} {'Current':>10} {'Ratio':>7}  Status")
+    for row in rows:
+        baseline = "-" if row["baseline"] is None else f"{row['baseline']:9.4f}s"
+        current = "-" if row["current"] is None else f"{row['current']:9.4f}s"
+        ratio = "-" if row["ratio"] is None else f"{row['ratio']:6.2f}x"
+        print(f"{row['key']:58} {baseline:>10} {current:>10} {ratio:>7}  {row['status']}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and planner hot paths.")
+    parser.add_argument(
+        "--dataset",
+        action="append",
+        help="'real' or 'synth-N' (N squads); repeatable (default: real and synth-400)",
+    )
+    parser.add_argument(
+        "--skip-render", action="store_true", help="Leave out the render stage (~0.15s per squad); render_pdf is still timed"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Samples per function/view benchmark (default 5)")
+    parser.add_argument("--output", type=Path, help="Results JSON (default output/benchmarks/benchmark_<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline JSON (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to --baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare with --baseline and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="Ignore slowdowns below this many seconds (default 0.005)")
+    parser.add_argument("--verbose", action="store_true", help="Show the stages' own output")
+    args = parser.parse_args(argv)
+    datasets = args.dataset or DEFAULT_DATASETS
+    for dataset in datasets:
+        if dataset != "real" and not SYNTH_DATASET.match(dataset):
+            parser.error(f"unknown dataset {dataset!r}; use 'real' or 'synth-N'")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    if args.compare and not args.baseline.exists():
+        parser.error(f"no baseline at {args.baseline}; run with --save-baseline first")
+
+    results: List[Result] = []
+    for dataset in datasets:
+        results.extend(run_dataset(dataset, args.repeat, quiet=not args.verbose, skip_render=args.skip_render))
+
+    output = args.output or RESULTS_DIR / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    write_results(output, results, args.repeat)
+    print(f"\nWrote {len(results)} results to {output}")
+
+    if args.compare:
+        baseline_environment, baseline = load_results(args.baseline)
+        if baseline_environment != environment():
+            print(f"Warning: baseline was recorded on {baseline_environment}, not {environment()}")
+        rows = compare_results(results, baseline, args.tolerance, args.min_delta)
+        print_comparison(rows)
+        regressions = [row["key"] for row in rows if row["status"] == "regression"]
+        if regressions:
+            raise SystemExit(f"{len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower: {', '.join(regressions)}")
+    if args.save_baseline:
+        write_results(args.baseline, results, args.repeat)
+        print(f"Saved baseline to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,14 @@ Assumptions (documented for traceability):
   cadence; we regenerate the full timetable programmatically.
 - `Thon Central (lørdag)` on Route 2 is informational (no explicit departures in
   the table) but is still created as a stop so it can be linked in later logic.
+
+`--dump` additionally writes `data/build/bus_routes.sql.gz` (or schema + CSV
+with `--dump csv`, see `sql_dump.py`).
 """
 
 from __future__ import annotations
 
+import argparse
 import sqlite3
 from collections import defaultdict
 from dataclasses import dataclass, field
@@ -25,10 +29,11 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Set
 
+from sql_dump import add_dump_argument, write_dump
+
 ROOT = Path(__file__).resolve().parent.parent
 TEXT_FILE = ROOT / "data" / "raw" / "bus_routes_text.txt"
 DB_FILE = ROOT / "data" / "build" / "bus_routes.db"
-SQL_DUMP_FILE = ROOT / "data" / "build" / "bus_routes.sql"
 
 # --------------------------------------------------------------------------- #
 # Helper dataclasses
@@ -347,7 +352,7 @@ CREATE INDEX IF NOT EXISTS idx_route_stop_times_lookup
 """
 
 
-def build_database(routes: List[RouteData], stop_descriptions: Dict[str, str]) -> None:
+def build_database(routes: List[RouteData], stop_descriptions: Dict[str, str], dump: Optional[str] = None) -> None:
     if DB_FILE.exists():
         DB_FILE.unlink()
     conn = sqlite3.connect(DB_FILE)
@@ -403,10 +408,8 @@ def build_database(routes: List[RouteData], stop_descriptions: Dict[str, str]) -
 
     conn.commit()
 
-    # Emit SQL dump for transparency.
-    with SQL_DUMP_FILE.open("w", encoding="utf-8") as dump:
-        for line in conn.iterdump():
-            dump.write(f"{line}\n")
+    # Optional SQL/CSV dump for transparency.
+    write_dump(conn, DB_FILE, dump)
 
     conn.close()
 
@@ -415,7 +418,11 @@ def build_database(routes: List[RouteData], stop_descriptions: Dict[str, str]) -
 # Main orchestration
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build data/build/bus_routes.db from the bus timetable text.")
+    add_dump_argument(parser)
+    args = parser.parse_args(argv)
+
     stop_descriptions = parse_stop_descriptions()
     routes_map, _ = parse_bus_data(TEXT_FILE, stop_descriptions)
 
@@ -425,7 +432,7 @@ def main() -> None:
         expand_route_times(route)
         routes.append(route)
 
-    build_database(routes, stop_descriptions)
+    build_database(routes, stop_descriptions, dump=args.dump)
     print(f"Created {DB_FILE} with {len(routes)} routes.")
 
 
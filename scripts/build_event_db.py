@@ -10,21 +10,32 @@ Source databases (must exist beforehand):
 
 Output:
     data/build/event_planner.db
-    data/build/event_planner.sql
+    data/build/event_planner.sql.gz (only with `--dump`; `--dump csv` for schema + CSV)
+
+The domain databases are ATTACHed and copied with `INSERT ... SELECT` in a
+single transaction (foreign keys checked at commit), so rows never pass
+through Python; secondary indexes are created after the load.
+
+Earliest-arrival profiles (`transport_arrival_profiles`) are only recomputed
+when the timetable fingerprint differs from the previous build.
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
 import sqlite3
 from pathlib import Path
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from sql_dump import add_dump_argument, write_dump
+from timetable import TRANSFER_BUFFER_MIN, ProfileRow, TimetableIndex, build_arrival_profiles
 
 ROOT = Path(__file__).resolve().parent.parent
 BUS_DB = ROOT / "data" / "build" / "bus_routes.db"
 LODGING_DB = ROOT / "data" / "build" / "lodging.db"
 TOURNAMENT_DB = ROOT / "data" / "build" / "tournament.db"
 TARGET_DB = ROOT / "data" / "build" / "event_planner.db"
-TARGET_SQL = ROOT / "data" / "build" / "event_planner.sql"
 
 
 SCHEMA_SQL = """
@@ -69,6 +80,43 @@ CREATE TABLE IF NOT EXISTS transport_route_stop_times (
     FOREIGN KEY (stop_id) REFERENCES transport_stops(stop_id)
 );
 
+-- One row per stop time with its trip number and integer minutes, so routing
+-- queries are index range scans instead of recomputing the window per query.
+CREATE TABLE IF NOT EXISTS transport_trip_instances (
+    route_stop_time_id INTEGER PRIMARY KEY,
+    route_id INTEGER NOT NULL,
+    service_day TEXT NOT NULL,
+    stop_id INTEGER NOT NULL,
+    stop_order INTEGER NOT NULL,
+    trip_index INTEGER NOT NULL,
+    departure_time TEXT NOT NULL,
+    departure_min INTEGER NOT NULL,
+    condition_note TEXT,
+    FOREIGN KEY (route_stop_time_id) REFERENCES transport_route_stop_times(route_stop_time_id),
+    FOREIGN KEY (route_id) REFERENCES transport_routes(route_id),
+    FOREIGN KEY (stop_id) REFERENCES transport_stops(stop_id)
+);
+
+CREATE TABLE IF NOT EXISTS transport_arrival_profiles (
+    service_day TEXT NOT NULL,
+    origin_stop_id INTEGER NOT NULL,
+    destination_stop_id INTEGER NOT NULL,
+    depart_min INTEGER NOT NULL,
+    arrival_min INTEGER NOT NULL,
+    route_id INTEGER NOT NULL,
+    trip_index INTEGER NOT NULL,
+    legs INTEGER NOT NULL,
+    PRIMARY KEY (service_day, origin_stop_id, destination_stop_id, depart_min),
+    FOREIGN KEY (origin_stop_id) REFERENCES transport_stops(stop_id),
+    FOREIGN KEY (destination_stop_id) REFERENCES transport_stops(stop_id),
+    FOREIGN KEY (route_id) REFERENCES transport_routes(route_id)
+);
+
+CREATE TABLE IF NOT EXISTS build_metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS transport_stop_links (
     link_id INTEGER PRIMARY KEY AUTOINCREMENT,
     stop_id INTEGER NOT NULL,
@@ -163,6 +211,7 @@ CREATE TABLE IF NOT EXISTS schedule_games (
     day_id INTEGER NOT NULL,
     match_code TEXT,
     start_time TEXT NOT NULL,
+    start_min INTEGER,
     home_team_id INTEGER NOT NULL,
     away_team_id INTEGER NOT NULL,
     FOREIGN KEY (tournament_id) REFERENCES schedule_tournaments(tournament_id),
@@ -216,128 +265,246 @@ CREATE TABLE IF NOT EXISTS team_itinerary_segments (
     departure_route_stop_time_id INTEGER,
     arrival_route_stop_time_id INTEGER,
     notes TEXT,
-    UNIQUE (alias_id, sequence_no),
     CHECK (segment_type IN ('game', 'bus', 'meal', 'concert', 'stay', 'note', 'placeholder')),
     FOREIGN KEY (alias_id) REFERENCES team_aliases(alias_id),
     FOREIGN KEY (origin_stop_id) REFERENCES transport_stops(stop_id),
     FOREIGN KEY (destination_stop_id) REFERENCES transport_stops(stop_id),
     FOREIGN KEY (route_id) REFERENCES transport_routes(route_id)
 );
-"""
 
+-- Headcount per bus trip, kept in step with team_itinerary_segments by generate_itineraries.py
+CREATE TABLE IF NOT EXISTS bus_trip_loads (
+    service_day TEXT NOT NULL,
+    route_id INTEGER NOT NULL,
+    trip_index INTEGER NOT NULL,
+    headcount INTEGER NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (service_day, route_id, trip_index),
+    FOREIGN KEY (route_id) REFERENCES transport_routes(route_id)
+);
 
-def fetch_all(conn: sqlite3.Connection, query: str) -> Iterable[Tuple]:
-    return conn.execute(query).fetchall()
+-- schedule_games as last planned by generate_itineraries.py (for --changed-games auto)
+CREATE TABLE IF NOT EXISTS itinerary_game_snapshot (
+    game_id INTEGER PRIMARY KEY,
+    day_id INTEGER,
+    hall_id INTEGER,
+    start_time TEXT,
+    home_team_id INTEGER,
+    away_team_id INTEGER
+);
 
+-- Planning cost per squad in the last generate_itineraries.py run (or --changed-games re-plan)
+CREATE TABLE IF NOT EXISTS planner_metrics (
+    alias_id INTEGER PRIMARY KEY,
+    plan_ms REAL NOT NULL,
+    routing_calls INTEGER NOT NULL,
+    multi_leg_attempts INTEGER NOT NULL,
+    capacity_releases INTEGER NOT NULL,
+    segment_count INTEGER NOT NULL,
+    FOREIGN KEY (alias_id) REFERENCES team_aliases(alias_id)
+);
+"""
 
-def copy_domain_data() -> None:
-    if not (BUS_DB.exists() and LODGING_DB.exists() and TOURNAMENT_DB.exists()):
-        raise FileNotFoundError("Source databases not found. Run domain ETL scripts first.")
+# Secondary indexes, created once the tables are loaded. Each one serves a
+# lookup seen in the views' query plans (see docs/etl_overview.md).
+INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_route_stop_times_lookup
+    ON transport_route_stop_times(route_id, service_day, departure_time);
+CREATE INDEX IF NOT EXISTS idx_trip_instances_stop_departure
+    ON transport_trip_instances(service_day, stop_id, departure_min, route_id, trip_index, stop_order);
+CREATE INDEX IF NOT EXISTS idx_trip_instances_trip_order
+    ON transport_trip_instances(service_day, route_id, trip_index, stop_order, stop_id, departure_min);
+-- Stops of a squad's school and of a game's hall (vw_game_transport_candidates).
+CREATE INDEX IF NOT EXISTS idx_stop_links_school
+    ON transport_stop_links(lodging_school_id, stop_id);
+CREATE INDEX IF NOT EXISTS idx_stop_links_hall
+    ON transport_stop_links(schedule_hall_id, stop_id);
+-- The two branches of vw_team_games: games by home team, games by away team, squads by team.
+CREATE INDEX IF NOT EXISTS idx_games_home_team
+    ON schedule_games(home_team_id);
+CREATE INDEX IF NOT EXISTS idx_games_away_team
+    ON schedule_games(away_team_id);
+CREATE INDEX IF NOT EXISTS idx_aliases_schedule_team
+    ON team_aliases(schedule_team_id);
+-- Unique sequence per alias; generate_itineraries.py drops and rebuilds both segment indexes around its bulk load.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_segments_alias_sequence
+    ON team_itinerary_segments(alias_id, sequence_no);
+-- A squad's segments in itinerary order (vw_team_itinerary_flat, vw_manual_transport_needs).
+CREATE INDEX IF NOT EXISTS idx_segments_alias_day
+    ON team_itinerary_segments(alias_id, service_day, sequence_no);
+"""
 
-    if TARGET_DB.exists():
-        TARGET_DB.unlink()
+# (attached schema, source table, target table, columns): source and target share column names.
+DOMAIN_COPIES: List[Tuple[str, str, str, str]] = [
+    ("bus", "routes", "transport_routes", "route_id, route_number, title, frequency_note, extra_notes"),
+    ("bus", "stops", "transport_stops", "stop_id, stop_name, display_name, description"),
+    ("bus", "route_stops", "transport_route_stops", "route_stop_id, route_id, stop_id, stop_order, default_offset_min"),
+    (
+        "bus",
+        "route_stop_times",
+        "transport_route_stop_times",
+        "route_stop_time_id, route_id, stop_id, stop_order, service_day, departure_time, condition_note",
+    ),
+    ("lodging", "schools", "lodging_schools", "school_id, name"),
+    ("lodging", "clubs", "lodging_clubs", "club_id, school_id, name"),
+    (
+        "lodging",
+        "teams",
+        "lodging_teams",
+        "team_id, club_id, raw_label, gender, year, num_teams, headcount, room_text, division_key",
+    ),
+    ("lodging", "rooms", "lodging_rooms", "room_id, school_id, room_code"),
+    ("lodging", "team_rooms", "lodging_team_rooms", "team_id, room_id"),
+    ("lodging", "team_squads", "lodging_team_squads", "squad_id, team_id, squad_index"),
+    ("tournament", "halls", "schedule_halls", "hall_id, name"),
+    ("tournament", "event_days", "schedule_event_days", "day_id, date, label"),
+    ("tournament", "tournaments", "schedule_tournaments", "tournament_id, name, gender, age, birth_year, pool_code"),
+    ("tournament", "teams", "schedule_teams", "team_id, name"),
+    (
+        "tournament",
+        "games",
+        "schedule_games",
+        "game_id, tournament_id, hall_id, day_id, match_code, start_time, home_team_id, away_team_id",
+    ),
+]
+
+
+def copy_attached_tables(master: sqlite3.Connection) -> None:
+    """Copy every DOMAIN_COPIES table from the attached databases inside SQLite."""
+    for schema, source, target, columns in DOMAIN_COPIES:
+        master.execute(f"INSERT INTO main.{target} ({columns}) SELECT {columns} FROM {schema}.{source}")
+    master.execute(
+        """
+        UPDATE schedule_games
+        SET start_min = CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER)
+        """
+    )
 
-    master = sqlite3.connect(TARGET_DB)
-    master.executescript(SCHEMA_SQL)
 
-    # ------------------------- Transport data ------------------------------
-    bus = sqlite3.connect(BUS_DB)
-    master.executemany(
-        "INSERT INTO transport_routes (route_id, route_number, title, frequency_note, extra_notes) VALUES (?, ?, ?, ?, ?)",
-        fetch_all(bus, "SELECT route_id, route_number, title, frequency_note, extra_notes FROM routes"),
-    )
-    master.executemany(
-        "INSERT INTO transport_stops (stop_id, stop_name, display_name, description) VALUES (?, ?, ?, ?)",
-        fetch_all(bus, "SELECT stop_id, stop_name, display_name, description FROM stops"),
-    )
-    master.executemany(
+def materialise_trip_instances(master: sqlite3.Connection) -> None:
+    """Number trips once: every stop_order = 1 row starts a new trip per route/day."""
+    master.execute(
         """
-        INSERT INTO transport_route_stops (route_stop_id, route_id, stop_id, stop_order, default_offset_min)
-        VALUES (?, ?, ?, ?, ?)
-        """,
-        fetch_all(
-            bus,
-            "SELECT route_stop_id, route_id, stop_id, stop_order, default_offset_min FROM route_stops",
-        ),
-    )
-    master.executemany(
+        INSERT INTO transport_trip_instances (
+            route_stop_time_id, route_id, service_day, stop_id, stop_order,
+            trip_index, departure_time, departure_min, condition_note
+        )
+        SELECT
+            route_stop_time_id,
+            route_id,
+            service_day,
+            stop_id,
+            stop_order,
+            SUM(CASE WHEN stop_order = 1 THEN 1 ELSE 0 END) OVER (
+                PARTITION BY route_id, service_day
+                ORDER BY departure_time, stop_order, route_stop_time_id
+            ) AS trip_index,
+            departure_time,
+            CAST(substr(departure_time, 1, 2) AS INTEGER) * 60 + CAST(substr(departure_time, 4, 2) AS INTEGER),
+            condition_note
+        FROM transport_route_stop_times
         """
-        INSERT INTO transport_route_stop_times (route_stop_time_id, route_id, stop_id, stop_order, service_day, departure_time, condition_note)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        fetch_all(
-            bus,
-            """
-            SELECT route_stop_time_id, route_id, stop_id, stop_order, service_day, departure_time, condition_note
-            FROM route_stop_times
-            """,
-        ),
     )
-    bus.close()
 
-    # ------------------------- Lodging data --------------------------------
-    lodging = sqlite3.connect(LODGING_DB)
-    master.executemany(
-        "INSERT INTO lodging_schools (school_id, name) VALUES (?, ?)",
-        fetch_all(lodging, "SELECT school_id, name FROM schools"),
-    )
-    master.executemany(
-        "INSERT INTO lodging_clubs (club_id, school_id, name) VALUES (?, ?, ?)",
-        fetch_all(lodging, "SELECT club_id, school_id, name FROM clubs"),
-    )
+
+def timetable_fingerprint(master: sqlite3.Connection) -> str:
+    """Hash of the trip instances and transfer buffer the arrival profiles are built from."""
+    digest = hashlib.sha256(f"buffer={TRANSFER_BUFFER_MIN}".encode("utf-8"))
+    for row in master.execute(
+        """
+        SELECT route_stop_time_id, route_id, service_day, stop_id, stop_order, trip_index, departure_min
+        FROM transport_trip_instances
+        ORDER BY route_stop_time_id
+        """
+    ):
+        digest.update(repr(row).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def read_cached_profiles(db_path: Path) -> Optional[Tuple[str, List[ProfileRow]]]:
+    """Fingerprint and profile rows from a previous build, if it has any."""
+    if not db_path.exists():
+        return None
+    previous = sqlite3.connect(db_path)
+    try:
+        fingerprint = previous.execute(
+            "SELECT value FROM build_metadata WHERE key = 'timetable_fingerprint'"
+        ).fetchone()
+        if fingerprint is None:
+            return None
+        rows = previous.execute(
+            """
+            SELECT service_day, origin_stop_id, destination_stop_id, depart_min,
+                   arrival_min, route_id, trip_index, legs
+            FROM transport_arrival_profiles
+            """
+        ).fetchall()
+        return fingerprint[0], rows
+    except sqlite3.DatabaseError:
+        # Older or damaged build without the profile tables: rebuild from scratch.
+        return None
+    finally:
+        previous.close()
+
+
+def store_arrival_profiles(
+    master: sqlite3.Connection,
+    cached: Optional[Tuple[str, List[ProfileRow]]],
+) -> bool:
+    """Fill transport_arrival_profiles; reuse the previous rows if the timetable is unchanged."""
+    fingerprint = timetable_fingerprint(master)
+    if cached is not None and cached[0] == fingerprint:
+        rows = cached[1]
+        reused = True
+    else:
+        rows = build_arrival_profiles(TimetableIndex.from_connection(master), TRANSFER_BUFFER_MIN)
+        reused = False
     master.executemany(
         """
-        INSERT INTO lodging_teams (team_id, club_id, raw_label, gender, year, num_teams, headcount, room_text, division_key)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO transport_arrival_profiles (
+            service_day, origin_stop_id, destination_stop_id, depart_min,
+            arrival_min, route_id, trip_index, legs
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        fetch_all(
-            lodging,
-            "SELECT team_id, club_id, raw_label, gender, year, num_teams, headcount, room_text, division_key FROM teams",
-        ),
+        rows,
     )
     master.executemany(
-        "INSERT INTO lodging_rooms (room_id, school_id, room_code) VALUES (?, ?, ?)",
-        fetch_all(lodging, "SELECT room_id, school_id, room_code FROM rooms"),
+        "INSERT INTO build_metadata (key, value) VALUES (?, ?)",
+        [
+            ("timetable_fingerprint", fingerprint),
+            ("arrival_profile_transfer_buffer", str(TRANSFER_BUFFER_MIN)),
+        ],
     )
-    master.executemany(
-        "INSERT INTO lodging_team_rooms (team_id, room_id) VALUES (?, ?)",
-        fetch_all(lodging, "SELECT team_id, room_id FROM team_rooms"),
-    )
-    master.executemany(
-        "INSERT INTO lodging_team_squads (squad_id, team_id, squad_index) VALUES (?, ?, ?)",
-        fetch_all(lodging, "SELECT squad_id, team_id, squad_index FROM team_squads"),
-    )
-    lodging.close()
+    return reused
 
-    # ------------------------- Tournament data -----------------------------
-    tournament = sqlite3.connect(TOURNAMENT_DB)
-    master.executemany(
-        "INSERT INTO schedule_halls (hall_id, name) VALUES (?, ?)",
-        fetch_all(tournament, "SELECT hall_id, name FROM halls"),
-    )
-    master.executemany(
-        "INSERT INTO schedule_event_days (day_id, date, label) VALUES (?, ?, ?)",
-        fetch_all(tournament, "SELECT day_id, date, label FROM event_days"),
-    )
-    master.executemany(
-        "INSERT INTO schedule_tournaments (tournament_id, name, gender, age, birth_year, pool_code) VALUES (?, ?, ?, ?, ?, ?)",
-        fetch_all(tournament, "SELECT tournament_id, name, gender, age, birth_year, pool_code FROM tournaments"),
-    )
-    master.executemany(
-        "INSERT INTO schedule_teams (team_id, name) VALUES (?, ?)",
-        fetch_all(tournament, "SELECT team_id, name FROM teams"),
-    )
-    master.executemany(
-        """
-        INSERT INTO schedule_games (game_id, tournament_id, hall_id, day_id, match_code, start_time, home_team_id, away_team_id)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        fetch_all(
-            tournament,
-            "SELECT game_id, tournament_id, hall_id, day_id, match_code, start_time, home_team_id, away_team_id FROM games",
-        ),
-    )
-    tournament.close()
+
+def copy_domain_data(dump: Optional[str] = None) -> None:
+    if not (BUS_DB.exists() and LODGING_DB.exists() and TOURNAMENT_DB.exists()):
+        raise FileNotFoundError("Source databases not found. Run domain ETL scripts first.")
+
+    # Profiles are costly to compute, so keep the previous ones until the timetable changes.
+    cached_profiles = read_cached_profiles(TARGET_DB)
+    if TARGET_DB.exists():
+        TARGET_DB.unlink()
+
+    master = sqlite3.connect(TARGET_DB)
+    master.executescript(SCHEMA_SQL)
+
+    # ------------------------- Domain data ---------------------------------
+    for schema, path in (("bus", BUS_DB), ("lodging", LODGING_DB), ("tournament", TOURNAMENT_DB)):
+        master.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    # One transaction for the whole load; foreign keys are only checked at COMMIT.
+    master.execute("BEGIN")
+    master.execute("PRAGMA defer_foreign_keys = ON")
+    copy_attached_tables(master)
+
+    # ------------------------- Trip instances ------------------------------
+    materialise_trip_instances(master)
+    if store_arrival_profiles(master, cached_profiles):
+        print("Reused earliest-arrival profiles (timetable unchanged)")
+    else:
+        print("Built earliest-arrival profiles")
 
     # ------------------------- Stop cross-links ----------------------------
     school_name_to_id = {
@@ -367,13 +534,14 @@ def copy_domain_data() -> None:
     }
 
     for stop_id, stop_name in master.execute("SELECT stop_id, stop_name FROM transport_stops"):
-        school_id = None
-        school_key = school_map.get(stop_name)
-        if school_key:
-            school_id = school_name_to_id.get(school_key)
+        # Stops missing from the maps (e.g. synthetic events from synth_event.py) link by name:
+        # the school with the stop's name, and the hall with that name or "<stop name> - <court>".
+        school_id = school_name_to_id.get(school_map.get(stop_name, stop_name))
 
         # Get all hall names for this stop (can be multiple)
-        hall_names = hall_map.get(stop_name, [])
+        hall_names = hall_map.get(stop_name) or [
+            hall_name for hall_name in hall_name_to_id if hall_name == stop_name or hall_name.startswith(f"{stop_name} - ")
+        ]
         if not hall_names:
             # Insert one row with NULL hall_id for school-only stops
             master.execute(
@@ -433,6 +601,12 @@ def copy_domain_data() -> None:
 
 
     master.commit()
+    for schema in ("bus", "lodging", "tournament"):
+        master.execute(f"DETACH DATABASE {schema}")
+    master.executescript(INDEX_SQL)
+    # Without statistics SQLite joins vw_game_transport_candidates from every
+    # departure of the day instead of from the squad's school stop.
+    master.execute("ANALYZE")
 
     master.executescript(
         """
@@ -470,6 +644,8 @@ def copy_domain_data() -> None:
         LEFT JOIN schedule_teams st ON st.team_id = ta.schedule_team_id
         GROUP BY ta.alias_id;
 
+        -- One branch per side instead of an OR join, so each can search its own
+        -- schedule_games index; the away branch skips a team playing itself.
         CREATE VIEW vw_team_games AS
         SELECT
             ta.alias_id,
@@ -480,9 +656,10 @@ def copy_domain_data() -> None:
             d.date,
             d.label AS day_label,
             g.start_time,
+            g.start_min,
             h.name AS hall_name,
             t.name AS tournament_name,
-            CASE WHEN g.home_team_id = st.team_id THEN 'home' ELSE 'away' END AS role,
+            'home' AS role,
             opp.name AS opponent_name,
             g.match_code,
             h.hall_id,
@@ -497,11 +674,44 @@ def copy_domain_data() -> None:
         FROM team_aliases ta
         JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
         JOIN schedule_teams st ON st.team_id = ta.schedule_team_id
-        JOIN schedule_games g ON g.home_team_id = st.team_id OR g.away_team_id = st.team_id
+        JOIN schedule_games g ON g.home_team_id = st.team_id
         JOIN schedule_event_days d ON d.day_id = g.day_id
         JOIN schedule_halls h ON h.hall_id = g.hall_id
         JOIN schedule_tournaments t ON t.tournament_id = g.tournament_id
-        JOIN schedule_teams opp ON opp.team_id = CASE WHEN g.home_team_id = st.team_id THEN g.away_team_id ELSE g.home_team_id END;
+        JOIN schedule_teams opp ON opp.team_id = g.away_team_id
+        UNION ALL
+        SELECT
+            ta.alias_id,
+            ta.squad_index,
+            lt.team_id AS lodging_team_id,
+            st.team_id AS schedule_team_id,
+            g.game_id,
+            d.date,
+            d.label AS day_label,
+            g.start_time,
+            g.start_min,
+            h.name AS hall_name,
+            t.name AS tournament_name,
+            'away' AS role,
+            opp.name AS opponent_name,
+            g.match_code,
+            h.hall_id,
+            d.day_id,
+            t.tournament_id,
+            CASE CAST(strftime('%w', d.date) AS INTEGER)
+                WHEN 5 THEN 'fri'
+                WHEN 6 THEN 'sat'
+                WHEN 0 THEN 'sun'
+                ELSE NULL
+            END AS service_day_code
+        FROM team_aliases ta
+        JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
+        JOIN schedule_teams st ON st.team_id = ta.schedule_team_id
+        JOIN schedule_games g ON g.away_team_id = st.team_id AND g.home_team_id <> st.team_id
+        JOIN schedule_event_days d ON d.day_id = g.day_id
+        JOIN schedule_halls h ON h.hall_id = g.hall_id
+        JOIN schedule_tournaments t ON t.tournament_id = g.tournament_id
+        JOIN schedule_teams opp ON opp.team_id = g.home_team_id;
 
         CREATE VIEW vw_team_game_sequence AS
         WITH ordered AS (
@@ -515,6 +725,10 @@ def copy_domain_data() -> None:
                     PARTITION BY g.alias_id
                     ORDER BY g.date, g.start_time, g.game_id
                 ) AS prev_start_time,
+                LAG(g.start_min) OVER (
+                    PARTITION BY g.alias_id
+                    ORDER BY g.date, g.start_time, g.game_id
+                ) AS prev_start_min,
                 LAG(g.date) OVER (
                     PARTITION BY g.alias_id
                     ORDER BY g.date, g.start_time, g.game_id
@@ -523,6 +737,10 @@ def copy_domain_data() -> None:
                     PARTITION BY g.alias_id
                     ORDER BY g.date, g.start_time, g.game_id
                 ) AS next_start_time,
+                LEAD(g.start_min) OVER (
+                    PARTITION BY g.alias_id
+                    ORDER BY g.date, g.start_time, g.game_id
+                ) AS next_start_min,
                 LEAD(g.date) OVER (
                     PARTITION BY g.alias_id
                     ORDER BY g.date, g.start_time, g.game_id
@@ -552,18 +770,8 @@ def copy_domain_data() -> None:
             ordered.prev_start_time,
             ordered.next_date,
             ordered.next_start_time,
-            CASE
-                WHEN prev_date = date THEN
-                    ((CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER))
-                    - (CAST(substr(prev_start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(prev_start_time, 4, 2) AS INTEGER)))
-                ELSE NULL
-            END AS minutes_since_prev_game,
-            CASE
-                WHEN next_date = date THEN
-                    ((CAST(substr(next_start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(next_start_time, 4, 2) AS INTEGER))
-                    - (CAST(substr(start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(start_time, 4, 2) AS INTEGER)))
-                ELSE NULL
-            END AS minutes_until_next_game
+            CASE WHEN prev_date = date THEN start_min - prev_start_min ELSE NULL END AS minutes_since_prev_game,
+            CASE WHEN next_date = date THEN next_start_min - start_min ELSE NULL END AS minutes_until_next_game
         FROM ordered;
 
         CREATE VIEW vw_team_daily_summary AS
@@ -592,21 +800,6 @@ def copy_domain_data() -> None:
         JOIN transport_stops ts ON ts.stop_id = e.anchor_stop_id;
 
         CREATE VIEW vw_transport_trip_instances AS
-        WITH ordered AS (
-            SELECT
-                route_stop_time_id,
-                route_id,
-                service_day,
-                stop_id,
-                stop_order,
-                departure_time,
-                condition_note,
-                SUM(CASE WHEN stop_order = 1 THEN 1 ELSE 0 END) OVER (
-                    PARTITION BY route_id, service_day
-                    ORDER BY departure_time, stop_order, route_stop_time_id
-                ) AS trip_index
-            FROM transport_route_stop_times
-        )
         SELECT
             route_stop_time_id,
             route_id,
@@ -615,8 +808,9 @@ def copy_domain_data() -> None:
             stop_order,
             departure_time,
             condition_note,
-            trip_index
-        FROM ordered;
+            trip_index,
+            departure_min
+        FROM transport_trip_instances;
 
         CREATE VIEW vw_game_transport_candidates AS
         WITH game_context AS (
@@ -629,6 +823,7 @@ def copy_domain_data() -> None:
                 g.date,
                 g.day_label,
                 g.start_time,
+                g.start_min,
                 g.service_day_code,
                 g.hall_id,
                 g.hall_name,
@@ -679,17 +874,15 @@ def copy_domain_data() -> None:
                 arr_stops.display_name AS arrival_stop_display,
                 arr.departure_time AS arrival_time,
                 arr.condition_note AS arrival_condition,
-                ((CAST(substr(arr.departure_time, 1, 2) AS INTEGER) * 60 + CAST(substr(arr.departure_time, 4, 2) AS INTEGER))
-                  - (CAST(substr(dep.departure_time, 1, 2) AS INTEGER) * 60 + CAST(substr(dep.departure_time, 4, 2) AS INTEGER))) AS travel_minutes,
-                ((CAST(substr(ctx.start_time, 1, 2) AS INTEGER) * 60 + CAST(substr(ctx.start_time, 4, 2) AS INTEGER))
-                  - (CAST(substr(arr.departure_time, 1, 2) AS INTEGER) * 60 + CAST(substr(arr.departure_time, 4, 2) AS INTEGER))) AS buffer_minutes
+                arr.departure_min - dep.departure_min AS travel_minutes,
+                ctx.start_min - arr.departure_min AS buffer_minutes
             FROM game_context ctx
             JOIN transport_stop_links lodging_link ON lodging_link.lodging_school_id = ctx.school_id
             JOIN transport_stop_links hall_link ON hall_link.schedule_hall_id = ctx.hall_id
-            JOIN vw_transport_trip_instances dep
+            JOIN transport_trip_instances dep
                 ON dep.stop_id = lodging_link.stop_id
                AND dep.service_day = ctx.service_day_code
-            JOIN vw_transport_trip_instances arr
+            JOIN transport_trip_instances arr
                 ON arr.route_id = dep.route_id
                AND arr.service_day = dep.service_day
                AND arr.trip_index = dep.trip_index
@@ -793,15 +986,17 @@ def copy_domain_data() -> None:
         """
     )
 
-    with TARGET_SQL.open("w", encoding="utf-8") as dump:
-        for line in master.iterdump():
-            dump.write(f"{line}\n")
+    write_dump(master, TARGET_DB, dump)
 
     master.close()
 
 
-def main() -> None:
-    copy_domain_data()
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Combine the domain databases into data/build/event_planner.db.")
+    add_dump_argument(parser)
+    args = parser.parse_args(argv)
+
+    copy_domain_data(dump=args.dump)
     print(f"Created {TARGET_DB}")
 
 
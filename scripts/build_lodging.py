@@ -3,8 +3,8 @@
 ETL pipeline for lodging allocations extracted from `Overnatningsoversigt (1).docx`.
 
 Outputs:
-    data/build/lodging.db  – normalized SQLite database
-    data/build/lodging.sql – SQL dump for auditability
+    data/build/lodging.db     – normalized SQLite database
+    data/build/lodging.sql.gz – SQL dump for auditability (only with `--dump`)
 
 Schema:
     schools(school_id, name)
@@ -16,77 +16,96 @@ Schema:
 
 from __future__ import annotations
 
+import argparse
 import re
 import sqlite3
 import xml.etree.ElementTree as ET
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from zipfile import ZipFile
 
+from sql_dump import add_dump_argument, write_dump
+
 ROOT = Path(__file__).resolve().parent.parent
 DOCX_PATH = ROOT / "Overnatningsoversigt (1).docx"
 DB_PATH = ROOT / "data" / "build" / "lodging.db"
-SQL_DUMP_PATH = ROOT / "data" / "build" / "lodging.sql"
 
-NS = {"w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main"}
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+BODY, PARAGRAPH, TABLE = f"{W_NS}body", f"{W_NS}p", f"{W_NS}tbl"
+TABLE_ROW, TABLE_CELL, TEXT = f"{W_NS}tr", f"{W_NS}tc", f"{W_NS}t"
+
+WHITESPACE = re.compile(r"\s+")
 
 
 def normalise_text(value: str) -> str:
     value = value.replace("\xa0", " ")
-    value = re.sub(r"\s+", " ", value.strip())
+    value = WHITESPACE.sub(" ", value.strip())
     return value
 
 
-def iter_body_blocks(root: ET.Element):
-    body = root.find("w:body", NS)
-    if body is None:
-        return
-    for child in body:
-        yield child
-
+def iter_school_tables(path: Path = DOCX_PATH) -> Iterator[Tuple[str, List[List[str]]]]:
+    """
+    Stream (school, table rows) for every lodging table, in document order.
 
-def paragraph_text(para: ET.Element) -> str:
-    return normalise_text("".join(t.text or "" for t in para.findall(".//w:t", NS)))
+    `word/document.xml` is read with `ET.iterparse`. A top-level paragraph
+    names the school for the tables that follow it. A top-level table yields
+    one list of cell texts per `w:tr`; the text of a nested table counts
+    towards its cell. Text is collected from each `w:t` as it closes, so no
+    subtree is scanned twice. Each top-level block and table row is cleared
+    once it has been read.
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Missing source document: {path}")
 
-
-def table_rows(table: ET.Element) -> List[List[str]]:
-    rows: List[List[str]] = []
-    for row in table.findall("w:tr", NS):
-        cells = []
-        for cell in row.findall("w:tc", NS):
-            text = normalise_text("".join(t.text or "" for t in cell.findall(".//w:t", NS)))
-            cells.append(text)
-        rows.append(cells)
-    return rows
-
-
-def parse_school_tables() -> Dict[str, List[List[List[str]]]]:
-    if not DOCX_PATH.exists():
-        raise FileNotFoundError(f"Missing source document: {DOCX_PATH}")
-    with ZipFile(DOCX_PATH) as zf:
-        xml = zf.read("word/document.xml")
-    root = ET.fromstring(xml)
-
-    school_tables: Dict[str, List[List[List[str]]]] = defaultdict(list)
     current_school: Optional[str] = None
+    body: Optional[ET.Element] = None
+    block: Optional[ET.Element] = None  # open paragraph or table directly under w:body
+    depth = body_depth = 0
+    in_row = in_cell = False
+    parts: List[str] = []  # text of the open paragraph or table cell
+    rows: List[List[str]] = []
 
-    for block in iter_body_blocks(root):
-        if block.tag.endswith("}p"):
-            text = paragraph_text(block)
-            if not text:
-                continue
-            if text.lower().startswith("hvem bor"):
-                continue
-            current_school = text.rstrip(":")
-        elif block.tag.endswith("}tbl"):
-            if not current_school:
+    with ZipFile(path) as zf, zf.open("word/document.xml") as handle:
+        for event, element in ET.iterparse(handle, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                depth += 1
+                if body is None:
+                    if tag == BODY:
+                        body, body_depth = element, depth
+                elif depth == body_depth + 1:
+                    if tag in (PARAGRAPH, TABLE):
+                        block, parts, rows = element, [], []
+                elif block is not None and block.tag == TABLE:
+                    if depth == body_depth + 2 and tag == TABLE_ROW:
+                        in_row = True
+                        rows.append([])
+                    elif depth == body_depth + 3 and in_row and tag == TABLE_CELL:
+                        in_cell, parts = True, []
                 continue
-            if current_school.lower().startswith("skolefordeling"):
+
+            depth -= 1
+            if block is None:
                 continue
-            rows = table_rows(block)
-            school_tables[current_school].append(rows)
-    return school_tables
+            if tag == TEXT:
+                if block.tag == PARAGRAPH or in_cell:
+                    parts.append(element.text or "")
+            elif in_cell and depth == body_depth + 2 and tag == TABLE_CELL:
+                rows[-1].append(normalise_text("".join(parts)))
+                in_cell = False
+            elif in_row and depth == body_depth + 1 and tag == TABLE_ROW:
+                in_row = False
+                element.clear()
+            elif element is block:
+                block = None
+                body.clear()
+                if tag == PARAGRAPH:
+                    text = normalise_text("".join(parts))
+                    if text and not text.lower().startswith("hvem bor"):
+                        current_school = text.rstrip(":")
+                elif current_school and not current_school.lower().startswith("skolefordeling"):
+                    yield current_school, rows
 
 
 TEAM_LABEL_SPLIT = re.compile(r"(\d[\d\s]*)")
@@ -168,13 +187,11 @@ def parse_team_rows(rows: List[List[str]]) -> List[Dict[str, Optional[str]]]:
 
 
 def parse_all_allocations() -> Dict[str, List[Dict[str, Optional[str]]]]:
-    school_tables = parse_school_tables()
     allocations: Dict[str, List[Dict[str, Optional[str]]]] = defaultdict(list)
-    for school, tables in school_tables.items():
-        for table in tables:
-            team_rows = parse_team_rows(table)
-            if team_rows:
-                allocations[school].extend(team_rows)
+    for school, table in iter_school_tables():
+        team_rows = parse_team_rows(table)
+        if team_rows:
+            allocations[school].extend(team_rows)
     return allocations
 
 
@@ -283,7 +300,7 @@ CREATE TABLE IF NOT EXISTS team_squads (
 """
 
 
-def build_database(allocations: Dict[str, List[Dict[str, Optional[str]]]]) -> None:
+def build_database(allocations: Dict[str, List[Dict[str, Optional[str]]]], dump: Optional[str] = None) -> None:
     if DB_PATH.exists():
         DB_PATH.unlink()
     conn = sqlite3.connect(DB_PATH)
@@ -356,16 +373,18 @@ def build_database(allocations: Dict[str, List[Dict[str, Optional[str]]]]) -> No
 
     conn.commit()
 
-    with SQL_DUMP_PATH.open("w", encoding="utf-8") as dump:
-        for line in conn.iterdump():
-            dump.write(f"{line}\n")
+    write_dump(conn, DB_PATH, dump)
 
     conn.close()
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build data/build/lodging.db from the lodging docx.")
+    add_dump_argument(parser)
+    args = parser.parse_args(argv)
+
     allocations = parse_all_allocations()
-    build_database(allocations)
+    build_database(allocations, dump=args.dump)
     print(f"Created {DB_PATH} with {sum(len(v) for v in allocations.values())} team rows.")
 
 
@@ -5,76 +5,138 @@ ETL pipeline for the tournament schedule in
 
 Outputs:
     data/build/tournament.db
-    data/build/tournament.sql
+    data/build/tournament.sql.gz (only with `--dump`)
 """
 
 from __future__ import annotations
 
+import argparse
 import re
 import sqlite3
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from zipfile import ZipFile
 
+from sql_dump import add_dump_argument, write_dump
+
 ROOT = Path(__file__).resolve().parent.parent
 XLSX_PATH = ROOT / "Kampoppsett EYC 25 - 27 april 2025 (1).xlsx"
 DB_PATH = ROOT / "data" / "build" / "tournament.db"
-SQL_DUMP_PATH = ROOT / "data" / "build" / "tournament.sql"
 
-NS = {"a": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+DOC_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+CELL_REF_RE = re.compile(r"([A-Z]+)(\d+)")
+# Tid, turnering, kamp, hall, hjemme, borte.
+MIN_COLUMNS = 6
 
 BIRTH_YEAR_BASE = 2024
 
 
-def read_sheet() -> List[List[str]]:
-    if not XLSX_PATH.exists():
-        raise FileNotFoundError(f"Missing source spreadsheet: {XLSX_PATH}")
+def column_index(letters: str) -> int:
+    """Zero-based column number for a reference like 'A', 'F' or 'AB'."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def inline_text(element: ET.Element) -> str:
+    return "".join(t.text or "" for t in element.iter(f"{MAIN_NS}t"))
+
+
+def read_shared_strings(zf: ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    shared_strings: List[str] = []
+    with zf.open("xl/sharedStrings.xml") as handle:
+        for _, element in ET.iterparse(handle):
+            if element.tag == f"{MAIN_NS}si":
+                shared_strings.append(inline_text(element))
+                element.clear()
+    return shared_strings
+
+
+def sheet_members(zf: ZipFile) -> List[Tuple[str, str]]:
+    """(sheet name, zip member) for every worksheet, in workbook tab order."""
+    targets: Dict[str, str] = {}
+    for rel in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")).iter(f"{PACKAGE_REL_NS}Relationship"):
+        target = rel.attrib["Target"]
+        targets[rel.attrib["Id"]] = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+
+    workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+    return [
+        (sheet.attrib["name"], targets[sheet.attrib[f"{DOC_REL_NS}id"]])
+        for sheet in workbook.iter(f"{MAIN_NS}sheet")
+    ]
+
+
+def iter_sheet_rows(zf: ZipFile, member: str, shared_strings: List[str]) -> Iterator[List[str]]:
+    """
+    Stream the rows of one worksheet as lists of stripped cell texts.
+
+    Rows are at least MIN_COLUMNS wide (A-F) and as wide as their right-most
+    cell, with empty strings for blank cells. Each row element is dropped
+    from the tree once read, so memory does not grow with the sheet.
+    """
+    sheet_data: Optional[ET.Element] = None
+    with zf.open(member) as handle:
+        for event, element in ET.iterparse(handle, events=("start", "end")):
+            if event == "start":
+                if element.tag == f"{MAIN_NS}sheetData":
+                    sheet_data = element
+                continue
+            if element.tag != f"{MAIN_NS}row":
+                continue
 
-    with ZipFile(XLSX_PATH) as zf:
-        shared_strings: List[str] = []
-        if "xl/sharedStrings.xml" in zf.namelist():
-            shared_root = ET.fromstring(zf.read("xl/sharedStrings.xml"))
-            for si in shared_root.findall(".//a:si", NS):
-                text = "".join(t.text or "" for t in si.findall(".//a:t", NS))
-                shared_strings.append(text)
+            row_cells: Dict[int, str] = {}
+            col = -1
+            for cell in element.iter(f"{MAIN_NS}c"):
+                match = CELL_REF_RE.match(cell.attrib.get("r", ""))
+                # A cell without a reference follows the previous one.
+                col = column_index(match.group(1)) if match else col + 1
+                text = ""
+                value = cell.find(f"{MAIN_NS}v")
+                if value is not None:
+                    if cell.attrib.get("t") == "s":
+                        idx = int(value.text)
+                        text = shared_strings[idx] if idx < len(shared_strings) else ""
+                    else:
+                        text = value.text or ""
+                else:
+                    inline = cell.find(f"{MAIN_NS}is")
+                    if inline is not None:
+                        text = inline_text(inline)
+                row_cells[col] = text
 
-        sheet_root = ET.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+            width = max(MIN_COLUMNS, max(row_cells, default=-1) + 1)
+            yield [row_cells.get(offset, "").strip() for offset in range(width)]
 
-    rows: List[List[str]] = []
-    for row in sheet_root.findall(".//a:row", NS):
-        row_cells: Dict[str, str] = {}
-        for cell in row.findall("a:c", NS):
-            ref = cell.attrib.get("r", "")
-            match = re.match(r"([A-Z]+)(\d+)", ref)
-            if not match:
-                continue
-            col = match.group(1)
-            cell_type = cell.attrib.get("t")
-            text = ""
-            value = cell.find("a:v", NS)
-            if value is not None:
-                if cell_type == "s":
-                    idx = int(value.text)
-                    text = shared_strings[idx] if idx < len(shared_strings) else ""
-                else:
-                    text = value.text or ""
+            if sheet_data is not None:
+                sheet_data.clear()
             else:
-                inline = cell.find("a:is", NS)
-                if inline is not None:
-                    text = "".join(t.text or "" for t in inline.findall(".//a:t", NS))
-            row_cells[col] = text
+                element.clear()
 
-        # Determine number of columns (A-F expected).
-        max_col = 6
-        current_row: List[str] = []
-        for offset in range(max_col):
-            col_letter = chr(ord("A") + offset)
-            current_row.append(row_cells.get(col_letter, ""))  # default empty string
-        rows.append([cell.strip() for cell in current_row])
 
-    return rows
+def iter_sheets(path: Path = XLSX_PATH) -> Iterator[Tuple[str, Iterator[List[str]]]]:
+    """Yield (sheet name, streamed rows) for every worksheet in the workbook."""
+    if not path.exists():
+        raise FileNotFoundError(f"Missing source spreadsheet: {path}")
+
+    with ZipFile(path) as zf:
+        shared_strings = read_shared_strings(zf)
+        for name, member in sheet_members(zf):
+            yield name, iter_sheet_rows(zf, member, shared_strings)
+
+
+def read_sheet(path: Path = XLSX_PATH, name: Optional[str] = None) -> List[List[str]]:
+    """All rows of one worksheet (the first one unless `name` is given)."""
+    for sheet_name, rows in iter_sheets(path):
+        if name is None or sheet_name == name:
+            return list(rows)
+    raise KeyError(f"No sheet named {name!r} in {path}")
 
 
 DAY_NAMES = {
@@ -117,7 +179,7 @@ def convert_time(value: str) -> str:
         raise
 
 
-def parse_schedule(rows: List[List[str]]) -> List[Dict[str, str]]:
+def parse_schedule(rows: Iterable[List[str]]) -> List[Dict[str, str]]:
     games: List[Dict[str, str]] = []
     current_hall: Optional[str] = None
     current_day_label: Optional[str] = None
@@ -262,7 +324,7 @@ CREATE INDEX IF NOT EXISTS idx_games_lookup
 """
 
 
-def build_database(games: List[Dict[str, str]]) -> None:
+def build_database(games: List[Dict[str, str]], dump: Optional[str] = None) -> None:
     if DB_PATH.exists():
         DB_PATH.unlink()
     conn = sqlite3.connect(DB_PATH)
@@ -331,17 +393,21 @@ def build_database(games: List[Dict[str, str]]) -> None:
 
     conn.commit()
 
-    with SQL_DUMP_PATH.open("w", encoding="utf-8") as dump:
-        for line in conn.iterdump():
-            dump.write(f"{line}\n")
+    write_dump(conn, DB_PATH, dump)
 
     conn.close()
 
 
-def main() -> None:
-    rows = read_sheet()
-    games = parse_schedule(rows)
-    build_database(games)
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build data/build/tournament.db from the match schedule xlsx.")
+    add_dump_argument(parser)
+    args = parser.parse_args(argv)
+
+    games: List[Dict[str, str]] = []
+    for _, rows in iter_sheets():
+        # Each sheet starts without a day or hall heading in effect.
+        games.extend(parse_schedule(rows))
+    build_database(games, dump=args.dump)
     print(f"Created {DB_PATH} with {len(games)} games.")
 
 
@@ -1,13 +1,26 @@
 #!/usr/bin/env python3
-"""Export a single squad itinerary as JSON (baseline for PDF generation)."""
+"""Export squad itineraries as JSON (baseline for PDF generation).
+
+Usage:
+    python3 scripts/export_itinerary.py --alias-id 1
+    python3 scripts/export_itinerary.py --all --format ndjson --output output/itineraries.ndjson
+
+`--all` streams every alias in one pass: `vw_team_alignment` is evaluated
+once, and `vw_team_itinerary_flat` / `vw_manual_transport_needs` are each
+read with a single scan ordered by alias. The rows are grouped in Python
+and every itinerary is written as soon as it is complete, so memory use
+does not grow with the number of teams.
+"""
 
 from __future__ import annotations
 
 import argparse
+import itertools
 import json
 import sqlite3
+import sys
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, TextIO
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT / "data" / "build" / "event_planner.db"
@@ -42,28 +55,16 @@ def fetch_alias_id(conn: sqlite3.Connection, args: argparse.Namespace) -> int:
     raise ValueError("Provide either --alias-id or --team-name")
 
 
-def fetch_itinerary(conn: sqlite3.Connection, alias_id: int) -> Dict:
-    header = conn.execute(
-        """
-        SELECT DISTINCT
+HEADER_COLUMNS = """
             alias_id,
             lodging_club,
             raw_label,
             schedule_team_name,
             school_name,
             headcount,
-            room_codes
-        FROM vw_team_alignment
-        WHERE alias_id = ?
-        """,
-        (alias_id,),
-    ).fetchone()
-    if header is None:
-        raise ValueError(f"Alias {alias_id} not found in vw_team_alignment")
+            room_codes"""
 
-    rows = conn.execute(
-        """
-        SELECT
+SEGMENT_COLUMNS = """
             alias_id,
             sequence_no,
             segment_type,
@@ -80,16 +81,12 @@ def fetch_itinerary(conn: sqlite3.Connection, alias_id: int) -> Dict:
             trip_index,
             travel_minutes,
             buffer_minutes,
-            notes
-        FROM vw_team_itinerary_flat
-        WHERE alias_id = ?
-        ORDER BY
-            CASE service_day WHEN 'fri' THEN 0 WHEN 'sat' THEN 1 WHEN 'sun' THEN 2 ELSE 3 END,
-            sequence_no
-        """,
-        (alias_id,),
-    ).fetchall()
+            notes"""
 
+SERVICE_DAY_SORT = "CASE service_day WHEN 'fri' THEN 0 WHEN 'sat' THEN 1 WHEN 'sun' THEN 2 ELSE 3 END"
+
+
+def build_itinerary(header: sqlite3.Row, rows: List[sqlite3.Row], manual_segments: List[sqlite3.Row]) -> Dict:
     days: Dict[str, List[Dict]] = {}
     for row in rows:
         day_key = row["event_date"] or f"service:{row['service_day']}"
@@ -109,18 +106,6 @@ def fetch_itinerary(conn: sqlite3.Connection, alias_id: int) -> Dict:
             }
         )
 
-    manual_segments = conn.execute(
-        """
-        SELECT service_day, event_date, start_time, end_time, notes
-        FROM vw_manual_transport_needs
-        WHERE alias_id = ?
-        ORDER BY
-            CASE service_day WHEN 'fri' THEN 0 WHEN 'sat' THEN 1 WHEN 'sun' THEN 2 ELSE 3 END,
-            start_time
-        """,
-        (alias_id,),
-    ).fetchall()
-
     return {
         "alias_id": header["alias_id"],
         "lodging_club": header["lodging_club"],
@@ -136,20 +121,149 @@ def fetch_itinerary(conn: sqlite3.Connection, alias_id: int) -> Dict:
                 key=lambda kv: (SERVICE_DAY_ORDER.get(kv[0][:3], 99), kv[0]),
             )
         ],
-        "manual_transport": [dict(row) for row in manual_segments],
+        "manual_transport": [
+            {key: row[key] for key in ("service_day", "event_date", "start_time", "end_time", "notes")}
+            for row in manual_segments
+        ],
     }
 
 
+def fetch_itinerary(conn: sqlite3.Connection, alias_id: int) -> Dict:
+    header = conn.execute(
+        f"""
+        SELECT DISTINCT{HEADER_COLUMNS}
+        FROM vw_team_alignment
+        WHERE alias_id = ?
+        """,
+        (alias_id,),
+    ).fetchone()
+    if header is None:
+        raise ValueError(f"Alias {alias_id} not found in vw_team_alignment")
+
+    rows = conn.execute(
+        f"""
+        SELECT{SEGMENT_COLUMNS}
+        FROM vw_team_itinerary_flat
+        WHERE alias_id = ?
+        ORDER BY {SERVICE_DAY_SORT}, sequence_no
+        """,
+        (alias_id,),
+    ).fetchall()
+
+    manual_segments = conn.execute(
+        f"""
+        SELECT service_day, event_date, start_time, end_time, notes
+        FROM vw_manual_transport_needs
+        WHERE alias_id = ?
+        ORDER BY {SERVICE_DAY_SORT}, start_time
+        """,
+        (alias_id,),
+    ).fetchall()
+
+    return build_itinerary(header, rows, manual_segments)
+
+
+class _AliasGroups:
+    """Rows from a cursor ordered by alias_id, handed out one alias at a time."""
+
+    def __init__(self, cursor: sqlite3.Cursor) -> None:
+        self._groups = itertools.groupby(cursor, key=lambda row: row["alias_id"])
+        self._next = next(self._groups, None)
+
+    def take(self, alias_id: int) -> List[sqlite3.Row]:
+        # Aliases come in the same order as the headers; one without rows gets [].
+        if self._next is None or self._next[0] != alias_id:
+            return []
+        rows = list(self._next[1])
+        self._next = next(self._groups, None)
+        return rows
+
+
+def iter_itineraries(conn: sqlite3.Connection) -> Iterator[Dict]:
+    """Yield every alias's itinerary, in alias order, from one ordered scan per view."""
+    headers = conn.execute(
+        f"""
+        SELECT DISTINCT{HEADER_COLUMNS}
+        FROM vw_team_alignment
+        ORDER BY alias_id
+        """
+    )
+    segments = _AliasGroups(
+        conn.execute(
+            f"""
+            SELECT{SEGMENT_COLUMNS}
+            FROM vw_team_itinerary_flat
+            ORDER BY alias_id, {SERVICE_DAY_SORT}, sequence_no
+            """
+        )
+    )
+    manual_segments = _AliasGroups(
+        conn.execute(
+            f"""
+            SELECT alias_id, service_day, event_date, start_time, end_time, notes
+            FROM vw_manual_transport_needs
+            ORDER BY alias_id, {SERVICE_DAY_SORT}, start_time
+            """
+        )
+    )
+    for header in headers:
+        alias_id = header["alias_id"]
+        yield build_itinerary(header, segments.take(alias_id), manual_segments.take(alias_id))
+
+
+def write_itineraries(itineraries: Iterator[Dict], fmt: str, out: TextIO) -> int:
+    """Write itineraries as NDJSON (one object per line) or as one JSON array; returns the count."""
+    count = 0
+    if fmt == "json":
+        out.write("[")
+    for itinerary in itineraries:
+        if fmt == "ndjson":
+            out.write(json.dumps(itinerary, ensure_ascii=False))
+            out.write("\n")
+        else:
+            out.write(",\n" if count else "\n")
+            out.write(json.dumps(itinerary, indent=2, ensure_ascii=False))
+        count += 1
+    if fmt == "json":
+        out.write("\n]\n" if count else "]\n")
+    return count
+
+
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Export itinerary for a single alias as JSON.")
+    parser = argparse.ArgumentParser(description="Export itineraries as JSON.")
     parser.add_argument("--alias-id", type=int, help="Alias ID from vw_team_alignment")
     parser.add_argument("--team-name", help="Schedule team name (vw_team_alignment.schedule_team_name)")
+    parser.add_argument("--all", action="store_true", help="Stream every alias in one pass")
+    parser.add_argument(
+        "--format",
+        choices=("json", "ndjson"),
+        default="json",
+        help="--all output: one JSON array (default) or one itinerary per line",
+    )
+    parser.add_argument("--output", type=Path, help="Write to this file instead of stdout")
     args = parser.parse_args()
+    if args.all and (args.alias_id is not None or args.team_name):
+        parser.error("--all cannot be combined with --alias-id/--team-name")
 
     with get_connection() as conn:
-        alias_id = fetch_alias_id(conn, args)
-        itinerary = fetch_itinerary(conn, alias_id)
-        print(json.dumps(itinerary, indent=2, ensure_ascii=False))
+        if not args.all:
+            alias_id = fetch_alias_id(conn, args)
+            itinerary = fetch_itinerary(conn, alias_id)
+            text = json.dumps(itinerary, indent=2, ensure_ascii=False)
+            if args.output is None:
+                print(text)
+            else:
+                args.output.parent.mkdir(parents=True, exist_ok=True)
+                args.output.write_text(text + "\n", encoding="utf-8")
+            return
+
+        if args.output is None:
+            write_itineraries(iter_itineraries(conn), args.format, sys.stdout)
+            return
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with args.output.open("w", encoding="utf-8") as out:
+            count = write_itineraries(iter_itineraries(conn), args.format, out)
+        print(f"Exported {count} itineraries to {args.output}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -3,22 +3,214 @@
 Generate PDF itineraries for all 80 team aliases.
 
 Usage:
-    python3 scripts/generate_all_pdfs.py
+    python3 scripts/generate_all_pdfs.py [--jobs N] [--force]
+
+All PDFs are rendered in this process with `render_pdf.render_pdf`: one
+database connection, four bulk queries for every alias (or per chunk of
+`FETCH_CHUNK_SIZE` aliases when only some are stale), and one parsed copy
+of the fonts (`FontCache`) shared by the whole batch.
+
+With `--jobs N` the aliases are split into small chunks and rendered by a
+pool of N processes. Each worker opens its own read-only connection and
+font cache once, then renders chunk after chunk. Results are printed in
+alias order, like a sequential run.
+
+Each alias's render inputs (header, `vw_team_itinerary_flat` rows, manual
+transport needs and games) are hashed, and the hash and file name of the
+last PDF are stored in `output/itineraries.manifest.json`. Only aliases
+whose hash changed, or whose PDF is missing, are rendered again; the PDF
+they replace is removed. `--force` re-renders everything (e.g. after a
+layout change in `render_pdf.py`).
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import math
 import sqlite3
-import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from render_pdf import (
+    FontCache,
+    fetch_all_games,
+    fetch_all_headers,
+    fetch_all_itineraries,
+    fetch_all_manual_segments,
+    output_filename,
+    render_pdf,
+)
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT / "data" / "build" / "event_planner.db"
 OUTPUT_DIR = ROOT / "output" / "itineraries"
+MANIFEST_PATH = ROOT / "output" / "itineraries.manifest.json"
+# Bump to invalidate every manifest entry when the hashed inputs change shape.
+MANIFEST_VERSION = 1
+
+
+# Chunks per worker: small enough to balance uneven aliases across the pool.
+CHUNKS_PER_JOB = 4
+
+# Aliases per bulk fetch when only some are rendered: keeps each `alias_id IN (...)` short.
+FETCH_CHUNK_SIZE = 100
+
+# Per-process state for --jobs workers, set up once by _init_worker.
+_worker_conn: Optional[sqlite3.Connection] = None
+_worker_fonts: Optional[FontCache] = None
+
+
+def render_input_hashes(conn: sqlite3.Connection) -> Dict[int, str]:
+    """sha256 per alias over everything render_pdf() draws from."""
+    headers = fetch_all_headers(conn)
+    itineraries = fetch_all_itineraries(conn)
+    manual_segments = fetch_all_manual_segments(conn)
+    games = fetch_all_games(conn)
+    hashes: Dict[int, str] = {}
+    for alias_id, header in headers.items():
+        payload = [
+            header,
+            itineraries.get(alias_id, []),
+            manual_segments.get(alias_id, []),
+            games.get(alias_id, []),
+        ]
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        hashes[alias_id] = hashlib.sha256(encoded).hexdigest()
+    return hashes
+
+
+def load_manifest(path: Path) -> Dict[int, Dict[str, str]]:
+    """Manifest entries {alias_id: {"hash", "file"}}; empty if missing, unreadable or outdated."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return {int(alias_id): entry for alias_id, entry in data.get("aliases", {}).items()}
+
+
+def save_manifest(path: Path, entries: Dict[int, Dict[str, str]]) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "aliases": {str(alias_id): entries[alias_id] for alias_id in sorted(entries)},
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def stale_aliases(
+    hashes: Dict[int, str], manifest: Dict[int, Dict[str, str]], output_dir: Path, force: bool = False
+) -> List[int]:
+    """Aliases whose inputs changed since the manifest was written or whose PDF is gone."""
+    stale = []
+    for alias_id, digest in hashes.items():
+        entry = manifest.get(alias_id)
+        if force or entry is None or entry["hash"] != digest or not (output_dir / entry["file"]).exists():
+            stale.append(alias_id)
+    return stale
+
+
+def render_aliases(
+    conn: sqlite3.Connection,
+    alias_ids: Sequence[int],
+    fonts: FontCache,
+    output_dir: Path,
+    timestamp: str,
+    every_alias: bool = False,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    """Render PDFs for `alias_ids`, yielding (alias_id, error or None) as each one finishes.
+
+    With `every_alias` (`alias_ids` covers every header) the inputs are fetched unfiltered;
+    otherwise they are fetched `FETCH_CHUNK_SIZE` aliases at a time.
+    """
+    if every_alias:
+        yield from _render_batch(conn, None, alias_ids, fonts, output_dir, timestamp)
+        return
+    for i in range(0, len(alias_ids), FETCH_CHUNK_SIZE):
+        chunk = alias_ids[i : i + FETCH_CHUNK_SIZE]
+        yield from _render_batch(conn, chunk, chunk, fonts, output_dir, timestamp)
 
 
-def main() -> None:
+def _render_batch(
+    conn: sqlite3.Connection,
+    fetch_ids: Optional[Sequence[int]],
+    alias_ids: Sequence[int],
+    fonts: FontCache,
+    output_dir: Path,
+    timestamp: str,
+) -> Iterator[Tuple[int, Optional[str]]]:
+    headers = fetch_all_headers(conn, fetch_ids)
+    itineraries = fetch_all_itineraries(conn, fetch_ids)
+    manual_segments = fetch_all_manual_segments(conn, fetch_ids)
+    games = fetch_all_games(conn, fetch_ids)
+    for alias_id in alias_ids:
+        try:
+            header = headers[alias_id]
+            output_path = output_dir / output_filename(alias_id, header["schedule_team_name"], "pdf", timestamp)
+            render_pdf(
+                header,
+                itineraries.get(alias_id, []),
+                manual_segments.get(alias_id, []),
+                games.get(alias_id, []),
+                output_path,
+                fonts=fonts,
+            )
+        except Exception as e:
+            yield alias_id, str(e)
+        else:
+            yield alias_id, None
+
+
+def _init_worker(db_path: Path) -> None:
+    global _worker_conn, _worker_fonts
+    _worker_conn = sqlite3.connect(f"{db_path.as_uri()}?mode=ro", uri=True)
+    _worker_conn.row_factory = sqlite3.Row
+    _worker_fonts = FontCache()
+
+
+def render_alias_chunk(alias_ids: List[int], output_dir: Path, timestamp: str) -> List[Tuple[int, Optional[str]]]:
+    """Worker entry point: render a chunk with the worker's connection and font cache."""
+    return list(render_aliases(_worker_conn, alias_ids, _worker_fonts, output_dir, timestamp))
+
+
+def chunk_aliases(alias_ids: List[int], jobs: int) -> List[List[int]]:
+    size = max(1, math.ceil(len(alias_ids) / (jobs * CHUNKS_PER_JOB)))
+    return [alias_ids[i : i + size] for i in range(0, len(alias_ids), size)]
+
+
+def render_in_pool(
+    alias_ids: List[int], jobs: int, output_dir: Path, timestamp: str
+) -> Iterator[Tuple[int, Optional[str]]]:
+    chunks = chunk_aliases(alias_ids, jobs)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(DB_PATH,)) as pool:
+        for chunk_result in pool.map(render_alias_chunk, chunks, [output_dir] * len(chunks), [timestamp] * len(chunks)):
+            yield from chunk_result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate PDF itineraries for every team alias.")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Render in N worker processes (default 1: in this process)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render every alias, even if its inputs match the manifest",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
     if not DB_PATH.exists():
         print(f"Error: Database not found at {DB_PATH}")
         print("Run the build scripts first:")
@@ -31,55 +223,55 @@ def main() -> None:
         sys.exit(1)
 
     conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("""
-        SELECT alias_id, lodging_club, raw_label, schedule_team_name
-        FROM vw_team_alignment
-        ORDER BY alias_id
-    """)
-    aliases = cur.fetchall()
-    conn.close()
+    conn.row_factory = sqlite3.Row
+    headers = fetch_all_headers(conn)
 
-    if not aliases:
+    if not headers:
         print("Error: No team aliases found in database")
         sys.exit(1)
 
-    print(f"Generating PDFs for {len(aliases)} teams...")
+    hashes = render_input_hashes(conn)
+    manifest = load_manifest(MANIFEST_PATH)
+    alias_ids = stale_aliases(hashes, manifest, OUTPUT_DIR, force=args.force)
+    unchanged_count = len(headers) - len(alias_ids)
+    print(f"Generating PDFs for {len(alias_ids)} teams ({unchanged_count} unchanged since last run)...")
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     success_count = 0
     fail_count = 0
     failed_aliases = []
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.jobs > 1:
+        results = render_in_pool(alias_ids, args.jobs, OUTPUT_DIR, timestamp)
+    else:
+        every_alias = set(alias_ids) == set(headers)
+        results = render_aliases(conn, alias_ids, FontCache(), OUTPUT_DIR, timestamp, every_alias=every_alias)
 
-    for alias_id, club, label, schedule_name in aliases:
-        try:
-            result = subprocess.run(
-                [
-                    sys.executable,
-                    "scripts/render_pdf.py",
-                    "--alias-id",
-                    str(alias_id),
-                    "--output",
-                    str(OUTPUT_DIR),
-                ],
-                capture_output=True,
-                text=True,
-                timeout=30,
-            )
-            if result.returncode == 0:
-                success_count += 1
-                print(f"  ✓ {alias_id:3}: {schedule_name:30} ({club} - {label})")
-            else:
-                fail_count += 1
-                failed_aliases.append((alias_id, schedule_name, result.stderr))
-                print(f"  ✗ {alias_id:3}: {schedule_name:30} FAILED")
-        except Exception as e:
+    # Aliases that disappeared from the database no longer belong in the manifest.
+    manifest = {alias_id: entry for alias_id, entry in manifest.items() if alias_id in headers}
+    for alias_id, error in results:
+        header = headers[alias_id]
+        schedule_name = header["schedule_team_name"]
+        if error is None:
+            success_count += 1
+            filename = output_filename(alias_id, schedule_name, "pdf", timestamp)
+            previous = manifest.get(alias_id)
+            if previous is not None and previous["file"] != filename:
+                (OUTPUT_DIR / previous["file"]).unlink(missing_ok=True)
+            manifest[alias_id] = {"hash": hashes[alias_id], "file": filename}
+            print(f"  ✓ {alias_id:3}: {schedule_name:30} ({header['lodging_club']} - {header['raw_label']})")
+        else:
             fail_count += 1
-            failed_aliases.append((alias_id, schedule_name, str(e)))
-            print(f"  ✗ {alias_id:3}: {schedule_name:30} ERROR: {e}")
+            manifest.pop(alias_id, None)
+            failed_aliases.append((alias_id, schedule_name, error))
+            print(f"  ✗ {alias_id:3}: {schedule_name:30} ERROR: {error}")
+    conn.close()
+    save_manifest(MANIFEST_PATH, manifest)
 
     print(f"\nGeneration complete:")
-    print(f"  Success: {success_count}/{len(aliases)}")
-    print(f"  Failed:  {fail_count}/{len(aliases)}")
+    print(f"  Success:   {success_count}/{len(alias_ids)}")
+    print(f"  Failed:    {fail_count}/{len(alias_ids)}")
+    print(f"  Unchanged: {unchanged_count}/{len(headers)}")
 
     if failed_aliases:
         print("\nFailed teams:")
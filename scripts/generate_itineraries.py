@@ -10,20 +10,71 @@ Heuristics:
 - Indfør et kapacitetstjek (default 120 personer pr. tur); hvis alle alternativer
   er fulde, registreres et “capacity override” i segmentnoten.
 - Efter hver dags sidste aktivitet tilføjes returrejse til overnatningsskolen.
+
+`--workers N` planlægger grupper af hold (pr. overnatningsskole) parallelt i
+en process pool, hver mod de øvrige holds busben fra den gemte plan. Hver
+workers kapacitetstjek logges pr. hold og afspilles i den sekventielle
+rækkefølge mod én fælles BusLoadTracker; hold hvor et tjek giver et andet svar,
+planlægges om, så resultatet er som den sekventielle kørsel ved enhver kapacitet.
+
+`--changed-games 123,456` (eller `--changed-games auto`, som sammenligner
+`schedule_games` med `itinerary_game_snapshot` fra sidste kørsel) planlægger kun
+de berørte hold om. Busbelastningen læses fra `bus_trip_loads`, de berørte
+holds busser frigives, og deres segmenter omskrives i én transaktion.
+
+`bus_trip_loads` (headcount + version pr. tur) summerer de gemte bussegmenter
+og opdateres i samme transaktion som `insert_segments`.
+
+Segmenter er `Segment`-objekter med tider i minutter; "HH:MM" laves først ved
+skrivning, og hvert holds segmenter returneres kronologisk sorteret.
+
+Ved en fuld kørsel skrives alle segmenter i én transaktion med én
+`executemany` pr. kombination af udfyldte kolonner (WAL + `synchronous=NORMAL`
+under kørslen); det unikke indeks på (alias_id, sequence_no) bygges først
+efter indlæsningen.
+
+`--profile-sql` måler hver SQL-skabelon (antal kald, samlet tid, p95, rækker)
+via en proxy om forbindelsen og skriver en rapport med `EXPLAIN QUERY PLAN`
+for de dyreste til `output/profile/` (se `sql_profile.py`).
+
+Planlægningen af hvert hold måles (væg-tid, routing-kald, multi-leg-forsøg
+og frigivne busben, talt på `BusLoadTracker.counters`) og gemmes i
+`planner_metrics`; et histogram og de `--slowest N` langsomste hold udskrives.
+
+`--assignment flow` fordeler først alle kamprejser globalt med min-cost flow
+(hold × busture, ≥40 min buffer som hård grænse, ventetid som omkostning) og
+reserverer de valgte ture, før den almindelige planlægning kører.
 """
 
 from __future__ import annotations
 
+import argparse
 import sqlite3
+import time
+from bisect import bisect_right
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from itertools import compress
+from operator import attrgetter
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from min_cost_flow import MinCostFlow
+from sql_profile import SqlProfiler, publish_report
+from timetable import (
+    MINUTES_PER_DAY,
+    TRANSFER_BUFFER_MIN,
+    TimetableIndex,
+    TripOption,
+    earliest_arrival_journey,
+    minutes_to_time,
+    time_to_minutes,
+)
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT / "data" / "build" / "event_planner.db"
 
-MINUTES_PER_DAY = 24 * 60
 LUNCH_DURATION = 45
 LUNCH_TRAVEL_PADDING = 30
 LUNCH_RETURN_PADDING = 15
@@ -34,6 +85,84 @@ CONCERT_BUFFER_MIN = 20  # ≥20 minutter før koncertstart
 CONCERT_SOFT_EARLIEST = 17 * 60
 BUS_CAPACITY_LIMIT = 999
 
+DAY_ORDER = {"fri": 1, "sat": 2, "sun": 3}
+
+# team_itinerary_segments columns, in the order `write_segments` reads them from a Segment.
+SEGMENT_COLUMNS = (
+    "segment_type",
+    "ref_type",
+    "ref_id",
+    "service_day",
+    "start_time",
+    "end_time",
+    "origin_stop_id",
+    "destination_stop_id",
+    "travel_minutes",
+    "buffer_minutes",
+    "route_id",
+    "trip_index",
+    "departure_route_stop_time_id",
+    "arrival_route_stop_time_id",
+    "notes",
+)
+SEGMENT_VALUES = attrgetter(*SEGMENT_COLUMNS)
+CLOCK_TIMES = [minutes_to_time(minute) for minute in range(MINUTES_PER_DAY)]  # one shared "HH:MM" per minute
+PLAN_MS_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # upper bounds of the planning-time histogram
+SEGMENT_INDEX = "idx_segments_alias_sequence"
+SEGMENT_DAY_INDEX = "idx_segments_alias_day"
+# The team_itinerary_segments indexes from build_event_db.INDEX_SQL, rebuilt after a bulk load.
+SEGMENT_INDEXES: Dict[str, str] = {
+    SEGMENT_INDEX: f"CREATE UNIQUE INDEX IF NOT EXISTS {SEGMENT_INDEX} ON team_itinerary_segments(alias_id, sequence_no)",
+    SEGMENT_DAY_INDEX: (
+        f"CREATE INDEX IF NOT EXISTS {SEGMENT_DAY_INDEX} ON team_itinerary_segments(alias_id, service_day, sequence_no)"
+    ),
+}
+
+
+@dataclass(slots=True)
+class Segment:
+    """One itinerary step; start/end are minutes after midnight and only become "HH:MM" when written."""
+
+    segment_type: str
+    service_day: str
+    start_min: Optional[int]
+    end_min: Optional[int]
+    ref_type: Optional[str] = None
+    ref_id: Optional[int] = None
+    origin_stop_id: Optional[int] = None
+    destination_stop_id: Optional[int] = None
+    travel_minutes: Optional[int] = None
+    buffer_minutes: Optional[int] = None
+    route_id: Optional[int] = None
+    trip_index: Optional[int] = None
+    departure_route_stop_time_id: Optional[int] = None
+    arrival_route_stop_time_id: Optional[int] = None
+    notes: Optional[str] = None
+
+    @property
+    def start_time(self) -> Optional[str]:
+        return None if self.start_min is None else CLOCK_TIMES[self.start_min % MINUTES_PER_DAY]
+
+    @property
+    def end_time(self) -> Optional[str]:
+        return None if self.end_min is None else CLOCK_TIMES[self.end_min % MINUTES_PER_DAY]
+
+    def sort_key(self) -> Tuple[int, int]:
+        # Segments without a start time go last within their day.
+        return DAY_ORDER.get(self.service_day, 999), MINUTES_PER_DAY if self.start_min is None else self.start_min
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Segment":
+        """A stored `team_itinerary_segments` row."""
+        values = {column: row[column] for column in SEGMENT_COLUMNS if column not in ("start_time", "end_time")}
+        start, end = row["start_time"], row["end_time"]
+        return cls(
+            start_min=None if start is None else time_to_minutes(start),
+            end_min=None if end is None else time_to_minutes(end),
+            **values,
+        )
+
+
 HALL_NAME_ALIASES = {
     "Herneshallen - Kortbane": "Herneshallen",
     "Herneshallen - mini 1": "Herneshallen",
@@ -46,31 +175,61 @@ HALL_NAME_ALIASES = {
 }
 
 
-def time_to_minutes(value: str) -> int:
-    hours, minutes = value.split(":")
-    return int(hours) * 60 + int(minutes)
+@dataclass(slots=True)
+class PlannerCounters:
+    """Planner work since the last reset, counted on the tracker every planning function receives."""
+
+    routing_calls: int = 0  # direct-trip searches (timetable or candidate view) plus multi-leg searches
+    multi_leg_attempts: int = 0  # find_multi_leg_trip calls
+    capacity_releases: int = 0  # bus legs handed back to the tracker
 
 
-def minutes_to_time(minutes: int) -> str:
-    minutes = minutes % MINUTES_PER_DAY
-    hours, minute = divmod(minutes, 60)
-    return f"{hours:02d}:{minute:02d}"
+# (action, service_day, route_id, trip_index, headcount, fits): "fits" checks with their
+# answer, "assign"/"release" load changes (fits is always True for those).
+JournalEntry = Tuple[str, str, int, int, int, bool]
+# (service_day, route_id, trip_index, headcount) of one booked bus leg.
+BusLeg = Tuple[str, int, int, int]
 
 
 class BusLoadTracker:
-    """Track headcount per (service_day, route_id, trip_index)."""
+    """Track headcount per (service_day, route_id, trip_index).
 
-    def __init__(self, limit: int) -> None:
+    With a connection the starting loads come from `bus_trip_loads`, read on
+    first use; without one the tracker starts empty (full regeneration).
+
+    While `journal` is a list, every capacity check (with its answer) and every
+    load change is appended to it, so `replay` can redo a plan on another tracker.
+    """
+
+    def __init__(self, limit: int, conn: Optional[sqlite3.Connection] = None) -> None:
         self.limit = limit
+        self.counters = PlannerCounters()
+        self.journal: Optional[List[JournalEntry]] = None
+        self._conn = conn
         self._loads: Dict[Tuple[str, int, int], int] = defaultdict(int)
+        # (alias_id, game_id) -> (trip, headcount) held by the global assignment
+        self._reservations: Dict[Tuple[int, int], Tuple[TripOption, str, int]] = {}
+
+    def _ensure_loaded(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        for service_day, route_id, trip_index, headcount in conn.execute(
+            "SELECT service_day, route_id, trip_index, headcount FROM bus_trip_loads WHERE headcount > 0"
+        ):
+            self._loads[(service_day, route_id, trip_index)] = headcount
 
     def current(self, service_day: str, route_id: int, trip_index: int) -> int:
+        self._ensure_loaded()
         return self._loads.get((service_day, route_id, trip_index), 0)
 
     def can_assign(self, service_day: str, route_id: Optional[int], trip_index: Optional[int], headcount: int) -> bool:
         if route_id is None or trip_index is None:
             return True
-        return self.current(service_day, route_id, trip_index) + headcount <= self.limit
+        fits = self.current(service_day, route_id, trip_index) + headcount <= self.limit
+        if self.journal is not None:
+            self.journal.append(("fits", service_day, route_id, trip_index, headcount, fits))
+        return fits
 
     def assign(
         self,
@@ -87,6 +246,8 @@ class BusLoadTracker:
             return False
         key = (service_day, route_id, trip_index)
         self._loads[key] = self.current(service_day, route_id, trip_index) + headcount
+        if self.journal is not None:
+            self.journal.append(("assign", service_day, route_id, trip_index, headcount, True))
         return True
 
     def release(self, service_day: str, route_id: Optional[int], trip_index: Optional[int], headcount: int) -> None:
@@ -99,6 +260,49 @@ class BusLoadTracker:
             self._loads[key] = new_value
         elif key in self._loads:
             del self._loads[key]
+        if self.journal is not None:
+            self.journal.append(("release", service_day, route_id, trip_index, headcount, True))
+
+    def replay(self, journal: List[JournalEntry]) -> bool:
+        """Redo a journalled plan here if every capacity check gives the same answer; all-or-nothing.
+
+        A plan only depends on the tracker through these answers, so an accepted
+        replay leaves this tracker exactly as planning the squad here would have.
+        """
+        saved: Dict[Tuple[str, int, int], int] = {}
+        for action, service_day, route_id, trip_index, headcount, fits in journal:
+            key = (service_day, route_id, trip_index)
+            if key not in saved:
+                saved[key] = self.current(service_day, route_id, trip_index)
+            if action == "fits" and self.can_assign(service_day, route_id, trip_index, headcount) != fits:
+                for key, load in saved.items():
+                    self._loads.pop(key, None)
+                    if load:
+                        self._loads[key] = load
+                return False
+            if action == "assign":
+                self.assign(service_day, route_id, trip_index, headcount, force=True)
+            elif action == "release":
+                self.release(service_day, route_id, trip_index, headcount)
+        return True
+
+    def reserve(self, owner: Tuple[int, int], service_day: str, trip: TripOption, headcount: int) -> None:
+        """Hold a seat block for `owner` until it is claimed or released."""
+        self.assign(service_day, trip.route_id, trip.trip_index, headcount, force=True)
+        self._reservations[owner] = (trip, service_day, headcount)
+
+    def claim(self, owner: Tuple[int, int]) -> Optional[TripOption]:
+        """Give a reservation back to the pool and return its trip for the caller to assign."""
+        entry = self._reservations.pop(owner, None)
+        if entry is None:
+            return None
+        trip, service_day, headcount = entry
+        self.release(service_day, trip.route_id, trip.trip_index, headcount)
+        return trip
+
+    def release_reservations(self, alias_id: int) -> None:
+        for owner in [owner for owner in self._reservations if owner[0] == alias_id]:
+            self.claim(owner)
 
 
 @dataclass
@@ -108,6 +312,7 @@ class LookupData:
     school_stop_map: Dict[int, int]
     lunch_event: Optional[sqlite3.Row]
     concert_event: Optional[sqlite3.Row]
+    timetable: TimetableIndex
 
 
 def load_lookup_data(conn: sqlite3.Connection) -> LookupData:
@@ -156,6 +361,7 @@ def load_lookup_data(conn: sqlite3.Connection) -> LookupData:
         school_stop_map=school_stop_map,
         lunch_event=lunch_event,
         concert_event=concert_event,
+        timetable=TimetableIndex.from_connection(conn),
     )
 
 
@@ -184,64 +390,17 @@ def fetch_game_bus_candidates(conn: sqlite3.Connection, alias_id: int, game_id:
 
 
 def list_trips(
-    conn: sqlite3.Connection,
+    timetable: TimetableIndex,
     service_day: str,
     origin_stop_id: int,
     destination_stop_id: int,
     earliest_depart_min: int,
-) -> List[sqlite3.Row]:
-    earliest_depart = minutes_to_time(max(0, earliest_depart_min))
-    # For circular routes, we can't rely on stop_order < stop_order
-    # Instead, we use time-based filtering: arrival must be AFTER departure
-    return conn.execute(
-        """
-        SELECT
-            dep.route_id,
-            dep.trip_index,
-            dep.departure_time,
-            dep.route_stop_time_id AS departure_route_stop_time_id,
-            dep.stop_id AS departure_stop_id,
-            arr.route_stop_time_id AS arrival_route_stop_time_id,
-            arr.stop_id AS arrival_stop_id,
-            arr.departure_time AS arrival_time
-        FROM vw_transport_trip_instances dep
-        JOIN vw_transport_trip_instances arr
-          ON arr.route_id = dep.route_id
-         AND arr.service_day = dep.service_day
-         AND arr.trip_index = dep.trip_index
-        WHERE dep.service_day = ?
-          AND dep.stop_id = ?
-          AND arr.stop_id = ?
-          AND arr.departure_time > dep.departure_time
-          AND dep.departure_time >= ?
-        ORDER BY dep.departure_time
-        """,
-        (service_day, origin_stop_id, destination_stop_id, earliest_depart),
-    ).fetchall()
-
-
-def candidate_transfer_stops(
-    conn: sqlite3.Connection, service_day: str, destination_stop_id: int
-) -> List[int]:
-    rows = conn.execute(
-        """
-        SELECT DISTINCT dep.stop_id
-        FROM vw_transport_trip_instances dep
-        JOIN vw_transport_trip_instances arr
-          ON arr.route_id = dep.route_id
-         AND arr.service_day = dep.service_day
-         AND arr.trip_index = dep.trip_index
-        WHERE dep.service_day = ?
-          AND arr.stop_id = ?
-          AND dep.stop_order < arr.stop_order
-        """,
-        (service_day, destination_stop_id),
-    ).fetchall()
-    return [row["stop_id"] for row in rows]
+) -> List[TripOption]:
+    return timetable.trips_between(service_day, origin_stop_id, destination_stop_id, max(0, earliest_depart_min))
 
 
 def find_multi_leg_trip(
-    conn: sqlite3.Connection,
+    timetable: TimetableIndex,
     tracker: BusLoadTracker,
     service_day: str,
     origin_stop_id: int,
@@ -253,96 +412,62 @@ def find_multi_leg_trip(
     ref_type: str,
     ref_id: Optional[int],
     target_arrival_min: Optional[int] = None,
-) -> Tuple[Optional[List[Dict[str, Optional[object]]]], Optional[int]]:
-    transfer_candidates = set(candidate_transfer_stops(conn, service_day, destination_stop_id))
-    if not transfer_candidates:
+    transfer_buffer: int = TRANSFER_BUFFER_MIN,
+) -> Tuple[Optional[List[Segment]], Optional[int]]:
+    tracker.counters.routing_calls += 1
+    tracker.counters.multi_leg_attempts += 1
+    # The precomputed profile rules out unreachable targets without a scan.
+    if not timetable.may_reach(
+        service_day, origin_stop_id, destination_stop_id, earliest_depart_min, latest_arrival_min, transfer_buffer
+    ):
+        return None, None
+    # Earliest-arrival journey with any number of transfers; full trips are
+    # pruned during the scan so every leg can be assigned afterwards.
+    journey = earliest_arrival_journey(
+        timetable,
+        service_day,
+        origin_stop_id,
+        destination_stop_id,
+        max(0, earliest_depart_min),
+        latest_arrival_min=latest_arrival_min,
+        transfer_buffer=transfer_buffer,
+        can_board=lambda day, route_id, trip_index: tracker.can_assign(day, route_id, trip_index, headcount),
+    )
+    if not journey:
         return None, None
 
-    trips_from_origin = conn.execute(
-        """
-        SELECT route_id, trip_index, stop_order, departure_time
-        FROM vw_transport_trip_instances
-        WHERE service_day = ? AND stop_id = ? AND departure_time >= ?
-        ORDER BY departure_time
-        """,
-        (service_day, origin_stop_id, minutes_to_time(max(0, earliest_depart_min))),
-    ).fetchall()
-
-    transfer_buffer = 5
-
-    for trip in trips_from_origin:
-        route_id = trip["route_id"]
-        trip_index = trip["trip_index"]
-        origin_order = trip["stop_order"]
-
-        stops = conn.execute(
-            """
-            SELECT stop_id, stop_order, departure_time, route_stop_time_id
-            FROM vw_transport_trip_instances
-            WHERE service_day = ? AND route_id = ? AND trip_index = ? AND stop_order > ?
-            ORDER BY stop_order
-            """,
-            (service_day, route_id, trip_index, origin_order),
-        ).fetchall()
-
-        first_segment: Optional[Dict[str, Optional[object]]] = None
-        first_arrival_min: Optional[int] = None
-        first_mid_stop: Optional[int] = None
-
-        for stop in stops:
-            mid_stop = stop["stop_id"]
-            arrival_min = time_to_minutes(stop["departure_time"])
-            if latest_arrival_min is not None and arrival_min + transfer_buffer > latest_arrival_min:
-                break
-            if mid_stop not in transfer_candidates:
-                continue
-
-            first_segment, first_arrival_min, _ = select_trip_with_capacity(
-                conn,
-                tracker,
-                service_day,
-                origin_stop_id,
-                mid_stop,
-                earliest_depart_min,
-                headcount,
-                f"{note} (leg 1)",
-                ref_type,
-                ref_id,
-                latest_arrival_min=arrival_min,
-                allow_force=False,
-            )
-            if first_segment is None or first_arrival_min is None:
-                continue
-
-            second_segment, second_arrival_min, _ = select_trip_with_capacity(
-                conn,
-                tracker,
-                service_day,
-                mid_stop,
-                destination_stop_id,
-                max(first_arrival_min + transfer_buffer, earliest_depart_min),
-                headcount,
-                f"{note} (via transfer)",
-                ref_type,
-                ref_id,
-                latest_arrival_min=latest_arrival_min,
-                target_arrival_min=target_arrival_min,
-                allow_force=False,
-            )
-            if second_segment is None or second_arrival_min is None:
-                release_bus_segments(tracker, alias=None, segments=[first_segment], headcount=headcount)
-                continue
+    segments: List[Segment] = []
+    for leg_no, leg in enumerate(journey, start=1):
+        if not tracker.assign(service_day, leg.route_id, leg.trip_index, headcount):
+            release_bus_segments(tracker, alias=None, segments=segments, headcount=headcount)
+            return None, None
+        if len(journey) == 1:
+            leg_note = note
+        elif leg_no == 1:
+            leg_note = f"{note} (leg 1)"
+        else:
+            leg_note = f"{note} (via transfer)"
+        if leg_no < len(journey):
+            buffer_minutes: Optional[int] = journey[leg_no].departure_min - leg.arrival_min
+        elif target_arrival_min is not None:
+            buffer_minutes = target_arrival_min - leg.arrival_min
+        elif latest_arrival_min is not None:
+            buffer_minutes = latest_arrival_min - leg.arrival_min
+        else:
+            buffer_minutes = None
+        segments.append(
+            build_bus_segment_from_trip(leg, service_day, ref_type, ref_id, leg_note, buffer_minutes=buffer_minutes)
+        )
+    return segments, journey[-1].arrival_min
 
-            return [first_segment, second_segment], second_arrival_min
 
-    return None, None
 def build_bus_segment_from_candidate(
     candidate: sqlite3.Row,
     ref_type: str,
     ref_id: Optional[int],
     note: str,
     buffer_override: Optional[int] = None,
-) -> Dict[str, Optional[object]]:
+) -> Segment:
     travel_minutes = candidate["travel_minutes"]
     if travel_minutes is not None:
         travel_minutes = int(travel_minutes)
@@ -351,134 +476,98 @@ def build_bus_segment_from_candidate(
         buffer_minutes = buffer_override
     if buffer_minutes is not None:
         buffer_minutes = int(buffer_minutes)
-    return {
-        "segment_type": "bus",
-        "ref_type": ref_type,
-        "ref_id": ref_id,
-        "service_day": candidate["service_day"],
-        "start_time": candidate["departure_time"],
-        "end_time": candidate["arrival_time"],
-        "origin_stop_id": candidate["departure_stop_id"],
-        "destination_stop_id": candidate["arrival_stop_id"],
-        "travel_minutes": travel_minutes,
-        "buffer_minutes": buffer_minutes,
-        "route_id": candidate["route_id"],
-        "trip_index": candidate["trip_index"],
-        "departure_route_stop_time_id": candidate["departure_route_stop_time_id"],
-        "arrival_route_stop_time_id": candidate["arrival_route_stop_time_id"],
-        "notes": note,
-    }
+    return Segment(
+        segment_type="bus",
+        service_day=candidate["service_day"],
+        start_min=time_to_minutes(candidate["departure_time"]),
+        end_min=time_to_minutes(candidate["arrival_time"]),
+        ref_type=ref_type,
+        ref_id=ref_id,
+        origin_stop_id=candidate["departure_stop_id"],
+        destination_stop_id=candidate["arrival_stop_id"],
+        travel_minutes=travel_minutes,
+        buffer_minutes=buffer_minutes,
+        route_id=candidate["route_id"],
+        trip_index=candidate["trip_index"],
+        departure_route_stop_time_id=candidate["departure_route_stop_time_id"],
+        arrival_route_stop_time_id=candidate["arrival_route_stop_time_id"],
+        notes=note,
+    )
 
 
 def build_bus_segment_from_trip(
-    trip: sqlite3.Row,
+    trip: TripOption,
     service_day: str,
     ref_type: str,
     ref_id: Optional[int],
     notes: str,
     buffer_minutes: Optional[int] = None,
-) -> Dict[str, Optional[object]]:
-    depart_min = time_to_minutes(trip["departure_time"])
-    arrival_min = time_to_minutes(trip["arrival_time"])
-    travel_minutes = arrival_min - depart_min
-    return {
-        "segment_type": "bus",
-        "ref_type": ref_type,
-        "ref_id": ref_id,
-        "service_day": service_day,
-        "start_time": trip["departure_time"],
-        "end_time": trip["arrival_time"],
-        "origin_stop_id": trip["departure_stop_id"],
-        "destination_stop_id": trip["arrival_stop_id"],
-        "travel_minutes": travel_minutes if travel_minutes >= 0 else None,
-        "buffer_minutes": buffer_minutes,
-        "route_id": trip["route_id"],
-        "trip_index": trip["trip_index"],
-        "departure_route_stop_time_id": trip["departure_route_stop_time_id"],
-        "arrival_route_stop_time_id": trip["arrival_route_stop_time_id"],
-        "notes": notes,
-    }
+) -> Segment:
+    travel_minutes = trip.arrival_min - trip.departure_min
+    return Segment(
+        segment_type="bus",
+        service_day=service_day,
+        start_min=trip.departure_min,
+        end_min=trip.arrival_min,
+        ref_type=ref_type,
+        ref_id=ref_id,
+        origin_stop_id=trip.departure_stop_id,
+        destination_stop_id=trip.arrival_stop_id,
+        travel_minutes=travel_minutes if travel_minutes >= 0 else None,
+        buffer_minutes=buffer_minutes,
+        route_id=trip.route_id,
+        trip_index=trip.trip_index,
+        departure_route_stop_time_id=trip.departure_route_stop_time_id,
+        arrival_route_stop_time_id=trip.arrival_route_stop_time_id,
+        notes=notes,
+    )
 
 
-def build_game_segment(game: sqlite3.Row, hall_stop_id: Optional[int], end_time_min: int) -> Dict[str, Optional[object]]:
+def build_game_segment(game: sqlite3.Row, hall_stop_id: Optional[int], end_time_min: int) -> Segment:
     note = f"{game['tournament_name']} vs {game['opponent_name']} ({game['role']})"
-    return {
-        "segment_type": "game",
-        "ref_type": "schedule_game",
-        "ref_id": game["game_id"],
-        "service_day": game["service_day_code"],
-        "start_time": game["start_time"],
-        "end_time": minutes_to_time(end_time_min),
-        "origin_stop_id": hall_stop_id,
-        "destination_stop_id": hall_stop_id,
-        "travel_minutes": None,
-        "buffer_minutes": None,
-        "route_id": None,
-        "trip_index": None,
-        "departure_route_stop_time_id": None,
-        "arrival_route_stop_time_id": None,
-        "notes": note,
-    }
+    return Segment(
+        segment_type="game",
+        service_day=game["service_day_code"],
+        start_min=time_to_minutes(game["start_time"]),
+        end_min=end_time_min,
+        ref_type="schedule_game",
+        ref_id=game["game_id"],
+        origin_stop_id=hall_stop_id,
+        destination_stop_id=hall_stop_id,
+        notes=note,
+    )
 
 
-def build_meal_segment(start_min: int, end_min: int, lunch_event: sqlite3.Row) -> Dict[str, Optional[object]]:
-    return {
-        "segment_type": "meal",
-        "ref_type": "logistics_event",
-        "ref_id": lunch_event["event_id"],
-        "service_day": "sat",
-        "start_time": minutes_to_time(start_min),
-        "end_time": minutes_to_time(end_min),
-        "origin_stop_id": lunch_event["anchor_stop_id"],
-        "destination_stop_id": lunch_event["anchor_stop_id"],
-        "travel_minutes": None,
-        "buffer_minutes": None,
-        "route_id": None,
-        "trip_index": None,
-        "departure_route_stop_time_id": None,
-        "arrival_route_stop_time_id": None,
-        "notes": f"Lunch at {lunch_event['stop_display_name']}",
-    }
+def build_meal_segment(start_min: int, end_min: int, lunch_event: sqlite3.Row) -> Segment:
+    return Segment(
+        segment_type="meal",
+        service_day="sat",
+        start_min=start_min,
+        end_min=end_min,
+        ref_type="logistics_event",
+        ref_id=lunch_event["event_id"],
+        origin_stop_id=lunch_event["anchor_stop_id"],
+        destination_stop_id=lunch_event["anchor_stop_id"],
+        notes=f"Lunch at {lunch_event['stop_display_name']}",
+    )
 
 
-def build_concert_segment(concert_event: sqlite3.Row) -> Dict[str, Optional[object]]:
-    return {
-        "segment_type": "concert",
-        "ref_type": "logistics_event",
-        "ref_id": concert_event["event_id"],
-        "service_day": "sat",
-        "start_time": concert_event["start_time"],
-        "end_time": concert_event["end_time"],
-        "origin_stop_id": concert_event["anchor_stop_id"],
-        "destination_stop_id": concert_event["anchor_stop_id"],
-        "travel_minutes": None,
-        "buffer_minutes": None,
-        "route_id": None,
-        "trip_index": None,
-        "departure_route_stop_time_id": None,
-        "arrival_route_stop_time_id": None,
-        "notes": "Concert at Terningen Arena",
-    }
+def build_concert_segment(concert_event: sqlite3.Row) -> Segment:
+    return Segment(
+        segment_type="concert",
+        service_day="sat",
+        start_min=time_to_minutes(concert_event["start_time"]),
+        end_min=time_to_minutes(concert_event["end_time"]),
+        ref_type="logistics_event",
+        ref_id=concert_event["event_id"],
+        origin_stop_id=concert_event["anchor_stop_id"],
+        destination_stop_id=concert_event["anchor_stop_id"],
+        notes="Concert at Terningen Arena",
+    )
 
 
-def build_manual_segment(service_day: str, start_min: int, end_min: int, note: str) -> Dict[str, Optional[object]]:
-    return {
-        "segment_type": "note",
-        "ref_type": None,
-        "ref_id": None,
-        "service_day": service_day,
-        "start_time": minutes_to_time(start_min),
-        "end_time": minutes_to_time(end_min),
-        "origin_stop_id": None,
-        "destination_stop_id": None,
-        "travel_minutes": None,
-        "buffer_minutes": None,
-        "route_id": None,
-        "trip_index": None,
-        "departure_route_stop_time_id": None,
-        "arrival_route_stop_time_id": None,
-        "notes": note,
-    }
+def build_manual_segment(service_day: str, start_min: int, end_min: int, note: str) -> Segment:
+    return Segment(segment_type="note", service_day=service_day, start_min=start_min, end_min=end_min, notes=note)
 
 
 def build_charter_segment(
@@ -490,33 +579,29 @@ def build_charter_segment(
     note: str,
     ref_type: Optional[str] = None,
     ref_id: Optional[int] = None,
-) -> Dict[str, Optional[object]]:
+) -> Segment:
     travel = max(arrive_min - start_min, 15)
-    return {
-        "segment_type": "bus",
-        "ref_type": ref_type,
-        "ref_id": ref_id,
-        "service_day": service_day,
-        "start_time": minutes_to_time(max(start_min, 0)),
-        "end_time": minutes_to_time(max(arrive_min, start_min + 15)),
-        "origin_stop_id": origin_stop_id,
-        "destination_stop_id": destination_stop_id,
-        "travel_minutes": travel,
-        "buffer_minutes": None,
-        "route_id": None,
-        "trip_index": None,
-        "departure_route_stop_time_id": None,
-        "arrival_route_stop_time_id": None,
-        "notes": note,
-    }
+    return Segment(
+        segment_type="bus",
+        service_day=service_day,
+        start_min=max(start_min, 0),
+        end_min=max(arrive_min, start_min + 15),
+        ref_type=ref_type,
+        ref_id=ref_id,
+        origin_stop_id=origin_stop_id,
+        destination_stop_id=destination_stop_id,
+        travel_minutes=travel,
+        notes=note,
+    )
 
 
-def release_bus_segments(tracker: BusLoadTracker, alias: Optional[sqlite3.Row], segments: List[Dict[str, Optional[object]]], headcount: Optional[int] = None) -> None:
+def release_bus_segments(tracker: BusLoadTracker, alias: Optional[sqlite3.Row], segments: List[Segment], headcount: Optional[int] = None) -> None:
     if headcount is None:
         headcount = int(alias["headcount"] or 0) if alias is not None else 0
     for seg in segments:
-        if seg.get("segment_type") == "bus":
-            tracker.release(seg.get("service_day"), seg.get("route_id"), seg.get("trip_index"), headcount)
+        if seg.segment_type == "bus":
+            tracker.release(seg.service_day, seg.route_id, seg.trip_index, headcount)
+            tracker.counters.capacity_releases += 1
 
 
 def select_bus_via_candidates(
@@ -527,9 +612,10 @@ def select_bus_via_candidates(
     origin_stop_id: Optional[int],
     note: str,
     allow_force: bool = True,
-) -> Tuple[Optional[Dict[str, Optional[object]]], Optional[int], bool]:
+) -> Tuple[Optional[Segment], Optional[int], bool]:
     if origin_stop_id is None:
         return None, None, False
+    tracker.counters.routing_calls += 1
     headcount = int(alias["headcount"] or 0)
     latest_arrival = time_to_minutes(game["start_time"]) - 40
     candidates = fetch_game_bus_candidates(conn, alias["alias_id"], game["game_id"])
@@ -569,7 +655,7 @@ def select_bus_via_candidates(
 
 
 def select_trip_with_capacity(
-    conn: sqlite3.Connection,
+    timetable: TimetableIndex,
     tracker: BusLoadTracker,
     service_day: str,
     origin_stop_id: Optional[int],
@@ -583,22 +669,25 @@ def select_trip_with_capacity(
     min_arrival_min: Optional[int] = None,
     target_arrival_min: Optional[int] = None,
     allow_force: bool = True,
-) -> Tuple[Optional[Dict[str, Optional[object]]], Optional[int], bool]:
+) -> Tuple[Optional[Segment], Optional[int], bool]:
     if origin_stop_id is None or destination_stop_id is None:
         return None, None, False
-    trips = list_trips(conn, service_day, origin_stop_id, destination_stop_id, earliest_depart_min)
-    fallback: Optional[sqlite3.Row] = None
+    tracker.counters.routing_calls += 1
+    if not timetable.may_reach(service_day, origin_stop_id, destination_stop_id, earliest_depart_min, latest_arrival_min):
+        return None, None, False
+    trips = list_trips(timetable, service_day, origin_stop_id, destination_stop_id, earliest_depart_min)
+    fallback: Optional[TripOption] = None
     fallback_arrival: Optional[int] = None
     for trip in trips:
-        depart_min = time_to_minutes(trip["departure_time"])
-        arrival_min = time_to_minutes(trip["arrival_time"])
+        depart_min = trip.departure_min
+        arrival_min = trip.arrival_min
         if arrival_min <= depart_min:
             continue
         if min_arrival_min is not None and arrival_min < min_arrival_min:
             continue
         if latest_arrival_min is not None and arrival_min > latest_arrival_min:
             break
-        if tracker.assign(service_day, trip["route_id"], trip["trip_index"], headcount):
+        if tracker.assign(service_day, trip.route_id, trip.trip_index, headcount):
             buffer_minutes = None
             if target_arrival_min is not None:
                 buffer_minutes = target_arrival_min - arrival_min
@@ -617,7 +706,7 @@ def select_trip_with_capacity(
             fallback = trip
             fallback_arrival = arrival_min
     if fallback and allow_force:
-        tracker.assign(service_day, fallback["route_id"], fallback["trip_index"], headcount, force=True)
+        tracker.assign(service_day, fallback.route_id, fallback.trip_index, headcount, force=True)
         buffer_minutes = None
         if target_arrival_min is not None and fallback_arrival is not None:
             buffer_minutes = target_arrival_min - fallback_arrival
@@ -643,8 +732,8 @@ def plan_game_travel(
     current_stop_id: Optional[int],
     current_time_min: Optional[int],
     game: sqlite3.Row,
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int], int]:
-    segments: List[Dict[str, Optional[object]]] = []
+) -> Tuple[List[Segment], Optional[int], int]:
+    segments: List[Segment] = []
     hall_stop_id = lookup.hall_stop_map.get(game["hall_id"])
     if hall_stop_id is None:
         raise ValueError(f"Savner stop for hall {game['hall_name']}")
@@ -659,6 +748,26 @@ def plan_game_travel(
     service_day = game["service_day_code"]
     note = f"Bus to {game['hall_name']} ({(game['match_code'] or '').strip()})".strip()
     headcount = int(alias["headcount"] or 0)
+    # A trip reserved by --assignment flow, if it is one this function could pick itself.
+    preferred = tracker.claim((alias["alias_id"], game["game_id"]))
+    if (
+        preferred is not None
+        and preferred.departure_stop_id in (current_stop_id, school_stop_id)
+        and preferred.departure_min >= start_min - LAST_RESORT_WINDOW
+        and preferred.arrival_min <= latest_arrival
+        and tracker.assign(service_day, preferred.route_id, preferred.trip_index, headcount)
+    ):
+        segments.append(
+            build_bus_segment_from_trip(
+                preferred,
+                service_day,
+                "schedule_game",
+                game["game_id"],
+                note,
+                buffer_minutes=start_min - preferred.arrival_min,
+            )
+        )
+        return segments, hall_stop_id, preferred.arrival_min
     attempt_origin = current_stop_id
     attempt_time = current_time_min if current_time_min is not None else start_min - (3 * 60)
     attempted_school_reset = False
@@ -673,7 +782,7 @@ def plan_game_travel(
                                    else (None, None, False))
         if segment is None:
             segment, arrival_min, _ = select_trip_with_capacity(
-                conn,
+                lookup.timetable,
                 tracker,
                 service_day,
                 attempt_origin,
@@ -693,13 +802,13 @@ def plan_game_travel(
                 release_bus_segments(tracker, alias=None, segments=[segment], headcount=headcount)
                 break
             else:
-                segment["buffer_minutes"] = buffer_to_game
+                segment.buffer_minutes = buffer_to_game
                 segments.append(segment)
                 return segments, hall_stop_id, arrival_min
         if attempted_school_reset or attempt_origin == school_stop_id:
             break
         transfer_segment, transfer_arrival, _ = select_trip_with_capacity(
-            conn,
+            lookup.timetable,
             tracker,
             service_day,
             attempt_origin,
@@ -714,14 +823,14 @@ def plan_game_travel(
         )
         if transfer_segment is None or transfer_arrival is None:
             break
-        transfer_segment["buffer_minutes"] = None
+        transfer_segment.buffer_minutes = None
         segments.append(transfer_segment)
         attempt_origin = school_stop_id
         attempt_time = transfer_arrival
         attempted_school_reset = True
 
     multi_segments, multi_arrival = find_multi_leg_trip(
-        conn,
+        lookup.timetable,
         tracker,
         service_day,
         attempt_origin,
@@ -740,8 +849,8 @@ def plan_game_travel(
             release_bus_segments(tracker, alias=None, segments=multi_segments, headcount=headcount)
         else:
             for seg in multi_segments:
-                if seg.get("segment_type") == "bus":
-                    seg["buffer_minutes"] = buffer_to_game
+                if seg.segment_type == "bus":
+                    seg.buffer_minutes = buffer_to_game
             segments.extend(multi_segments)
             return segments, hall_stop_id, multi_arrival
 
@@ -763,7 +872,7 @@ def plan_game_travel(
 
         # Try direct trip with force=True (ignore capacity)
         segment, arrival_min, _ = select_trip_with_capacity(
-            conn,
+            lookup.timetable,
             tracker,
             service_day,
             try_origin,
@@ -778,13 +887,13 @@ def plan_game_travel(
         )
         if segment is not None and arrival_min is not None:
             buffer_to_game = start_min - arrival_min
-            segment["buffer_minutes"] = buffer_to_game
+            segment.buffer_minutes = buffer_to_game
             segments.append(segment)
             return segments, hall_stop_id, arrival_min
 
         # Try multi-leg trip
         multi_segments, multi_arrival = find_multi_leg_trip(
-            conn,
+            lookup.timetable,
             tracker,
             service_day,
             try_origin,
@@ -800,8 +909,8 @@ def plan_game_travel(
         if multi_segments is not None and multi_arrival is not None:
             buffer_to_game = start_min - multi_arrival
             for seg in multi_segments:
-                if seg.get("segment_type") == "bus":
-                    seg["buffer_minutes"] = buffer_to_game
+                if seg.segment_type == "bus":
+                    seg.buffer_minutes = buffer_to_game
             segments.extend(multi_segments)
             return segments, hall_stop_id, multi_arrival
 
@@ -819,20 +928,17 @@ def plan_game_travel(
             dest_name = dest_row[0]
 
     # Create a note segment indicating no bus available
-    note_segment = {
-        "segment_type": "note",
-        "ref_type": "schedule_game",
-        "ref_id": game["game_id"],
-        "service_day": service_day,
-        "origin_stop_id": attempt_origin,
-        "destination_stop_id": hall_stop_id,
-        "route_id": None,
-        "trip_index": None,
-        "departure_time": None,
-        "arrival_time": None,
-        "buffer_minutes": None,
-        "notes": f"INGEN BUS TILGÆNGELIG: {origin_name} → {dest_name}. Kamp kl. {game['start_time']}.",
-    }
+    note_segment = Segment(
+        segment_type="note",
+        service_day=service_day,
+        start_min=None,
+        end_min=None,
+        ref_type="schedule_game",
+        ref_id=game["game_id"],
+        origin_stop_id=attempt_origin,
+        destination_stop_id=hall_stop_id,
+        notes=f"INGEN BUS TILGÆNGELIG: {origin_name} → {dest_name}. Kamp kl. {game['start_time']}.",
+    )
     segments.append(note_segment)
 
     # Return with current stop (no transport happened)
@@ -840,7 +946,7 @@ def plan_game_travel(
 
 
 def plan_lunch_transport(
-    conn: sqlite3.Connection,
+    timetable: TimetableIndex,
     tracker: BusLoadTracker,
     service_day: str,
     origin_stop_id: Optional[int],
@@ -850,12 +956,12 @@ def plan_lunch_transport(
     min_arrival_min: int,
     max_arrival_min: int,
     allow_charter: bool = False,
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int]]:
+) -> Tuple[List[Segment], Optional[int]]:
     if origin_stop_id is None:
         return [], None
     note = f"Bus to lunch ({lunch_event['stop_display_name']})"
     direct_segment, arrival, _ = select_trip_with_capacity(
-        conn,
+        timetable,
         tracker,
         service_day,
         origin_stop_id,
@@ -870,11 +976,11 @@ def plan_lunch_transport(
         allow_force=False,
     )
     if direct_segment is not None and arrival is not None:
-        direct_segment["buffer_minutes"] = None
+        direct_segment.buffer_minutes = None
         return [direct_segment], arrival
 
     multi_segments, multi_arrival = find_multi_leg_trip(
-        conn,
+        timetable,
         tracker,
         service_day,
         origin_stop_id,
@@ -888,8 +994,8 @@ def plan_lunch_transport(
     )
     if multi_segments is not None and multi_arrival is not None and multi_arrival <= max_arrival_min:
         for seg in multi_segments:
-            if seg.get("segment_type") == "bus":
-                seg["buffer_minutes"] = None
+            if seg.segment_type == "bus":
+                seg.buffer_minutes = None
         return multi_segments, multi_arrival
 
     if allow_charter:
@@ -909,7 +1015,7 @@ def plan_lunch_transport(
             "logistics_event",
             lunch_event["event_id"],
         )
-        charter["buffer_minutes"] = None
+        charter.buffer_minutes = None
         return [charter], arrival_target
 
     return [], None
@@ -923,7 +1029,7 @@ def schedule_lunch_between_games(
     current_stop_id: Optional[int],
     current_time_min: Optional[int],
     next_game: Optional[sqlite3.Row],
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int], Optional[int], Optional[int]]:
+) -> Tuple[List[Segment], Optional[int], Optional[int], Optional[int]]:
     if lookup.lunch_event is None or current_time_min is None or next_game is None:
         return [], current_stop_id, current_time_min, None
     if next_game["service_day_code"] != "sat":
@@ -941,7 +1047,7 @@ def schedule_lunch_between_games(
         return [], current_stop_id, current_time_min, None
 
     travel_to_lunch, arrival_lunch = plan_lunch_transport(
-        conn,
+        lookup.timetable,
         tracker,
         "sat",
         current_stop_id,
@@ -968,7 +1074,7 @@ def schedule_lunch_between_games(
 
     next_hall_stop = lookup.hall_stop_map.get(next_game["hall_id"])
     bus_to_next, arrival_next, forced2 = select_trip_with_capacity(
-        conn,
+        lookup.timetable,
         tracker,
         next_game["service_day_code"],
         lookup.lunch_event["anchor_stop_id"],
@@ -984,7 +1090,7 @@ def schedule_lunch_between_games(
     )
     if bus_to_next is None or arrival_next is None:
         multi_to_next, multi_arrival = find_multi_leg_trip(
-            conn,
+            lookup.timetable,
             tracker,
             next_game["service_day_code"],
             lookup.lunch_event["anchor_stop_id"],
@@ -1011,8 +1117,8 @@ def schedule_lunch_between_games(
                 arrival_target,
                 f"Manual transport to {next_game['hall_name']} after lunch",
             )
-            manual_return["origin_stop_id"] = lookup.lunch_event["anchor_stop_id"]
-            manual_return["destination_stop_id"] = next_hall_stop
+            manual_return.origin_stop_id = lookup.lunch_event["anchor_stop_id"]
+            manual_return.destination_stop_id = next_hall_stop
             arrival_next = arrival_target
             bus_segments_to_next = [manual_return]
     else:
@@ -1024,8 +1130,8 @@ def schedule_lunch_between_games(
         release_bus_segments(tracker, alias=None, segments=bus_segments_to_next, headcount=headcount)
         return [], current_stop_id, current_time_min, None
     for seg in bus_segments_to_next:
-        if seg.get("segment_type") == "bus":
-            seg["buffer_minutes"] = buffer_to_next_game
+        if seg.segment_type == "bus":
+            seg.buffer_minutes = buffer_to_next_game
 
     return (
         [*travel_to_lunch, meal_segment, *bus_segments_to_next],
@@ -1042,7 +1148,7 @@ def schedule_lunch_after_day(
     lookup: LookupData,
     current_stop_id: Optional[int],
     current_time_min: Optional[int],
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int], Optional[int]]:
+) -> Tuple[List[Segment], Optional[int], Optional[int]]:
     if lookup.lunch_event is None:
         return [], current_stop_id, current_time_min
     if current_time_min is None:
@@ -1052,7 +1158,7 @@ def schedule_lunch_after_day(
 
     headcount = int(alias["headcount"] or 0)
     travel_to_lunch, arrival = plan_lunch_transport(
-        conn,
+        lookup.timetable,
         tracker,
         "sat",
         current_stop_id,
@@ -1072,7 +1178,7 @@ def schedule_lunch_after_day(
 
 
 def insert_manual_lunch(
-    segments: List[Dict[str, Optional[object]]],
+    segments: List[Segment],
     alias: sqlite3.Row,
     lookup: LookupData,
 ) -> bool:
@@ -1080,21 +1186,19 @@ def insert_manual_lunch(
         return False
     lunch_stop = lookup.lunch_event["anchor_stop_id"]
     school_stop = lookup.school_stop_map.get(alias["school_id"])
-    sat_segments = [seg for seg in segments if seg.get("service_day") == "sat"]
+    sat_segments = [seg for seg in segments if seg.service_day == "sat"]
     if not sat_segments:
         return False
-    sat_segments_sorted = sorted(sat_segments, key=lambda s: s.get("start_time", "00:00"))
-    def time_str_to_min(value: Optional[str]) -> int:
-        return time_to_minutes(value) if value else 0
+    sat_segments_sorted = sorted(sat_segments, key=lambda seg: seg.start_min or 0)
 
     current_location = school_stop
     current_time = LUNCH_WINDOW_MIN
     for seg in sat_segments_sorted:
-        next_start = time_str_to_min(seg.get("start_time"))
+        next_start = seg.start_min or 0
         gap_start = max(current_time, LUNCH_WINDOW_MIN)
         gap_end = min(next_start, LUNCH_WINDOW_MAX)
         if gap_end - gap_start >= (LUNCH_DURATION + 2 * LUNCH_CHARTER_TRAVEL):
-            next_origin = seg.get("origin_stop_id") or current_location
+            next_origin = seg.origin_stop_id or current_location
             depart_for_lunch = gap_start
             arrive_lunch = depart_for_lunch + LUNCH_CHARTER_TRAVEL
             meal_start = max(arrive_lunch, LUNCH_WINDOW_MIN)
@@ -1119,22 +1223,22 @@ def insert_manual_lunch(
                 arrive_back,
                 "Manual return from lunch",
             )
-            note_to_lunch["origin_stop_id"] = current_location
-            note_to_lunch["destination_stop_id"] = lunch_stop
-            note_return["origin_stop_id"] = lunch_stop
-            note_return["destination_stop_id"] = next_origin
-            note_to_lunch["ref_type"] = "logistics_event"
-            note_to_lunch["ref_id"] = lookup.lunch_event["event_id"]
-            note_return["ref_type"] = "logistics_event"
-            note_return["ref_id"] = lookup.lunch_event["event_id"]
+            note_to_lunch.origin_stop_id = current_location
+            note_to_lunch.destination_stop_id = lunch_stop
+            note_return.origin_stop_id = lunch_stop
+            note_return.destination_stop_id = next_origin
+            note_to_lunch.ref_type = "logistics_event"
+            note_to_lunch.ref_id = lookup.lunch_event["event_id"]
+            note_return.ref_type = "logistics_event"
+            note_return.ref_id = lookup.lunch_event["event_id"]
 
             segments.extend([note_to_lunch, meal_segment, note_return])
             current_location = next_origin
             current_time = arrive_back
             return True
-        seg_end = time_str_to_min(seg.get("end_time"))
+        seg_end = seg.end_min or 0
         current_time = max(current_time, seg_end)
-        dest_stop = seg.get("destination_stop_id")
+        dest_stop = seg.destination_stop_id
         if dest_stop is not None:
             current_location = dest_stop
     return False
@@ -1147,8 +1251,8 @@ def schedule_concert_block(
     lookup: LookupData,
     current_stop_id: Optional[int],
     current_time_min: Optional[int],
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int], Optional[int]]:
-    segments: List[Dict[str, Optional[object]]] = []
+) -> Tuple[List[Segment], Optional[int], Optional[int]]:
+    segments: List[Segment] = []
     concert = lookup.concert_event
     if concert is None:
         return segments, current_stop_id, current_time_min
@@ -1166,23 +1270,18 @@ def schedule_concert_block(
         stay_start = current_time_min or earliest_depart
         stay_end = max(stay_start, concert_start_min - CONCERT_BUFFER_MIN)
         segments.append(
-            {
-                "segment_type": "stay",
-                "ref_type": "logistics_event",
-                "ref_id": concert["event_id"],
-                "service_day": "sat",
-                "start_time": minutes_to_time(stay_start),
-                "end_time": minutes_to_time(stay_end),
-                "origin_stop_id": concert["anchor_stop_id"],
-                "destination_stop_id": concert["anchor_stop_id"],
-                "travel_minutes": None,
-                "buffer_minutes": concert_start_min - stay_end,
-                "route_id": None,
-                "trip_index": None,
-                "departure_route_stop_time_id": None,
-                "arrival_route_stop_time_id": None,
-                "notes": "Stay at Terningen Arena before concert",
-            }
+            Segment(
+                segment_type="stay",
+                service_day="sat",
+                start_min=stay_start,
+                end_min=stay_end,
+                ref_type="logistics_event",
+                ref_id=concert["event_id"],
+                origin_stop_id=concert["anchor_stop_id"],
+                destination_stop_id=concert["anchor_stop_id"],
+                buffer_minutes=concert_start_min - stay_end,
+                notes="Stay at Terningen Arena before concert",
+            )
         )
         current_stop_id = concert["anchor_stop_id"]
         current_time_min = stay_end
@@ -1193,7 +1292,7 @@ def schedule_concert_block(
             if depart_candidate < 0:
                 continue
             candidate, arrival_candidate, _ = select_trip_with_capacity(
-                conn,
+                lookup.timetable,
                 tracker,
                 "sat",
                 origin_stop,
@@ -1213,7 +1312,7 @@ def schedule_concert_block(
                 break
         if bus_to_concert is None:
             multi_segments, multi_arrival = find_multi_leg_trip(
-                conn,
+                lookup.timetable,
                 tracker,
                 "sat",
                 origin_stop,
@@ -1227,8 +1326,8 @@ def schedule_concert_block(
             )
             if multi_segments is not None and multi_arrival is not None:
                 for seg in multi_segments:
-                    if seg.get("segment_type") == "bus":
-                        seg["buffer_minutes"] = None
+                    if seg.segment_type == "bus":
+                        seg.buffer_minutes = None
                 segments.extend(multi_segments)
                 current_stop_id = concert["anchor_stop_id"]
                 current_time_min = multi_arrival
@@ -1243,15 +1342,15 @@ def schedule_concert_block(
                     manual_end,
                     f"Manual transport to concert ({concert['stop_display_name']})",
                 )
-                manual_note["origin_stop_id"] = origin_stop
-                manual_note["destination_stop_id"] = concert["anchor_stop_id"]
-                manual_note["ref_type"] = "logistics_event"
-                manual_note["ref_id"] = concert["event_id"]
+                manual_note.origin_stop_id = origin_stop
+                manual_note.destination_stop_id = concert["anchor_stop_id"]
+                manual_note.ref_type = "logistics_event"
+                manual_note.ref_id = concert["event_id"]
                 segments.append(manual_note)
                 current_stop_id = concert["anchor_stop_id"]
                 current_time_min = manual_end
         else:
-            bus_to_concert["buffer_minutes"] = None
+            bus_to_concert.buffer_minutes = None
             segments.append(bus_to_concert)
             current_stop_id = concert["anchor_stop_id"]
             current_time_min = arrival if arrival is not None else current_time_min
@@ -1263,7 +1362,7 @@ def schedule_concert_block(
 
     school_stop = lookup.school_stop_map.get(alias["school_id"])
     return_trip, return_arrival, _ = select_trip_with_capacity(
-        conn,
+        lookup.timetable,
         tracker,
         "sat",
         concert["anchor_stop_id"],
@@ -1276,7 +1375,7 @@ def schedule_concert_block(
         allow_force=False,
     )
     if return_trip is not None:
-        return_trip["buffer_minutes"] = None
+        return_trip.buffer_minutes = None
         segments.append(return_trip)
         current_stop_id = school_stop
         current_time_min = return_arrival
@@ -1292,13 +1391,13 @@ def schedule_return_to_lodging(
     service_day: str,
     current_stop_id: Optional[int],
     current_time_min: Optional[int],
-) -> Tuple[List[Dict[str, Optional[object]]], Optional[int], Optional[int]]:
+) -> Tuple[List[Segment], Optional[int], Optional[int]]:
     school_stop = lookup.school_stop_map.get(alias["school_id"])
     if current_stop_id == school_stop:
         return [], current_stop_id, current_time_min
     headcount = int(alias["headcount"] or 0)
     bus_segment, arrival, _ = select_trip_with_capacity(
-        conn,
+        lookup.timetable,
         tracker,
         service_day,
         current_stop_id,
@@ -1312,7 +1411,7 @@ def schedule_return_to_lodging(
     )
     if bus_segment is None:
         return [], current_stop_id, current_time_min
-    bus_segment["buffer_minutes"] = None
+    bus_segment.buffer_minutes = None
     return [bus_segment], school_stop, arrival
 
 
@@ -1321,8 +1420,8 @@ def generate_segments_for_alias(
     alias: sqlite3.Row,
     lookup: LookupData,
     tracker: BusLoadTracker,
-) -> List[Dict[str, Optional[object]]]:
-    segments: List[Dict[str, Optional[object]]] = []
+) -> List[Segment]:
+    segments: List[Segment] = []
     games = fetch_games_for_alias(conn, alias["alias_id"])
 
     if not games:
@@ -1336,6 +1435,7 @@ def generate_segments_for_alias(
             conn, tracker, alias, lookup, current_stop, current_time
         )
         segments.extend(concert_segments)
+        segments.sort(key=Segment.sort_key)
         return segments
 
     games_by_date: Dict[str, List[sqlite3.Row]] = defaultdict(list)
@@ -1406,82 +1506,373 @@ def generate_segments_for_alias(
 
     if lookup.lunch_event is not None:
         has_saturday_lunch = any(
-            seg.get("service_day") == "sat" and seg.get("segment_type") == "meal" for seg in segments
+            seg.service_day == "sat" and seg.segment_type == "meal" for seg in segments
         )
         if not has_saturday_lunch:
             insert_manual_lunch(segments, alias, lookup)
 
+    segments.sort(key=Segment.sort_key)
     return segments
 
 
-def insert_segments(conn: sqlite3.Connection, alias_id: int, segments: List[Dict[str, Optional[object]]]) -> int:
-    # Sort segments chronologically by service_day and start_time
-    day_order = {"fri": 1, "sat": 2, "sun": 3}
-    segments_sorted = sorted(
-        segments,
-        key=lambda s: (
-            day_order.get(s.get("service_day", ""), 999),
-            s.get("start_time", "99:99")
-        )
+@dataclass
+class AliasMetrics:
+    """Planning cost of one squad, as stored in `planner_metrics`."""
+
+    alias_id: int
+    plan_ms: float = 0.0
+    routing_calls: int = 0
+    multi_leg_attempts: int = 0
+    capacity_releases: int = 0
+    segment_count: int = 0
+
+
+def plan_alias(
+    conn: sqlite3.Connection,
+    alias: sqlite3.Row,
+    lookup: LookupData,
+    tracker: BusLoadTracker,
+    metrics: Optional[Dict[int, AliasMetrics]] = None,
+) -> List[Segment]:
+    """`generate_segments_for_alias`, adding its wall time and tracker counters to `metrics`."""
+    if metrics is None:
+        return generate_segments_for_alias(conn, alias, lookup, tracker)
+    tracker.counters = PlannerCounters()
+    started = time.perf_counter()
+    segments = generate_segments_for_alias(conn, alias, lookup, tracker)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    # A squad re-planned during a --workers merge adds to its worker's numbers.
+    entry = metrics.setdefault(alias["alias_id"], AliasMetrics(alias["alias_id"]))
+    entry.plan_ms += elapsed_ms
+    entry.routing_calls += tracker.counters.routing_calls
+    entry.multi_leg_attempts += tracker.counters.multi_leg_attempts
+    entry.capacity_releases += tracker.counters.capacity_releases
+    entry.segment_count = len(segments)
+    return segments
+
+
+def store_planner_metrics(conn: sqlite3.Connection, metrics: Dict[int, AliasMetrics], replace_all: bool) -> None:
+    """Write `metrics` to `planner_metrics`; `replace_all` drops the rows of squads not planned this run."""
+    if replace_all:
+        conn.execute("DELETE FROM planner_metrics")
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO planner_metrics
+            (alias_id, plan_ms, routing_calls, multi_leg_attempts, capacity_releases, segment_count)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (m.alias_id, round(m.plan_ms, 3), m.routing_calls, m.multi_leg_attempts, m.capacity_releases, m.segment_count)
+            for m in metrics.values()
+        ],
     )
 
-    for sequence_no, segment in enumerate(segments_sorted, start=1):
-        conn.execute(
-            """
-            INSERT INTO team_itinerary_segments (
-                alias_id,
-                sequence_no,
-                segment_type,
-                ref_type,
-                ref_id,
-                service_day,
-                start_time,
-                end_time,
-                origin_stop_id,
-                destination_stop_id,
-                travel_minutes,
-                buffer_minutes,
-                route_id,
-                trip_index,
-                departure_route_stop_time_id,
-                arrival_route_stop_time_id,
-                notes
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                alias_id,
-                sequence_no,
-                segment["segment_type"],
-                segment.get("ref_type"),
-                segment.get("ref_id"),
-                segment.get("service_day"),
-                segment.get("start_time"),
-                segment.get("end_time"),
-                segment.get("origin_stop_id"),
-                segment.get("destination_stop_id"),
-                segment.get("travel_minutes"),
-                segment.get("buffer_minutes"),
-                segment.get("route_id"),
-                segment.get("trip_index"),
-                segment.get("departure_route_stop_time_id"),
-                segment.get("arrival_route_stop_time_id"),
-                segment.get("notes"),
-            ),
+
+def format_planner_metrics(conn: sqlite3.Connection, metrics: Dict[int, AliasMetrics], slowest: int) -> str:
+    """Histogram of planning time per squad plus the `slowest` squads."""
+    counts = [0] * (len(PLAN_MS_BUCKETS) + 1)
+    for entry in metrics.values():
+        counts[bisect_right(PLAN_MS_BUCKETS, entry.plan_ms)] += 1
+    used = [idx for idx, count in enumerate(counts) if count]
+    widest = max(counts)
+    lines = [f"Planning time per squad ({len(metrics)} squads, {sum(m.plan_ms for m in metrics.values()):.0f} ms):"]
+    for idx in range(used[0], used[-1] + 1) if used else ():
+        low = PLAN_MS_BUCKETS[idx - 1] if idx else 0
+        label = f"{low:g}-{PLAN_MS_BUCKETS[idx]:g} ms" if idx < len(PLAN_MS_BUCKETS) else f">= {low:g} ms"
+        bar = "#" * max(1, round(40 * counts[idx] / widest)) if counts[idx] else ""
+        lines.append(f"  {label:>14} {counts[idx]:5d} {bar}".rstrip())
+
+    names = {
+        row["alias_id"]: f"{row['schedule_team_name'] or row['lodging_club']} ({row['raw_label']})"
+        for row in conn.execute("SELECT alias_id, schedule_team_name, lodging_club, raw_label FROM vw_team_alignment")
+    }
+    ranked = sorted(metrics.values(), key=lambda m: (-m.plan_ms, m.alias_id))[:slowest]
+    if ranked:
+        lines.append(f"Slowest {len(ranked)} squads:")
+        lines.append(f"  {'alias':>5} {'ms':>8} {'routing':>8} {'multi-leg':>9} {'releases':>8} {'segments':>8}  squad")
+        for m in ranked:
+            lines.append(
+                f"  {m.alias_id:5d} {m.plan_ms:8.1f} {m.routing_calls:8d} {m.multi_leg_attempts:9d} "
+                f"{m.capacity_releases:8d} {m.segment_count:8d}  {names.get(m.alias_id, '')}"
+            )
+    return "\n".join(lines)
+
+
+def update_bus_trip_loads(conn: sqlite3.Connection, alias_id: Optional[int], sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) the stored bus segments of one alias (None: all) in `bus_trip_loads`."""
+    alias_filter = "" if alias_id is None else "AND seg.alias_id = ?"
+    conn.execute(
+        f"""
+        INSERT INTO bus_trip_loads (service_day, route_id, trip_index, headcount, version)
+        SELECT seg.service_day, seg.route_id, seg.trip_index, ? * SUM(COALESCE(lt.headcount, 0)), 1
+        FROM team_itinerary_segments seg
+        JOIN team_aliases ta ON ta.alias_id = seg.alias_id
+        JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
+        WHERE seg.segment_type = 'bus'
+          AND seg.route_id IS NOT NULL
+          {alias_filter}
+        GROUP BY seg.service_day, seg.route_id, seg.trip_index
+        ON CONFLICT (service_day, route_id, trip_index) DO UPDATE
+        SET headcount = bus_trip_loads.headcount + excluded.headcount,
+            version = bus_trip_loads.version + 1
+        """,
+        (sign,) if alias_id is None else (sign, alias_id),
+    )
+
+
+def delete_segments(conn: sqlite3.Connection, alias_id: Optional[int] = None) -> None:
+    """Remove segments (all, or one alias) and their share of `bus_trip_loads`."""
+    if alias_id is None:
+        conn.execute("DELETE FROM team_itinerary_segments")
+        conn.execute("UPDATE bus_trip_loads SET headcount = 0, version = version + 1 WHERE headcount <> 0")
+        return
+    update_bus_trip_loads(conn, alias_id, -1)
+    conn.execute("DELETE FROM team_itinerary_segments WHERE alias_id = ?", (alias_id,))
+
+
+def write_segments(conn: sqlite3.Connection, planned: Iterable[Tuple[int, List[Segment]]]) -> int:
+    """
+    Insert the segments of (alias_id, segments) pairs, numbered in list order.
+
+    `generate_segments_for_alias` already returns each alias's segments in
+    chronological order, so they are not sorted again here.
+
+    Segments are grouped by the columns they set, and each group is written
+    with one `executemany` that leaves the other columns NULL: the sqlite3
+    module binds None several times slower than an int or str, and most
+    segments leave half of SEGMENT_COLUMNS unset. segment_id is given
+    explicitly, continuing `sqlite_sequence` in alias/sequence order, so the
+    ids match a row-by-row insert.
+    """
+    next_id = conn.execute(
+        "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'team_itinerary_segments'"
+    ).fetchone()[0]
+    first_id = next_id
+    by_mask: Dict[Tuple[bool, ...], List[Tuple]] = defaultdict(list)
+    for alias_id, segments in planned:
+        for sequence_no, segment in enumerate(segments, start=1):
+            next_id += 1
+            values = SEGMENT_VALUES(segment)
+            mask = tuple(value is not None for value in values)
+            by_mask[mask].append((next_id, alias_id, sequence_no, *compress(values, mask)))
+
+    for mask, rows in by_mask.items():
+        columns = list(compress(SEGMENT_COLUMNS, mask))
+        conn.executemany(
+            f"INSERT INTO team_itinerary_segments (segment_id, alias_id, sequence_no, {', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+            rows,
         )
-    return len(segments)
+    return next_id - first_id
 
 
-def main() -> None:
-    if not DB_PATH.exists():
-        raise FileNotFoundError(f"Missing database: {DB_PATH}. Run build_event_db.py first.")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    lookup = load_lookup_data(conn)
-    tracker = BusLoadTracker(BUS_CAPACITY_LIMIT)
+def insert_segments(conn: sqlite3.Connection, alias_id: int, segments: List[Segment]) -> int:
+    count = write_segments(conn, [(alias_id, segments)])
+    update_bus_trip_loads(conn, alias_id, 1)
+    return count
+
+
+def replace_all_segments(
+    conn: sqlite3.Connection,
+    aliases: List[sqlite3.Row],
+    planned: Dict[int, List[Segment]],
+) -> int:
+    """
+    Swap in the segments of every alias within the open transaction.
+
+    The segment indexes are dropped for the load and rebuilt afterwards in
+    one pass each, and `bus_trip_loads` is refilled with a single grouped
+    insert instead of one per alias.
+    """
+    delete_segments(conn)
+    for name in SEGMENT_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    count = write_segments(conn, ((alias["alias_id"], planned[alias["alias_id"]]) for alias in aliases))
+    for create_sql in SEGMENT_INDEXES.values():
+        conn.execute(create_sql)
+    update_bus_trip_loads(conn, None, 1)
+    return count
+
+
+def enable_bulk_writes(conn: sqlite3.Connection) -> None:
+    """WAL and synchronous=NORMAL while generating; `close_database` switches back to a rollback journal."""
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+
+
+def close_database(conn: sqlite3.Connection) -> None:
+    # Leave a single-file database behind for the read-only consumers and the pipeline's output hash.
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+
+
+UNASSIGNED_COST = 10**6  # pr. person; altid dyrere end enhver ventetid
+LAST_RESORT_PENALTY = 2 * 24 * 60  # pr. person for ture planner'en kun tager som nødløsning
+LAST_RESORT_WINDOW = 4 * 60  # plan_game_travel leder op til 4 timer før kampstart
+
+
+@dataclass
+class TravelDemand:
+    """One squad's ride to one game, with every direct trip that keeps the 40-minute buffer.
 
-    conn.execute("DELETE FROM team_itinerary_segments")
+    `penalties[i]` is 0 for rides from where the squad actually is, and
+    LAST_RESORT_PENALTY for the rides `plan_game_travel` only uses as a last
+    resort (from the lodging school, or ignoring when the squad gets free).
+    """
 
-    aliases = conn.execute(
+    alias_id: int
+    game_id: int
+    headcount: int
+    service_day: str
+    latest_arrival_min: int
+    options: List[TripOption]
+    penalties: List[int]
+
+
+@dataclass
+class AssignmentReport:
+    demands: int
+    assigned: int
+    split: int
+    unassigned: int
+    solve_seconds: float
+
+
+def collect_travel_demands(
+    conn: sqlite3.Connection,
+    aliases: List[sqlite3.Row],
+    lookup: LookupData,
+) -> List[TravelDemand]:
+    """Game rides as the planner expects them: from lodging to the day's first game, then hall to hall."""
+    demands: List[TravelDemand] = []
+    for alias in aliases:
+        headcount = int(alias["headcount"] or 0)
+        school_stop_id = lookup.school_stop_map.get(alias["school_id"])
+        previous: Optional[sqlite3.Row] = None
+        for game in fetch_games_for_alias(conn, alias["alias_id"]):
+            service_day = game["service_day_code"]
+            hall_stop_id = lookup.hall_stop_map.get(game["hall_id"])
+            start_min = time_to_minutes(game["start_time"])
+            if previous is not None and previous["date"] == game["date"]:
+                origin_stop_id = lookup.hall_stop_map.get(previous["hall_id"])
+                earliest = time_to_minutes(previous["start_time"]) + lookup.tournament_durations.get(
+                    previous["tournament_id"], 25
+                )
+            else:
+                origin_stop_id = school_stop_id
+                earliest = 0
+            previous = game
+            if service_day is None or origin_stop_id is None or hall_stop_id is None or origin_stop_id == hall_stop_id:
+                continue
+            latest_arrival = start_min - 40
+            options: Dict[Tuple[int, int, int], Tuple[TripOption, int]] = {}
+            searches = [(origin_stop_id, earliest, 0), (origin_stop_id, start_min - LAST_RESORT_WINDOW, LAST_RESORT_PENALTY)]
+            if school_stop_id is not None and school_stop_id != hall_stop_id:
+                searches.append((school_stop_id, start_min - LAST_RESORT_WINDOW, LAST_RESORT_PENALTY))
+            for from_stop_id, search_from, penalty in searches:
+                for trip in lookup.timetable.trips_between(service_day, from_stop_id, hall_stop_id, max(0, search_from)):
+                    if trip.arrival_min > latest_arrival:
+                        continue
+                    key = (trip.route_id, trip.trip_index, trip.departure_stop_id)
+                    if key in options and options[key][1] < penalty:
+                        continue
+                    # Same trip passing the stop twice: the later (shorter) ride wins.
+                    options[key] = (trip, penalty)
+            demands.append(
+                TravelDemand(
+                    alias_id=alias["alias_id"],
+                    game_id=game["game_id"],
+                    headcount=headcount,
+                    service_day=service_day,
+                    latest_arrival_min=latest_arrival,
+                    options=[trip for trip, _ in options.values()],
+                    penalties=[penalty for _, penalty in options.values()],
+                )
+            )
+    return demands
+
+
+def solve_global_assignment(
+    demands: List[TravelDemand],
+    limit: int,
+) -> Tuple[Dict[Tuple[int, int], TripOption], AssignmentReport]:
+    """Min-cost flow over squads × bus trips; people are the flow unit.
+
+    Each squad-game sends its headcount either to a trip (cost: minutes
+    between departure and the latest allowed arrival, per person) or to an
+    "unassigned" arc that is dearer than any wait. Trips carry at most
+    `limit` people. The flow may split a squad; it is then rounded to the
+    trip carrying most of it, and squads that no longer fit are left to the
+    greedy planner.
+    """
+    started = time.perf_counter()
+    trips = sorted(
+        {(demand.service_day, option.route_id, option.trip_index) for demand in demands for option in demand.options}
+    )
+    source, sink = 0, 1
+    trip_node = {trip: 2 + len(demands) + idx for idx, trip in enumerate(trips)}
+    network = MinCostFlow(2 + len(demands) + len(trips))
+    option_arcs: List[List[Tuple[int, TripOption]]] = []
+    for idx, demand in enumerate(demands):
+        node = 2 + idx
+        network.add_arc(source, node, demand.headcount, 0)
+        arcs = []
+        for option, penalty in zip(demand.options, demand.penalties):
+            cost = demand.latest_arrival_min - option.departure_min + penalty
+            arc_id = network.add_arc(
+                node, trip_node[(demand.service_day, option.route_id, option.trip_index)], demand.headcount, cost
+            )
+            arcs.append((arc_id, option))
+        network.add_arc(node, sink, demand.headcount, UNASSIGNED_COST)
+        option_arcs.append(arcs)
+    for trip in trips:
+        network.add_arc(trip_node[trip], sink, limit, 0)
+    network.solve(source, sink, sum(demand.headcount for demand in demands))
+
+    plan: Dict[Tuple[int, int], TripOption] = {}
+    loads: Dict[Tuple[str, int, int], int] = defaultdict(int)
+    split = 0
+    for demand, arcs in zip(demands, option_arcs):
+        flows = [(network.flow(arc_id), option) for arc_id, option in arcs]
+        carried = [(flow, option) for flow, option in flows if flow > 0]
+        if len(carried) > 1 or (carried and carried[0][0] < demand.headcount):
+            split += 1
+        # Largest share first, then the cheaper (later) departure.
+        for _, option in sorted(carried, key=lambda item: (-item[0], -item[1].departure_min)):
+            key = (demand.service_day, option.route_id, option.trip_index)
+            if loads[key] + demand.headcount <= limit:
+                loads[key] += demand.headcount
+                plan[(demand.alias_id, demand.game_id)] = option
+                break
+
+    report = AssignmentReport(
+        demands=len(demands),
+        assigned=len(plan),
+        split=split,
+        unassigned=len(demands) - len(plan),
+        solve_seconds=time.perf_counter() - started,
+    )
+    return plan, report
+
+
+def reserve_global_assignment(
+    conn: sqlite3.Connection,
+    aliases: List[sqlite3.Row],
+    lookup: LookupData,
+    tracker: BusLoadTracker,
+) -> AssignmentReport:
+    """Solve the global assignment and hold its trips in `tracker` for `plan_game_travel`."""
+    headcounts = {alias["alias_id"]: int(alias["headcount"] or 0) for alias in aliases}
+    demands = collect_travel_demands(conn, aliases, lookup)
+    plan, report = solve_global_assignment(demands, tracker.limit)
+    service_days = {(demand.alias_id, demand.game_id): demand.service_day for demand in demands}
+    for owner, trip in plan.items():
+        tracker.reserve(owner, service_days[owner], trip, headcounts[owner[0]])
+    return report
+
+
+def fetch_aliases(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+    return conn.execute(
         """
         SELECT alias_id, squad_index, lodging_team_id, schedule_team_id, school_id, school_name, headcount
         FROM vw_team_alignment
@@ -1489,14 +1880,353 @@ def main() -> None:
         """
     ).fetchall()
 
-    total_segments = 0
+
+def partition_aliases(aliases: List[sqlite3.Row], workers: int) -> List[List[int]]:
+    """Split alias ids into at most `workers` chunks without splitting a lodging school.
+
+    Squads from the same school compete for the same departures, so they are
+    planned together. Chunks keep the sequential alias order.
+    """
+    position = {alias["alias_id"]: idx for idx, alias in enumerate(aliases)}
+    groups: Dict[Optional[int], List[int]] = defaultdict(list)
     for alias in aliases:
-        segs = generate_segments_for_alias(conn, alias, lookup, tracker)
-        total_segments += insert_segments(conn, alias["alias_id"], segs)
+        groups[alias["school_id"]].append(alias["alias_id"])
 
+    chunks: List[List[int]] = [[] for _ in range(max(1, min(workers, len(groups))))]
+    for group in sorted(groups.values(), key=lambda ids: (-len(ids), position[ids[0]])):
+        smallest = min(range(len(chunks)), key=lambda idx: (len(chunks[idx]), idx))
+        chunks[smallest].extend(group)
+    return [sorted(chunk, key=position.__getitem__) for chunk in chunks if chunk]
+
+
+def stored_bus_legs(conn: sqlite3.Connection, aliases: List[sqlite3.Row]) -> Dict[int, List[BusLeg]]:
+    """Bus legs of the stored plan per alias: the previous run's guess at everybody's loads."""
+    headcounts = {alias["alias_id"]: int(alias["headcount"] or 0) for alias in aliases}
+    legs: Dict[int, List[BusLeg]] = defaultdict(list)
+    for alias_id, service_day, route_id, trip_index in conn.execute(
+        """
+        SELECT alias_id, service_day, route_id, trip_index
+        FROM team_itinerary_segments
+        WHERE segment_type = 'bus' AND route_id IS NOT NULL AND trip_index IS NOT NULL
+        ORDER BY alias_id, sequence_no
+        """
+    ):
+        if alias_id in headcounts:
+            legs[alias_id].append((service_day, route_id, trip_index, headcounts[alias_id]))
+    return dict(legs)
+
+
+def plan_alias_chunk(
+    alias_ids: List[int],
+    limit: int = BUS_CAPACITY_LIMIT,
+    predicted: Optional[Dict[int, List[BusLeg]]] = None,
+) -> Tuple[Dict[int, List[Segment]], Dict[int, List[JournalEntry]], Dict[int, AliasMetrics]]:
+    """Worker entry point: plan a chunk of aliases with its own connection and tracker.
+
+    The `predicted` bus legs of aliases outside the chunk are booked in sequential
+    order, so the chunk is planned against an estimate of everybody else's loads.
+    Besides the segments, each alias's tracker journal is returned for the merge.
+    """
+    conn = sqlite3.connect(f"{DB_PATH.as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        lookup = load_lookup_data(conn)
+        tracker = BusLoadTracker(limit)
+        wanted = set(alias_ids)
+        planned: Dict[int, List[Segment]] = {}
+        journals: Dict[int, List[JournalEntry]] = {}
+        metrics: Dict[int, AliasMetrics] = {}
+        for alias in fetch_aliases(conn):
+            if alias["alias_id"] not in wanted:
+                tracker.journal = None
+                for leg in (predicted or {}).get(alias["alias_id"], []):
+                    tracker.assign(*leg, force=True)
+                continue
+            tracker.journal = journals[alias["alias_id"]] = []
+            planned[alias["alias_id"]] = plan_alias(conn, alias, lookup, tracker, metrics)
+        return planned, journals, metrics
+    finally:
+        conn.close()
+
+
+def plan_in_parallel(
+    conn: sqlite3.Connection,
+    aliases: List[sqlite3.Row],
+    workers: int,
+    limit: int = BUS_CAPACITY_LIMIT,
+    metrics: Optional[Dict[int, AliasMetrics]] = None,
+    predicted: Optional[Dict[int, List[BusLeg]]] = None,
+) -> Tuple[Dict[int, List[Segment]], int]:
+    """Plan chunks in a process pool, then merge in sequential alias order.
+
+    Workers book the `predicted` legs of the other chunks' squads (e.g. the stored
+    plan) before planning their own. Each worker plan is then replayed on one shared
+    tracker (`BusLoadTracker.replay`); a squad whose capacity checks come out
+    differently there is re-planned against it. The result is therefore the same
+    as planning every squad sequentially, at any capacity; how many squads need
+    the re-plan depends on how close the prediction is.
+
+    Returns the segments per alias and the number of squads re-planned in the
+    merge. The workers' per-squad metrics (plus any merge re-plan) go into `metrics`.
+    """
+    chunks = partition_aliases(aliases, workers)
+    planned: Dict[int, List[Segment]] = {}
+    journals: Dict[int, List[JournalEntry]] = {}
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        for chunk_planned, chunk_journals, chunk_metrics in pool.map(
+            plan_alias_chunk, chunks, [limit] * len(chunks), [predicted] * len(chunks)
+        ):
+            planned.update(chunk_planned)
+            journals.update(chunk_journals)
+            if metrics is not None:
+                metrics.update(chunk_metrics)
+
+    lookup: Optional[LookupData] = None
+    tracker = BusLoadTracker(limit)
+    replanned = 0
+    for alias in aliases:
+        if tracker.replay(journals[alias["alias_id"]]):
+            continue
+        if lookup is None:
+            lookup = load_lookup_data(conn)
+        planned[alias["alias_id"]] = plan_alias(conn, alias, lookup, tracker, metrics)
+        replanned += 1
+    return planned, replanned
+
+
+def write_game_snapshot(conn: sqlite3.Connection, game_ids: Optional[Iterable[int]] = None) -> None:
+    """Remember the schedule the current segments were planned from.
+
+    Without `game_ids` the whole snapshot is rewritten; with them only those games are refreshed,
+    so games that still differ from the snapshot keep showing up in `changed_games_since_snapshot`.
+    """
+    if game_ids is None:
+        conn.execute("DELETE FROM itinerary_game_snapshot")
+        conn.execute(
+            """
+            INSERT INTO itinerary_game_snapshot (game_id, day_id, hall_id, start_time, home_team_id, away_team_id)
+            SELECT game_id, day_id, hall_id, start_time, home_team_id, away_team_id
+            FROM schedule_games
+            """
+        )
+        return
+    params = [(game_id,) for game_id in game_ids]
+    conn.executemany("DELETE FROM itinerary_game_snapshot WHERE game_id = ?", params)
+    conn.executemany(
+        """
+        INSERT INTO itinerary_game_snapshot (game_id, day_id, hall_id, start_time, home_team_id, away_team_id)
+        SELECT game_id, day_id, hall_id, start_time, home_team_id, away_team_id
+        FROM schedule_games
+        WHERE game_id = ?
+        """,
+        params,
+    )
+
+
+def changed_games_since_snapshot(conn: sqlite3.Connection) -> List[int]:
+    """Games that were added, removed or moved since the last snapshot."""
+    rows = conn.execute(
+        """
+        WITH current AS (
+            SELECT game_id, day_id, hall_id, start_time, home_team_id, away_team_id FROM schedule_games
+        ),
+        previous AS (
+            SELECT game_id, day_id, hall_id, start_time, home_team_id, away_team_id FROM itinerary_game_snapshot
+        ),
+        changed AS (
+            SELECT * FROM current EXCEPT SELECT * FROM previous
+            UNION
+            SELECT * FROM previous EXCEPT SELECT * FROM current
+        )
+        SELECT DISTINCT game_id FROM changed ORDER BY game_id
+        """
+    )
+    return [row[0] for row in rows]
+
+
+def affected_alias_ids(conn: sqlite3.Connection, game_ids: Iterable[int]) -> Set[int]:
+    """Aliases playing in the games now, or according to the snapshot (moved/removed games)."""
+    affected: Set[int] = set()
+    for game_id in game_ids:
+        for row in conn.execute("SELECT alias_id FROM vw_team_games WHERE game_id = ?", (game_id,)):
+            affected.add(row[0])
+        for row in conn.execute(
+            """
+            SELECT ta.alias_id
+            FROM itinerary_game_snapshot snap
+            JOIN team_aliases ta ON ta.schedule_team_id IN (snap.home_team_id, snap.away_team_id)
+            WHERE snap.game_id = ?
+            """,
+            (game_id,),
+        ):
+            affected.add(row[0])
+    return affected
+
+
+def regenerate_aliases(
+    conn: sqlite3.Connection,
+    alias_ids: Set[int],
+    game_ids: Iterable[int],
+    metrics: Optional[Dict[int, AliasMetrics]] = None,
+    capacity: int = BUS_CAPACITY_LIMIT,
+) -> int:
+    """Re-plan only `alias_ids` against the loads of everybody else; one transaction.
+
+    The snapshot rows of `game_ids` (the changed games) are refreshed in the same transaction.
+    With `metrics`, their rows in `planner_metrics` are replaced as well.
+    """
+    aliases = [alias for alias in fetch_aliases(conn) if alias["alias_id"] in alias_ids]
+    tracker = BusLoadTracker(capacity, conn)
+    for alias in aliases:
+        stored = conn.execute("SELECT * FROM team_itinerary_segments WHERE alias_id = ?", (alias["alias_id"],))
+        release_bus_segments(tracker, alias, [Segment.from_row(row) for row in stored])
+
+    lookup = load_lookup_data(conn)
+    planned = {alias["alias_id"]: plan_alias(conn, alias, lookup, tracker, metrics) for alias in aliases}
+
+    total_segments = 0
+    with conn:
+        for alias in aliases:
+            delete_segments(conn, alias["alias_id"])
+            total_segments += insert_segments(conn, alias["alias_id"], planned[alias["alias_id"]])
+        write_game_snapshot(conn, game_ids)
+        if metrics is not None:
+            store_planner_metrics(conn, metrics, replace_all=False)
+    return total_segments
+
+
+def parse_changed_games(conn: sqlite3.Connection, value: str) -> List[int]:
+    if value == "auto":
+        return changed_games_since_snapshot(conn)
+    try:
+        return [int(part) for part in value.split(",") if part.strip()]
+    except ValueError as exc:
+        raise SystemExit(f"--changed-games expects comma-separated game ids or 'auto', got {value!r}") from exc
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate itinerary segments for all squads.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Plan lodging-school groups in N processes and merge bus loads afterwards (default 1: sequential)",
+    )
+    parser.add_argument(
+        "--assignment",
+        choices=("greedy", "flow"),
+        default="greedy",
+        help="greedy: first-fit in squad order (default); flow: global min-cost flow for game rides first",
+    )
+    parser.add_argument(
+        "--bus-capacity",
+        type=int,
+        default=BUS_CAPACITY_LIMIT,
+        help=f"Persons per bus trip (default {BUS_CAPACITY_LIMIT})",
+    )
+    parser.add_argument(
+        "--changed-games",
+        metavar="IDS",
+        help="Re-plan only squads in these games (comma-separated game_id, or 'auto' to diff against the last run)",
+    )
+    parser.add_argument(
+        "--slowest",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Print the planning-time histogram and the N slowest squads (default 10; 0: print nothing)",
+    )
+    parser.add_argument(
+        "--profile-sql",
+        action="store_true",
+        help="Time every SQL statement template and write a report with query plans to output/profile/",
+    )
+    args = parser.parse_args(argv)
+    if args.assignment == "flow" and (args.workers > 1 or args.changed_games is not None):
+        parser.error("--assignment flow plans all squads in one process; drop --workers/--changed-games")
+    if args.changed_games is not None and args.workers > 1:
+        parser.error("--changed-games re-plans the affected squads in one process; drop --workers")
+    if args.profile_sql and args.workers > 1:
+        parser.error("--profile-sql only sees this process's queries; drop --workers")
+
+    if not DB_PATH.exists():
+        raise FileNotFoundError(f"Missing database: {DB_PATH}. Run build_event_db.py first.")
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    profiler = SqlProfiler() if args.profile_sql else None
+    if profiler is not None:
+        conn = profiler.wrap(conn)
+    enable_bulk_writes(conn)
+    metrics: Dict[int, AliasMetrics] = {}
+
+    if args.changed_games is not None:
+        game_ids = parse_changed_games(conn, args.changed_games)
+        alias_ids = affected_alias_ids(conn, game_ids)
+        if alias_ids:
+            total_segments = regenerate_aliases(conn, alias_ids, game_ids, metrics, args.bus_capacity)
+        else:
+            # No squad plays these games (any more); only the snapshot needs to catch up.
+            with conn:
+                write_game_snapshot(conn, game_ids)
+            total_segments = 0
+        metrics_text = format_planner_metrics(conn, metrics, args.slowest) if metrics and args.slowest > 0 else None
+        profile = profiler.report(conn) if profiler is not None else None
+        close_database(conn)
+        print(
+            f"Re-planned {len(alias_ids)} squads for {len(game_ids)} changed games "
+            f"({total_segments} itinerary segments written)."
+        )
+        if metrics_text is not None:
+            print(metrics_text)
+        if profile is not None:
+            publish_report(profile)
+        return
+
+    aliases = fetch_aliases(conn)
+
+    replanned = 0
+    report: Optional[AssignmentReport] = None
+    if args.workers > 1:
+        predicted = stored_bus_legs(conn, aliases)
+        planned, replanned = plan_in_parallel(conn, aliases, args.workers, args.bus_capacity, metrics, predicted)
+    else:
+        lookup = load_lookup_data(conn)
+        tracker = BusLoadTracker(args.bus_capacity)
+        if args.assignment == "flow":
+            report = reserve_global_assignment(conn, aliases, lookup, tracker)
+        planned = {}
+        for alias in aliases:
+            planned[alias["alias_id"]] = plan_alias(conn, alias, lookup, tracker, metrics)
+            tracker.release_reservations(alias["alias_id"])
+
+    write_started = time.perf_counter()
+    total_segments = replace_all_segments(conn, aliases, planned)
+    write_game_snapshot(conn)
+    store_planner_metrics(conn, metrics, replace_all=True)
     conn.commit()
-    conn.close()
-    print(f"Generated {total_segments} itinerary segments for {len(aliases)} squads.")
+    write_seconds = time.perf_counter() - write_started
+    metrics_text = format_planner_metrics(conn, metrics, args.slowest) if metrics and args.slowest > 0 else None
+    profile = profiler.report(conn) if profiler is not None else None
+    close_database(conn)
+    print(f"Generated {total_segments} itinerary segments for {len(aliases)} squads (written in {write_seconds:.3f}s).")
+    if args.workers > 1:
+        print(f"Parallel planning with {args.workers} workers; {replanned} squads re-planned during merge.")
+    if report is not None:
+        overrides = sum(
+            1
+            for segments in planned.values()
+            for seg in segments
+            if "capacity override" in (seg.notes or "")
+        )
+        print(
+            f"Global assignment: {report.assigned}/{report.demands} game rides reserved "
+            f"({report.split} split by the flow, {report.unassigned} left to greedy), "
+            f"solve {report.solve_seconds:.3f}s; {overrides} capacity overrides."
+        )
+    if metrics_text is not None:
+        print(metrics_text)
+    if profile is not None:
+        publish_report(profile)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,8 @@ Populate the team_aliases table by matching lodging squads to tournament teams.
 
 Heuristics:
 - Match on division key (gender + birth year) derived from tournament metadata.
-- Require the lodging club slug to be present in the schedule team name variants.
+- Require the lodging club slug to be present in the schedule team name variants
+  (looked up through `ScheduleSlugIndex` instead of scanning every schedule team).
 - Allocate multiple squads per club (team_squads) to distinct schedule teams when available.
 """
 
@@ -13,9 +14,10 @@ from __future__ import annotations
 import re
 import sqlite3
 import unicodedata
+from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_PATH = ROOT / "data" / "build" / "event_planner.db"
@@ -38,6 +40,9 @@ CUSTOM_SLUGS = {
     "Aurskog Finstadbru": {"afsk"},
 }
 
+# Longest substring kept in the n-gram index; longer slugs are narrowed by their trigrams.
+GRAM_SIZE = 3
+
 
 def slugify(text: str) -> str:
     normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
@@ -88,6 +93,60 @@ class LodgingTeam:
     squad_count: int
 
 
+def substrings(text: str, max_size: int = GRAM_SIZE) -> Set[str]:
+    """Every substring of `text` with 1..max_size characters."""
+    return {text[start : start + size] for size in range(1, max_size + 1) for start in range(len(text) - size + 1)}
+
+
+class ScheduleSlugIndex:
+    """
+    Schedule teams by division key, for "a club slug occurs in one of the team's
+    name variants" lookups without scanning every team.
+
+    Per division key, `variants` maps each slug variant to the teams that have
+    it, and `grams` maps each 1-3 character substring of a variant to the
+    variants that contain it. A slug of up to three characters is a direct
+    `grams` lookup. A longer slug takes the smallest posting list among its
+    trigrams and keeps the variants that really contain it.
+    """
+
+    def __init__(self, schedule: Dict[int, ScheduleTeam]) -> None:
+        self.schedule = schedule
+        self.position = {team_id: position for position, team_id in enumerate(schedule)}
+        self.variants: Dict[str, Dict[str, Set[int]]] = defaultdict(lambda: defaultdict(set))
+        self.grams: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        for team in schedule.values():
+            for division_key in team.division_keys:
+                for variant in team.slug_variants:
+                    self.variants[division_key][variant].add(team.team_id)
+        for division_key, variants in self.variants.items():
+            grams = self.grams[division_key]
+            for variant in variants:
+                for gram in substrings(variant):
+                    grams[gram].add(variant)
+
+    def variants_containing(self, division_key: str, slug: str) -> Set[str]:
+        grams = self.grams.get(division_key)
+        if not grams:
+            return set()
+        if len(slug) <= GRAM_SIZE:
+            return grams.get(slug, set())
+        postings = min(
+            (grams.get(slug[start : start + GRAM_SIZE], set()) for start in range(len(slug) - GRAM_SIZE + 1)),
+            key=len,
+        )
+        return {variant for variant in postings if slug in variant}
+
+    def candidates(self, division_key: str, slugs: Iterable[str]) -> List[ScheduleTeam]:
+        """Teams in the division with a variant containing any of `slugs`, in schedule order."""
+        variants = self.variants.get(division_key, {})
+        team_ids: Set[int] = set()
+        for slug in slugs:
+            for variant in self.variants_containing(division_key, slug):
+                team_ids.update(variants[variant])
+        return [self.schedule[team_id] for team_id in sorted(team_ids, key=self.position.__getitem__)]
+
+
 def load_schedule_teams(conn: sqlite3.Connection) -> Dict[int, ScheduleTeam]:
     query = """
     WITH team_games AS (
@@ -161,6 +220,7 @@ def main() -> None:
 
     schedule = load_schedule_teams(conn)
     lodging = load_lodging_teams(conn)
+    index = ScheduleSlugIndex(schedule)
 
     conn.execute("DELETE FROM team_aliases")
 
@@ -183,15 +243,7 @@ def main() -> None:
                 unmatched_count += 1
             continue
 
-        candidates: List[ScheduleTeam] = []
-        for sched in schedule.values():
-            if division_key not in sched.division_keys:
-                continue
-            if any(
-                any(slug in variant for slug in club_slugs_set)
-                for variant in sched.slug_variants
-            ):
-                candidates.append(sched)
+        candidates = index.candidates(division_key, club_slugs_set)
 
         # Remove already assigned schedule teams.
         for squad_index in range(1, team.squad_count + 1):
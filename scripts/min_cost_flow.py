@@ -0,0 +1,96 @@
+"""
+Pure-Python min-cost flow (successive shortest paths with Dijkstra + potentials).
+
+Used by `generate_itineraries.py --assignment flow` to share bus capacity
+between all squads at once instead of first-come-first-served. The network
+is small (a few hundred squad-games and bus trips), so a textbook
+implementation without external solvers is fast enough.
+
+All arc costs must be non-negative; capacities and costs are integers.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import List, Tuple
+
+
+class MinCostFlow:
+    """Directed graph with integer capacities and non-negative integer costs."""
+
+    def __init__(self, node_count: int) -> None:
+        self.node_count = node_count
+        # Arc i and its residual twin i ^ 1 are stored next to each other.
+        self._to: List[int] = []
+        self._capacity: List[int] = []
+        self._cost: List[int] = []
+        self._adjacency: List[List[int]] = [[] for _ in range(node_count)]
+
+    def add_arc(self, tail: int, head: int, capacity: int, cost: int) -> int:
+        """Add an arc and return its id (use with `flow`)."""
+        if cost < 0:
+            raise ValueError("MinCostFlow only supports non-negative arc costs")
+        arc_id = len(self._to)
+        self._to.extend((head, tail))
+        self._capacity.extend((capacity, 0))
+        self._cost.extend((cost, -cost))
+        self._adjacency[tail].append(arc_id)
+        self._adjacency[head].append(arc_id + 1)
+        return arc_id
+
+    def flow(self, arc_id: int) -> int:
+        """Flow currently routed over arc `arc_id` (the residual twin's capacity)."""
+        return self._capacity[arc_id + 1]
+
+    def solve(self, source: int, sink: int, demand: int) -> Tuple[int, int]:
+        """Send up to `demand` units from source to sink at minimum cost.
+
+        Returns (flow sent, total cost). Ties between equal-cost paths are
+        broken by node and arc order, so the result is deterministic.
+        """
+        never = float("inf")
+        potential = [0] * self.node_count
+        sent = 0
+        total_cost = 0
+        while sent < demand:
+            distance = [never] * self.node_count
+            via_arc = [-1] * self.node_count
+            distance[source] = 0
+            queue = [(0, source)]
+            while queue:
+                dist, node = heapq.heappop(queue)
+                if dist > distance[node]:
+                    continue
+                if node == sink:
+                    break
+                for arc_id in self._adjacency[node]:
+                    if self._capacity[arc_id] <= 0:
+                        continue
+                    head = self._to[arc_id]
+                    reduced = dist + self._cost[arc_id] + potential[node] - potential[head]
+                    if reduced < distance[head]:
+                        distance[head] = reduced
+                        via_arc[head] = arc_id
+                        heapq.heappush(queue, (reduced, head))
+            if distance[sink] == never:
+                break
+            # Stopped at the sink: capping at its distance keeps reduced costs non-negative.
+            sink_distance = distance[sink]
+            for node in range(self.node_count):
+                potential[node] += min(distance[node], sink_distance)
+
+            push = demand - sent
+            node = sink
+            while node != source:
+                arc_id = via_arc[node]
+                push = min(push, self._capacity[arc_id])
+                node = self._to[arc_id ^ 1]
+            node = sink
+            while node != source:
+                arc_id = via_arc[node]
+                self._capacity[arc_id] -= push
+                self._capacity[arc_id ^ 1] += push
+                total_cost += push * self._cost[arc_id]
+                node = self._to[arc_id ^ 1]
+            sent += push
+        return sent, total_cost
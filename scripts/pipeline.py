@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Run the full build pipeline in one interpreter, skipping stages whose inputs are unchanged.
+
+Usage:
+    python3 scripts/pipeline.py [--force] [--stop-after STAGE] [--jobs N]
+
+Stages (in order):
+    build_bus_routes → build_lodging → build_tournament → build_event_db
+    → map_team_aliases → generate_itineraries → render
+
+Each stage is keyed by a sha256 over its script sources, its raw input
+files (xlsx, docx, `bus_routes_text.txt`) and the output hashes recorded
+for its upstream stages (the intermediate SQLite databases). The keys and
+output hashes are kept in `data/build/pipeline_state.json`, together with
+the hash of every output file and the stage that last wrote it. A stage is
+skipped when its key matches and its outputs still have the recorded hash
+(written by the stage itself or a later one), so a database changed by hand,
+e.g. with `generate_itineraries.py --changed-games`, is rebuilt. Because
+rebuilding a database from identical inputs gives identical bytes, a stage
+that re-runs without changing its output does not force its downstream stages.
+
+`build_event_db`, `map_team_aliases` and `generate_itineraries` all write
+`event_planner.db`. When one of them runs, the later ones run too, since
+`build_event_db` recreates the file and each later stage builds on the
+previous one's tables.
+
+A table with the time of each stage is printed at the end, next to its last
+cold (non-skipped) run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = ROOT / "scripts"
+BUILD_DIR = ROOT / "data" / "build"
+STATE_PATH = BUILD_DIR / "pipeline_state.json"
+STATE_VERSION = 2
+
+EVENT_DB = BUILD_DIR / "event_planner.db"
+
+
+def run_build_bus_routes(args: argparse.Namespace) -> None:
+    import build_bus_routes
+
+    build_bus_routes.main([])
+
+
+def run_build_lodging(args: argparse.Namespace) -> None:
+    import build_lodging
+
+    build_lodging.main([])
+
+
+def run_build_tournament(args: argparse.Namespace) -> None:
+    import build_tournament
+
+    build_tournament.main([])
+
+
+def run_build_event_db(args: argparse.Namespace) -> None:
+    import build_event_db
+
+    build_event_db.main([])
+
+
+def run_map_team_aliases(args: argparse.Namespace) -> None:
+    import map_team_aliases
+
+    map_team_aliases.main()
+
+
+def run_generate_itineraries(args: argparse.Namespace) -> None:
+    import generate_itineraries
+
+    generate_itineraries.main([])
+
+
+def run_render(args: argparse.Namespace) -> None:
+    import generate_all_pdfs
+
+    generate_all_pdfs.main(["--jobs", str(args.jobs)] + (["--force"] if args.force else []))
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[argparse.Namespace], None]
+    scripts: List[str]
+    outputs: List[Path]
+    inputs: List[Path] = field(default_factory=list)
+    upstream: List[str] = field(default_factory=list)
+
+
+STAGES: List[Stage] = [
+    Stage(
+        "build_bus_routes",
+        run_build_bus_routes,
+        scripts=["build_bus_routes.py", "sql_dump.py"],
+        inputs=[ROOT / "data" / "raw" / "bus_routes_text.txt"],
+        outputs=[BUILD_DIR / "bus_routes.db"],
+    ),
+    Stage(
+        "build_lodging",
+        run_build_lodging,
+        scripts=["build_lodging.py", "sql_dump.py"],
+        inputs=[ROOT / "Overnatningsoversigt (1).docx"],
+        outputs=[BUILD_DIR / "lodging.db"],
+    ),
+    Stage(
+        "build_tournament",
+        run_build_tournament,
+        scripts=["build_tournament.py", "sql_dump.py"],
+        inputs=[ROOT / "Kampoppsett EYC 25 - 27 april 2025 (1).xlsx"],
+        outputs=[BUILD_DIR / "tournament.db"],
+    ),
+    Stage(
+        "build_event_db",
+        run_build_event_db,
+        scripts=["build_event_db.py", "sql_dump.py", "timetable.py"],
+        upstream=["build_bus_routes", "build_lodging", "build_tournament"],
+        outputs=[EVENT_DB],
+    ),
+    Stage(
+        "map_team_aliases",
+        run_map_team_aliases,
+        scripts=["map_team_aliases.py"],
+        upstream=["build_event_db"],
+        outputs=[EVENT_DB],
+    ),
+    Stage(
+        "generate_itineraries",
+        run_generate_itineraries,
+        scripts=["generate_itineraries.py", "timetable.py", "min_cost_flow.py", "sql_profile.py"],
+        upstream=["map_team_aliases"],
+        outputs=[EVENT_DB],
+    ),
+    Stage(
+        "render",
+        run_render,
+        scripts=["generate_all_pdfs.py", "render_pdf.py"],
+        upstream=["generate_itineraries"],
+        outputs=[ROOT / "output" / "itineraries.manifest.json"],
+    ),
+]
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stage_key(stage: Stage, state: Dict[str, Dict]) -> str:
+    """Hash of everything the stage reads: scripts, raw inputs and upstream outputs."""
+    digest = hashlib.sha256(f"stage={stage.name}".encode("utf-8"))
+    for script in stage.scripts:
+        digest.update(f"script={script}:{file_digest(SCRIPTS_DIR / script)}".encode("utf-8"))
+    for path in stage.inputs:
+        digest.update(f"input={path.name}:{file_digest(path)}".encode("utf-8"))
+    for name in stage.upstream:
+        digest.update(f"upstream={name}:{state[name]['output_digest']}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def output_digest(stage: Stage) -> str:
+    digest = hashlib.sha256()
+    for path in stage.outputs:
+        digest.update(f"{path.name}:{file_digest(path)}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_state(path: Path) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+    """Per-stage {"key", "output_digest", "seconds"} and per-output-file {"digest", "stage"}.
+
+    Both are empty if the file is missing, unreadable or outdated.
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}, {}
+    if data.get("version") != STATE_VERSION:
+        return {}, {}
+    return data.get("stages", {}), data.get("files", {})
+
+
+def save_state(path: Path, stages: Dict[str, Dict], files: Dict[str, Dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    data = {"version": STATE_VERSION, "stages": stages, "files": files}
+    tmp_path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    tmp_path.replace(path)
+
+
+def outputs_intact(stage: Stage, files: Dict[str, Dict], order: Dict[str, int]) -> bool:
+    """Every output still has the hash the pipeline recorded, written by this stage or a later one."""
+    for path in stage.outputs:
+        record = files.get(str(path))
+        if record is None or order.get(record["stage"], -1) < order[stage.name]:
+            return False
+        if not path.exists() or file_digest(path) != record["digest"]:
+            return False
+    return True
+
+
+def run_pipeline(args: argparse.Namespace, stages: List[Stage] = STAGES, state_path: Path = STATE_PATH) -> List[Dict]:
+    """Run or skip each stage in order; returns one timing record per stage."""
+    state, files = load_state(state_path)
+    order = {stage.name: index for index, stage in enumerate(stages)}
+    rewritten: Set[Path] = set()
+    report: List[Dict] = []
+    for stage in stages:
+        key = stage_key(stage, state)
+        previous = state.get(stage.name)
+        intact = not rewritten & set(stage.outputs) and outputs_intact(stage, files, order)
+        if not args.force and previous is not None and previous["key"] == key and intact:
+            report.append({"stage": stage.name, "status": "cached", "seconds": 0.0, "cold_seconds": previous["seconds"]})
+        else:
+            print(f"==> {stage.name}")
+            # Forget the stage first so a failure midway is never mistaken for a finished run.
+            state.pop(stage.name, None)
+            for path in stage.outputs:
+                files.pop(str(path), None)
+            save_state(state_path, state, files)
+            started = time.perf_counter()
+            stage.run(args)
+            elapsed = time.perf_counter() - started
+            state[stage.name] = {"key": key, "output_digest": output_digest(stage), "seconds": round(elapsed, 3)}
+            for path in stage.outputs:
+                files[str(path)] = {"digest": file_digest(path), "stage": stage.name}
+            save_state(state_path, state, files)
+            rewritten.update(stage.outputs)
+            report.append({"stage": stage.name, "status": "ran", "seconds": elapsed, "cold_seconds": elapsed})
+        if stage.name == args.stop_after:
+            break
+    return report
+
+
+def print_report(report: List[Dict]) -> None:
+    print(f"\n{'Stage':22} {'Status':7} {'Time':>8} {'Cold run':>9}")
+    for entry in report:
+        print(
+            f"{entry['stage']:22} {entry['status']:7} {entry['seconds']:7.2f}s {entry['cold_seconds']:8.2f}s"
+        )
+    print(f"{'Total':22} {'':7} {sum(entry['seconds'] for entry in report):7.2f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the build pipeline, skipping stages whose inputs are unchanged.")
+    parser.add_argument("--force", action="store_true", help="Run every stage even if its inputs are unchanged")
+    parser.add_argument(
+        "--stop-after",
+        choices=[stage.name for stage in STAGES],
+        help="Stop after this stage (e.g. generate_itineraries to skip PDF rendering)",
+    )
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for the render stage (default 1)")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    report = run_pipeline(args)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
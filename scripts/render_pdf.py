@@ -7,18 +7,26 @@ Usage:
 
 Requires `fpdf` (install via `pip install fpdf2`) for PDF rendering.
 Falls back to plain text if the library is unavailable.
+
+The `fetch_all_*` helpers and `FontCache` are used by `generate_all_pdfs.py`
+to render every alias in one process: four bulk queries instead of four per
+alias, and the DejaVu fonts are parsed once per batch instead of per PDF.
 """
 
 from __future__ import annotations
 
 import argparse
+import copy
+import io
 import os
 import sqlite3
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Tuple
 
 try:
+    from fontTools import ttLib  # type: ignore
     from fpdf import FPDF  # type: ignore
 
     HAS_FPDF = True
@@ -30,6 +38,12 @@ DB_PATH = ROOT / "data" / "build" / "event_planner.db"
 
 SERVICE_DAY_LABEL = {"fri": "Fredag", "sat": "Lørdag", "sun": "Søndag"}
 
+FONT_FAMILY = "DejaVu"
+FONT_FILES = {
+    "": "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "B": "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+}
+
 
 def get_connection() -> sqlite3.Connection:
     if not DB_PATH.exists():
@@ -94,13 +108,135 @@ def fetch_games(conn: sqlite3.Connection, alias_id: int) -> List[Dict]:
     return [dict(r) for r in rows]
 
 
-def render_pdf(header: Dict, itinerary: List[Dict], manual: List[Dict], games: List[Dict], output_path: Path) -> None:
+def _group_by_alias(rows: List[sqlite3.Row], keep_alias_id: bool = True) -> Dict[int, List[Dict]]:
+    """Split bulk rows per alias, mirroring the per-alias fetch_* results."""
+    grouped: Dict[int, List[Dict]] = defaultdict(list)
+    for row in rows:
+        record = dict(row)
+        alias_id = record["alias_id"] if keep_alias_id else record.pop("alias_id")
+        grouped[alias_id].append(record)
+    return grouped
+
+
+def _alias_filter(alias_ids: Optional[Sequence[int]]) -> Tuple[str, Tuple[int, ...]]:
+    """WHERE clause limiting a bulk fetch to `alias_ids` (None: every alias)."""
+    if alias_ids is None:
+        return "", ()
+    placeholders = ", ".join("?" for _ in alias_ids)
+    return f"WHERE alias_id IN ({placeholders})", tuple(alias_ids)
+
+
+def fetch_all_headers(conn: sqlite3.Connection, alias_ids: Optional[Sequence[int]] = None) -> Dict[int, Dict]:
+    where, params = _alias_filter(alias_ids)
+    rows = conn.execute(
+        f"""
+        SELECT alias_id, lodging_club, raw_label, schedule_team_name,
+               school_name, room_codes, headcount
+        FROM vw_team_alignment
+        {where}
+        ORDER BY alias_id
+        """,
+        params,
+    ).fetchall()
+    return {row["alias_id"]: dict(row) for row in rows}
+
+
+def fetch_all_itineraries(conn: sqlite3.Connection, alias_ids: Optional[Sequence[int]] = None) -> Dict[int, List[Dict]]:
+    where, params = _alias_filter(alias_ids)
+    rows = conn.execute(
+        f"""
+        SELECT *
+        FROM vw_team_itinerary_flat
+        {where}
+        ORDER BY alias_id, service_day, sequence_no
+        """,
+        params,
+    ).fetchall()
+    return _group_by_alias(rows)
+
+
+def fetch_all_manual_segments(conn: sqlite3.Connection, alias_ids: Optional[Sequence[int]] = None) -> Dict[int, List[Dict]]:
+    where, params = _alias_filter(alias_ids)
+    rows = conn.execute(
+        f"""
+        SELECT *
+        FROM vw_manual_transport_needs
+        {where}
+        ORDER BY alias_id, service_day, start_time
+        """,
+        params,
+    ).fetchall()
+    return _group_by_alias(rows)
+
+
+def fetch_all_games(conn: sqlite3.Connection, alias_ids: Optional[Sequence[int]] = None) -> Dict[int, List[Dict]]:
+    where, params = _alias_filter(alias_ids)
+    rows = conn.execute(
+        f"""
+        SELECT alias_id, date, day_label, start_time, hall_name, tournament_name,
+               opponent_name, role
+        FROM vw_team_games
+        {where}
+        ORDER BY alias_id, date, start_time
+        """,
+        params,
+    ).fetchall()
+    return _group_by_alias(rows, keep_alias_id=False)
+
+
+def output_filename(alias_id: int, team_name: str, fmt: str, timestamp: str) -> str:
+    # Sanitize team name for filename (replace / and spaces)
+    safe_team_name = team_name.replace('/', '-').replace(' ', '_')
+    return f"{alias_id}_{safe_team_name}_{timestamp}.{fmt}"
+
+
+class FontCache:
+    """Parse the DejaVu fonts once and hand each new FPDF its own copy.
+
+    fpdf2 subsets a document's fontTools object in place when the PDF is
+    written, so documents cannot share it. Each copy therefore gets a fresh
+    lazily-loaded font object over the cached file bytes, while the parsed
+    metrics (glyph widths, cmap, descriptors) are shared.
+    """
+
+    def __init__(self) -> None:
+        if not HAS_FPDF:
+            raise RuntimeError("fpdf2 is required to render PDFs. Install with `pip install fpdf2`.")
+        template = FPDF()
+        self._font_bytes: Dict[str, bytes] = {}
+        for style, path in FONT_FILES.items():
+            template.add_font(FONT_FAMILY, style, path)
+            self._font_bytes[style] = Path(path).read_bytes()
+        self._fonts = template.fonts
+
+    def new_document(self) -> "FPDF":
+        pdf = FPDF()
+        for style in FONT_FILES:
+            fontkey = f"{FONT_FAMILY.lower()}{style}"
+            font = copy.deepcopy(self._fonts[fontkey])
+            font.i = len(pdf.fonts) + 1
+            font.ttfont = ttLib.TTFont(io.BytesIO(self._font_bytes[style]), recalcTimestamp=False, lazy=True)
+            pdf.fonts[fontkey] = font
+        return pdf
+
+
+def render_pdf(
+    header: Dict,
+    itinerary: List[Dict],
+    manual: List[Dict],
+    games: List[Dict],
+    output_path: Path,
+    fonts: Optional[FontCache] = None,
+) -> None:
     if not HAS_FPDF:
         raise RuntimeError("fpdf2 is required to render PDFs. Install with `pip install fpdf2`.")
 
-    pdf = FPDF()
-    pdf.add_font("DejaVu", "", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
-    pdf.add_font("DejaVu", "B", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+    if fonts is not None:
+        pdf = fonts.new_document()
+    else:
+        pdf = FPDF()
+        for style, path in FONT_FILES.items():
+            pdf.add_font(FONT_FAMILY, style, path)
     # Set margins to ensure text doesn't overflow
     pdf.set_margins(left=15, top=15, right=15)
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -283,9 +419,7 @@ def main() -> None:
         games = fetch_games(conn, args.alias_id)
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Sanitize team name for filename (replace / and spaces)
-    safe_team_name = header['schedule_team_name'].replace('/', '-').replace(' ', '_')
-    filename = f"{args.alias_id}_{safe_team_name}_{timestamp}.{args.format}"
+    filename = output_filename(args.alias_id, header["schedule_team_name"], args.format, timestamp)
     output_path = args.output / filename
 
     if args.format == "pdf":
@@ -0,0 +1,101 @@
+"""
+Opt-in text dumps of the build databases (`--dump` on the build_*.py scripts).
+
+    --dump / --dump sql   full `iterdump()` as `<name>.sql.gz`
+    --dump csv            schema as `<name>.schema.sql` plus one
+                          `<name>_csv/<table>.csv.gz` per table, rows in rowid order
+
+Dumps go through a buffered gzip stream with a fixed header timestamp, so an
+unchanged database gives byte-identical files. Without `--dump` nothing is
+written, and dumps left over from an earlier build are removed so they can
+never disagree with the database next to them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, TextIO
+
+DUMP_FORMATS = ("sql", "csv")
+BUFFER_SIZE = 1 << 20
+
+
+def add_dump_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--dump",
+        nargs="?",
+        const="sql",
+        choices=DUMP_FORMATS,
+        help="Also write a gzip dump: full SQL (default) or schema + per-table CSV",
+    )
+
+
+def dump_paths(db_path: Path) -> List[Path]:
+    """Every file or directory a dump of `db_path` may produce (including the old plain .sql)."""
+    return [
+        db_path.with_suffix(".sql"),
+        db_path.with_suffix(".sql.gz"),
+        db_path.with_suffix(".schema.sql"),
+        db_path.with_name(f"{db_path.stem}_csv"),
+    ]
+
+
+def open_gzip_text(path: Path) -> TextIO:
+    gz = gzip.GzipFile(path, "wb", compresslevel=6, mtime=0)
+    return io.TextIOWrapper(io.BufferedWriter(gz, BUFFER_SIZE), encoding="utf-8", newline="\n")
+
+
+def write_sql_dump(conn: sqlite3.Connection, path: Path) -> None:
+    with open_gzip_text(path) as dump:
+        for line in conn.iterdump():
+            dump.write(f"{line}\n")
+
+
+def write_schema_and_csv(conn: sqlite3.Connection, schema_path: Path, csv_dir: Path) -> None:
+    objects = conn.execute(
+        """
+        SELECT type, name, sql
+        FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY rowid
+        """
+    ).fetchall()
+    schema_path.write_text("".join(f"{sql};\n" for _, _, sql in objects), encoding="utf-8")
+
+    csv_dir.mkdir()
+    for object_type, name, _ in objects:
+        if object_type != "table":
+            continue
+        cursor = conn.execute(f'SELECT * FROM "{name}" ORDER BY rowid')
+        with open_gzip_text(csv_dir / f"{name}.csv.gz") as handle:
+            writer = csv.writer(handle, lineterminator="\n")
+            writer.writerow(column[0] for column in cursor.description)
+            writer.writerows(cursor)
+
+
+def write_dump(conn: sqlite3.Connection, db_path: Path, fmt: Optional[str]) -> List[Path]:
+    """Replace any previous dump of `db_path` with a `fmt` dump (None: just remove it)."""
+    for path in dump_paths(db_path):
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+
+    if fmt is None:
+        return []
+    if fmt == "sql":
+        target = db_path.with_suffix(".sql.gz")
+        write_sql_dump(conn, target)
+        return [target]
+    if fmt == "csv":
+        schema_path = db_path.with_suffix(".schema.sql")
+        csv_dir = db_path.with_name(f"{db_path.stem}_csv")
+        write_schema_and_csv(conn, schema_path, csv_dir)
+        return [schema_path, csv_dir]
+    raise ValueError(f"Unknown dump format {fmt!r}; expected one of {DUMP_FORMATS}")
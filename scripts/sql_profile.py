@@ -0,0 +1,245 @@
+"""
+Per-statement SQL profiling for `generate_itineraries.py --profile-sql`.
+
+`SqlProfiler.wrap(conn)` returns a proxy whose `execute`/`executemany` time
+each statement and count the rows read from its cursor; everything else is
+passed through to the real connection. Statements are grouped by template:
+whitespace collapsed, string and number literals replaced by `?`, and
+`(?, ?, ...)` lists folded, so `IN (...)` queries of any length share one
+entry. A call's latency is the `execute` plus every fetch from its cursor,
+since SQLite does most of the work while rows are stepped.
+
+`report(conn)` runs `EXPLAIN QUERY PLAN` (with the first parameters seen)
+for the templates with the highest total time; `publish_report` prints it and
+writes it as `sql_profile_<timestamp>.txt` and `.json` under `output/profile/`.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+PROFILE_DIR = ROOT / "output" / "profile"
+
+PLAN_TOP = 5  # templates that get an EXPLAIN QUERY PLAN
+REPORT_TOP = 15  # templates in the printed table
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_template(sql: str) -> str:
+    template = STRING_LITERAL.sub("?", sql)
+    template = NUMBER_LITERAL.sub("?", template)
+    template = WHITESPACE.sub(" ", template).strip()
+    return PLACEHOLDER_LIST.sub("(?, ...)", template)
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+@dataclass
+class StatementStats:
+    template: str
+    sql: str  # first statement seen, used for EXPLAIN QUERY PLAN
+    params: Any
+    latencies: List[float] = field(default_factory=list)
+    rows: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        total = sum(self.latencies)
+        return {
+            "template": self.template,
+            "calls": len(self.latencies),
+            "total_ms": round(total * 1000, 4),
+            "mean_ms": round(total * 1000 / len(self.latencies), 4),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 4),
+            "rows": self.rows,
+        }
+
+
+class ProfiledCursor:
+    """Cursor proxy that adds fetch time and row counts to its statement's call."""
+
+    def __init__(self, cursor: sqlite3.Cursor, stats: StatementStats, call: int) -> None:
+        self._cursor = cursor
+        self._stats = stats
+        self._call = call
+
+    def _fetched(self, started: float, rows: int) -> None:
+        self._stats.latencies[self._call] += time.perf_counter() - started
+        self._stats.rows += rows
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size: int = 1):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self) -> Iterator:
+        while True:
+            started = time.perf_counter()
+            row = self._cursor.fetchone()
+            self._fetched(started, row is not None)
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class ProfiledConnection:
+    """Connection proxy that records every `execute`/`executemany` in a `SqlProfiler`."""
+
+    def __init__(self, conn: sqlite3.Connection, profiler: "SqlProfiler") -> None:
+        self.raw = conn
+        self._profiler = profiler
+
+    def execute(self, sql: str, params: Any = ()) -> ProfiledCursor:
+        stats = self._profiler.statement(sql, params)
+        started = time.perf_counter()
+        cursor = self.raw.execute(sql, params)
+        stats.latencies.append(time.perf_counter() - started)
+        return ProfiledCursor(cursor, stats, len(stats.latencies) - 1)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Any]) -> sqlite3.Cursor:
+        # Peek at the first parameters so the statement can be explained later.
+        params = iter(seq_of_params)
+        first = next(params, None)
+        stats = self._profiler.statement(sql, first)
+        started = time.perf_counter()
+        cursor = self.raw.executemany(sql, chain([first], params) if first is not None else ())
+        stats.latencies.append(time.perf_counter() - started)
+        return cursor
+
+    def __enter__(self) -> "ProfiledConnection":
+        self.raw.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> Optional[bool]:
+        return self.raw.__exit__(*exc_info)
+
+    def __getattr__(self, name: str):
+        return getattr(self.raw, name)
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: Any) -> List[str]:
+    """`EXPLAIN QUERY PLAN` as indented lines, like the sqlite3 shell prints it."""
+    in_transaction = conn.in_transaction
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params if params is not None else ()).fetchall()
+    except sqlite3.Error as exc:
+        return [f"(no plan: {exc})"]
+    finally:
+        # sqlite3 opens a transaction before any DML, even an explained one.
+        if conn.in_transaction and not in_transaction:
+            conn.rollback()
+    depth: Dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+class SqlProfiler:
+    def __init__(self) -> None:
+        self.statements: Dict[str, StatementStats] = {}
+
+    def wrap(self, conn: sqlite3.Connection) -> ProfiledConnection:
+        return ProfiledConnection(conn, self)
+
+    def statement(self, sql: str, params: Any) -> StatementStats:
+        template = statement_template(sql)
+        stats = self.statements.get(template)
+        if stats is None:
+            stats = self.statements[template] = StatementStats(template, sql, params)
+        return stats
+
+    def report(self, conn: sqlite3.Connection, plan_top: int = PLAN_TOP) -> Dict[str, Any]:
+        """Templates by total time; the first `plan_top` carry their query plan. Call before closing `conn`."""
+        if isinstance(conn, ProfiledConnection):
+            conn = conn.raw
+        ranked = sorted(self.statements.values(), key=lambda stats: -sum(stats.latencies))
+        templates = []
+        for rank, stats in enumerate(ranked):
+            entry = stats.summary()
+            if rank < plan_top:
+                entry["query_plan"] = query_plan(conn, stats.sql, stats.params)
+            templates.append(entry)
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "calls": sum(entry["calls"] for entry in templates),
+            "total_ms": round(sum(entry["total_ms"] for entry in templates), 4),
+            "templates": templates,
+        }
+
+
+def publish_report(report: Dict[str, Any], output_dir: Optional[Path] = None) -> Path:
+    """Print the report and write it to `output_dir` (default `PROFILE_DIR`) as .txt and .json; returns the .txt path."""
+    output_dir = output_dir or PROFILE_DIR
+    text = format_report(report)
+    print(text)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = f"sql_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    text_path = output_dir / f"{stem}.txt"
+    text_path.write_text(text + "\n", encoding="utf-8")
+    (output_dir / f"{stem}.json").write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"SQL profile written to {text_path} (+ .json)")
+    return text_path
+
+
+def format_report(report: Dict[str, Any], top: int = REPORT_TOP) -> str:
+    templates = report["templates"]
+    lines = [
+        f"SQL profile: {report['calls']} statements, {len(templates)} templates, {report['total_ms']:.1f} ms in SQLite",
+        f"{'Calls':>7} {'Total ms':>10} {'Mean ms':>9} {'p95 ms':>9} {'Rows':>8}  Statement",
+    ]
+    for entry in templates[:top]:
+        statement = entry["template"] if len(entry["template"]) <= 90 else entry["template"][:87] + "..."
+        lines.append(
+            f"{entry['calls']:7d} {entry['total_ms']:10.1f} {entry['mean_ms']:9.3f} {entry['p95_ms']:9.3f} "
+            f"{entry['rows']:8d}  {statement}"
+        )
+    if len(templates) > top:
+        rest = templates[top:]
+        lines.append(
+            f"{sum(entry['calls'] for entry in rest):7d} {sum(entry['total_ms'] for entry in rest):10.1f} "
+            f"{'':9} {'':9} {sum(entry['rows'] for entry in rest):8d}  ({len(rest)} more templates)"
+        )
+    for rank, entry in enumerate(templates, start=1):
+        if "query_plan" not in entry:
+            break
+        lines.append("")
+        lines.append(f"#{rank} {entry['template']}")
+        lines.extend(f"    {line}" for line in entry["query_plan"] or ["(no table access)"])
+    return "\n".join(lines)
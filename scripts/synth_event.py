@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Write a synthetic tournament as `bus_routes.db`, `lodging.db` and `tournament.db`.
+
+The real inputs are fixed at 80 squads, 4 schools and 3 bus routes. This
+script writes the three domain databases directly, with the schemas from
+`build_bus_routes.py`, `build_lodging.py` and `build_tournament.py`, so
+`build_event_db.py`, `map_team_aliases.py` and `generate_itineraries.py` can
+be measured at any size:
+
+    python3 scripts/synth_event.py --teams 10000 --schools 100 --halls 60 --routes 24
+    python3 scripts/build_event_db.py
+    python3 scripts/map_team_aliases.py
+    python3 scripts/generate_itineraries.py
+
+Opbygning (alt afledt af `--seed`, så samme argumenter giver samme bytes):
+- Stoppesteder: "Terningen Arena" (koncert), "Thon Central (lørdag)" (lunch),
+  ét pr. skole ("Skole 001") og ét pr. hal ("Hall 001", med banerne
+  "Hall 001", "Hall 001 - Kortbane", ...). `build_event_db.py` kobler dem på
+  navn.
+- Ruter: skoler og haller fordeles på `--routes` ringruter, der alle kører
+  Terningen Arena → stop → Thon Central → stop tilbage → Terningen Arena,
+  med afgang hvert `--cadence` minut 07:00–21:30 alle dage. En tur skal være
+  færdig inden næste afgang (ellers nummererer `build_event_db.py` turene
+  forkert).
+- Hold: hvert lodging-hold er sin egen klub (unikt navn, så alias-matchningen
+  er entydig) med 1 eller 2 lag; `--teams` er antallet af lag (squads).
+- Kampe: lagene i hver division (køn × alder) deles i puljer à 4, som spiller
+  alle-mod-alle; puljens runder fordeles på dagene, og hver dags kampe
+  lægges i træk (09:00–18:00) på den bane, der har mest plads den dag. Et
+  hold alene i sin division får ingen kampe og forbliver umatchet.
+
+Writing into `data/build` replaces the real domain databases and drops
+`pipeline_state.json`, so the next `pipeline.py` run rebuilds from the raw
+inputs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import sqlite3
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import build_bus_routes
+import build_lodging
+import build_tournament
+from pipeline import BUILD_DIR, STATE_PATH
+from timetable import minutes_to_time
+
+CONCERT_STOP = "Terningen Arena"
+LUNCH_STOP = "Thon Central (lørdag)"
+
+# (service_day, date, label); --days 1 is Saturday only, 2 adds Friday, 3 adds Sunday.
+EVENT_DAYS = (
+    ("fri", "2025-04-25", "Fredag 25.04.25"),
+    ("sat", "2025-04-26", "Lørdag 26.04.25"),
+    ("sun", "2025-04-27", "Søndag 27.04.25"),
+)
+COURTS = ("", " - Kortbane", " - Mini 1", " - Mini 2")
+FIRST_DEPARTURE = 7 * 60
+LAST_DEPARTURE = 21 * 60 + 30
+FIRST_GAME = 9 * 60
+LAST_GAME = 18 * 60
+GAME_SLOT = 25  # minutes between kickoffs on one court
+MAX_HOP = 5  # minutes between two stops on a route
+POOL_SIZE = 4
+AGES = range(10, 17)
+SECOND_SQUAD_SHARE = 0.2
+
+CONSONANTS = "bdfghjklmnprstv"
+VOWELS = "aeiou"
+CLUB_SUFFIXES = ("IL", "HK", "IF", "")
+
+
+@dataclass
+class SynthTeam:
+    """One lodging team (its own club) with 1-2 squads."""
+
+    school_index: int
+    club: str
+    gender: str
+    age: int
+    squads: int
+    headcount: int
+    room: str
+
+    @property
+    def division(self) -> Tuple[str, int]:
+        return self.gender, self.age
+
+    def schedule_names(self) -> List[str]:
+        return [self.club if index == 1 else f"{self.club} {index}" for index in range(1, self.squads + 1)]
+
+
+def club_names(rng: random.Random, count: int) -> List[str]:
+    """
+    Unique club names: a capitalised consonant-vowel word of three syllables
+    plus a generic suffix. Equal-length CV words never occur inside another
+    club's name variants, so `map_team_aliases` finds exactly one club.
+    """
+    syllables = [consonant + vowel for consonant in CONSONANTS for vowel in VOWELS]
+    if count > len(syllables) ** 3:
+        raise SystemExit(f"At most {len(syllables) ** 3} synthetic clubs are supported")
+    seen = set()
+    names: List[str] = []
+    while len(names) < count:
+        word = "".join(rng.choice(syllables) for _ in range(3))
+        if word in seen:
+            continue
+        seen.add(word)
+        names.append(f"{word.capitalize()} {rng.choice(CLUB_SUFFIXES)}".strip())
+    return names
+
+
+def make_teams(rng: random.Random, squads: int, schools: int) -> List[SynthTeam]:
+    sizes: List[int] = []
+    remaining = squads
+    while remaining:
+        size = 2 if rng.random() < SECOND_SQUAD_SHARE and remaining >= 2 else 1
+        sizes.append(size)
+        remaining -= size
+    rooms_used: Dict[int, int] = defaultdict(int)
+    teams: List[SynthTeam] = []
+    for club, size in zip(club_names(rng, len(sizes)), sizes):
+        school_index = rng.randrange(schools)
+        rooms_used[school_index] += 1
+        teams.append(
+            SynthTeam(
+                school_index=school_index,
+                club=club,
+                gender=rng.choice("JG"),
+                age=rng.choice(AGES),
+                squads=size,
+                headcount=rng.randint(10, 20) * size,
+                room=f"A{rooms_used[school_index]:03d}",
+            )
+        )
+    return teams
+
+
+def round_robin(names: Sequence[str]) -> List[List[Tuple[str, str]]]:
+    """Circle-method rounds; with an odd count one team sits out each round."""
+    players: List[Optional[str]] = list(names)
+    if len(players) % 2:
+        players.append(None)
+    rounds: List[List[Tuple[str, str]]] = []
+    for round_no in range(len(players) - 1):
+        pairs = []
+        for index in range(len(players) // 2):
+            home, away = players[index], players[-1 - index]
+            if home is not None and away is not None:
+                pairs.append((home, away) if round_no % 2 else (away, home))
+        rounds.append(pairs)
+        players = [players[0], players[-1], *players[1:-1]]
+    return rounds
+
+
+def pools(rng: random.Random, names: List[str]) -> List[List[str]]:
+    """Shuffled pools of POOL_SIZE; a lone leftover team joins the last pool."""
+    names = names[:]
+    rng.shuffle(names)
+    chunks = [names[start : start + POOL_SIZE] for start in range(0, len(names), POOL_SIZE)]
+    if len(chunks) > 1 and len(chunks[-1]) == 1:
+        chunks[-2].extend(chunks.pop())
+    return chunks
+
+
+def schedule_games(
+    rng: random.Random,
+    teams: List[SynthTeam],
+    halls: int,
+    days: Sequence[Tuple[str, str, str]],
+) -> List[Tuple[str, str, str, int, str, str]]:
+    """(tournament, court, date, start_min, home, away) for every pool game, in kickoff order."""
+    by_division: Dict[Tuple[str, int], List[str]] = defaultdict(list)
+    for team in teams:
+        by_division[team.division].extend(team.schedule_names())
+
+    courts = [f"Hall {venue:03d}{court}" for venue in range(1, halls + 1) for court in COURTS]
+    slots_per_day = (LAST_GAME - FIRST_GAME) // GAME_SLOT + 1
+    free: Dict[str, List[Tuple[int, int]]] = {date: [(0, index) for index in range(len(courts))] for _, date, _ in days}
+
+    games: List[Tuple[str, str, str, int, str, str]] = []
+    for gender, age in sorted(by_division):
+        label = "Jenter" if gender == "J" else "Gutter"
+        for pool_no, pool in enumerate(pools(rng, by_division[(gender, age)]), start=1):
+            tournament = f"Elverum Yngres Cup - {label} {age} år - {pool_no:02d}"
+            per_day: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+            for round_no, pairs in enumerate(round_robin(pool)):
+                per_day[days[round_no % len(days)][1]].extend(pairs)
+            for date, pairs in per_day.items():
+                used, court = heapq.heappop(free[date])
+                if used + len(pairs) > slots_per_day:
+                    raise SystemExit(
+                        f"Not enough courts: {len(courts)} courts × {slots_per_day} kickoffs per day; raise --halls"
+                    )
+                for offset, (home, away) in enumerate(pairs):
+                    games.append((tournament, courts[court], date, FIRST_GAME + (used + offset) * GAME_SLOT, home, away))
+                heapq.heappush(free[date], (used + len(pairs), court))
+    games.sort(key=lambda game: (game[2], game[3], game[1]))
+    return games
+
+
+def route_layouts(rng: random.Random, stops: List[str], routes: int, cadence: int) -> List[List[Tuple[str, int]]]:
+    """Per route the (stop, minutes after the first stop) of one trip."""
+    if routes > len(stops):
+        raise SystemExit(f"--routes {routes} exceeds the {len(stops)} school and hall stops")
+    stops = stops[:]
+    rng.shuffle(stops)
+    layouts: List[List[Tuple[str, int]]] = []
+    for route_no in range(routes):
+        own = stops[route_no::routes]
+        visits = [CONCERT_STOP, *own, LUNCH_STOP, *reversed(own), CONCERT_STOP]
+        max_hop = min(MAX_HOP, (cadence - 1) // (len(visits) - 1))
+        if max_hop < 1:
+            raise SystemExit(
+                f"Route {route_no + 1} has {len(visits)} stops and cannot finish a trip within "
+                f"--cadence {cadence}; raise --routes or --cadence"
+            )
+        offset = 0
+        layout = [(visits[0], 0)]
+        for stop in visits[1:]:
+            offset += rng.randint(1, max_hop)
+            layout.append((stop, offset))
+        layouts.append(layout)
+    return layouts
+
+
+def write_bus_routes(path: Path, layouts: List[List[Tuple[str, int]]], cadence: int, service_days: List[str]) -> int:
+    conn = sqlite3.connect(path)
+    conn.executescript(build_bus_routes.SCHEMA_SQL)
+    stop_ids: Dict[str, int] = {}
+    for layout in layouts:
+        for stop, _ in layout:
+            stop_ids.setdefault(stop, len(stop_ids) + 1)
+    conn.executemany(
+        "INSERT INTO stops (stop_id, stop_name, display_name, description) VALUES (?, ?, ?, NULL)",
+        [(stop_id, stop, stop) for stop, stop_id in stop_ids.items()],
+    )
+    departures = range(FIRST_DEPARTURE, LAST_DEPARTURE + 1, cadence)
+    times = []
+    for route_id, layout in enumerate(layouts, start=1):
+        conn.execute(
+            "INSERT INTO routes (route_id, route_number, title, frequency_note, extra_notes) VALUES (?, ?, ?, ?, NULL)",
+            (route_id, route_id, f"Rute {route_id}", f"hvert {cadence}. minutt per stoppested"),
+        )
+        conn.executemany(
+            "INSERT INTO route_stops (route_id, stop_id, stop_order, default_offset_min) VALUES (?, ?, ?, ?)",
+            [(route_id, stop_ids[stop], order, offset) for order, (stop, offset) in enumerate(layout, start=1)],
+        )
+        for day in service_days:
+            for order, (stop, offset) in enumerate(layout, start=1):
+                times.extend((route_id, stop_ids[stop], order, day, minutes_to_time(start + offset)) for start in departures)
+    conn.executemany(
+        """
+        INSERT INTO route_stop_times (route_id, stop_id, stop_order, service_day, departure_time, condition_note)
+        VALUES (?, ?, ?, ?, ?, NULL)
+        """,
+        times,
+    )
+    conn.commit()
+    conn.close()
+    return len(times)
+
+
+def write_lodging(path: Path, teams: List[SynthTeam], schools: List[str]) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(build_lodging.SCHEMA_SQL)
+    conn.executemany("INSERT INTO schools (school_id, name) VALUES (?, ?)", list(enumerate(schools, start=1)))
+    room_ids: Dict[Tuple[int, str], int] = {}
+    for team_id, team in enumerate(teams, start=1):
+        school_id = team.school_index + 1
+        year = build_tournament.BIRTH_YEAR_BASE - team.age
+        division_key = build_lodging.build_division_key(team.gender, year)
+        raw_label = division_key if team.squads == 1 else f"{division_key},{team.squads} lag"
+        room_id = room_ids.setdefault((school_id, team.room), len(room_ids) + 1)
+        conn.execute("INSERT INTO clubs (club_id, school_id, name) VALUES (?, ?, ?)", (team_id, school_id, team.club))
+        conn.execute(
+            """
+            INSERT INTO teams (team_id, club_id, raw_label, gender, year, num_teams, headcount, room_text, division_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (team_id, team_id, raw_label, team.gender, year, team.squads, team.headcount, team.room, division_key),
+        )
+        conn.execute("INSERT INTO rooms (room_id, school_id, room_code) VALUES (?, ?, ?)", (room_id, school_id, team.room))
+        conn.execute("INSERT INTO team_rooms (team_id, room_id) VALUES (?, ?)", (team_id, room_id))
+        conn.executemany(
+            "INSERT INTO team_squads (team_id, squad_index) VALUES (?, ?)",
+            [(team_id, index) for index in range(1, team.squads + 1)],
+        )
+    conn.commit()
+    conn.close()
+
+
+def write_tournament(
+    path: Path,
+    games: List[Tuple[str, str, str, int, str, str]],
+    days: Sequence[Tuple[str, str, str]],
+    halls: int,
+) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(build_tournament.SCHEMA_SQL)
+    hall_names = [f"Hall {venue:03d}{court}" for venue in range(1, halls + 1) for court in COURTS]
+    hall_ids = {name: hall_id for hall_id, name in enumerate(hall_names, start=1)}
+    day_ids = {date: day_id for day_id, (_, date, _) in enumerate(days, start=1)}
+    conn.executemany("INSERT INTO halls (hall_id, name) VALUES (?, ?)", [(i, name) for name, i in hall_ids.items()])
+    conn.executemany(
+        "INSERT INTO event_days (day_id, date, label) VALUES (?, ?, ?)",
+        [(day_ids[date], date, label) for _, date, label in days],
+    )
+    tournament_ids: Dict[str, int] = {}
+    team_ids: Dict[str, int] = {}
+    rows = []
+    for game_id, (tournament, court, date, start_min, home, away) in enumerate(games, start=1):
+        if tournament not in tournament_ids:
+            tournament_ids[tournament] = len(tournament_ids) + 1
+            conn.execute(
+                "INSERT INTO tournaments (tournament_id, name, gender, age, birth_year, pool_code) VALUES (?, ?, ?, ?, ?, ?)",
+                (tournament_ids[tournament], tournament, *build_tournament.parse_tournament_metadata(tournament)),
+            )
+        for name in (home, away):
+            if name not in team_ids:
+                team_ids[name] = len(team_ids) + 1
+                conn.execute("INSERT INTO teams (team_id, name) VALUES (?, ?)", (team_ids[name], name))
+        rows.append(
+            (
+                game_id,
+                tournament_ids[tournament],
+                hall_ids[court],
+                day_ids[date],
+                f"SYN{game_id:08d}",
+                minutes_to_time(start_min),
+                team_ids[home],
+                team_ids[away],
+            )
+        )
+    conn.executemany(
+        """
+        INSERT INTO games (game_id, tournament_id, hall_id, day_id, match_code, start_time, home_team_id, away_team_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Write synthetic bus_routes.db, lodging.db and tournament.db.")
+    parser.add_argument("--teams", type=int, default=80, help="Lodging squads (default 80)")
+    parser.add_argument("--schools", type=int, default=4, help="Lodging schools (default 4)")
+    parser.add_argument("--halls", type=int, default=6, help=f"Venues with {len(COURTS)} courts each (default 6)")
+    parser.add_argument("--routes", type=int, default=3, help="Bus routes (default 3)")
+    parser.add_argument("--cadence", type=int, default=30, help="Minutes between departures on a route (default 30)")
+    parser.add_argument("--days", type=int, choices=(1, 2, 3), default=3, help="1: Saturday, 2: Fri-Sat, 3: Fri-Sun (default 3)")
+    parser.add_argument("--seed", type=int, default=2025, help="Random seed (default 2025)")
+    parser.add_argument("--out-dir", type=Path, default=BUILD_DIR, help="Target directory (default data/build)")
+    args = parser.parse_args(argv)
+    for name in ("teams", "schools", "halls", "routes", "cadence"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name} must be at least 1")
+
+    rng = random.Random(args.seed)
+    days = EVENT_DAYS[: args.days] if args.days > 1 else EVENT_DAYS[1:2]
+    schools = [f"Skole {index:03d}" for index in range(1, args.schools + 1)]
+    venues = [f"Hall {index:03d}" for index in range(1, args.halls + 1)]
+
+    teams = make_teams(rng, args.teams, args.schools)
+    games = schedule_games(rng, teams, args.halls, days)
+    layouts = route_layouts(rng, schools + venues, args.routes, args.cadence)
+
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+    paths = [args.out_dir / name for name in ("bus_routes.db", "lodging.db", "tournament.db")]
+    for path in paths:
+        if path.exists():
+            path.unlink()
+    stop_times = write_bus_routes(paths[0], layouts, args.cadence, [code for code, _, _ in days])
+    write_lodging(paths[1], teams, schools)
+    write_tournament(paths[2], games, days, args.halls)
+    if args.out_dir.resolve() == BUILD_DIR.resolve() and STATE_PATH.exists():
+        STATE_PATH.unlink()
+
+    print(
+        f"Synthetic event in {args.out_dir}: {args.teams} squads in {len(teams)} lodging teams, "
+        f"{args.schools} schools, {len(games)} games on {args.halls * len(COURTS)} courts, "
+        f"{args.routes} routes ({stop_times} stop times)."
+    )
+
+
+if __name__ == "__main__":
+    main()
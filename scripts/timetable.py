@@ -0,0 +1,404 @@
+"""
+In-memory index over `transport_trip_instances` for the itinerary planner.
+
+The planner asks the same routing question thousands of times: "which trips
+leave stop A for stop B on day d at or after time t?". Instead of a SQL
+self-join per question, the timetable is loaded once and kept as presorted
+per-(day, stop) departure arrays that are searched with `bisect`.
+
+Journeys with transfers are answered by `earliest_arrival_journey`, a
+Connection Scan Algorithm (CSA) over the same data.
+
+`build_event_db.py` also stores earliest-arrival profiles for every stop pair
+(`transport_arrival_profiles`). When present they are loaded here and
+`may_reach` answers "can stop B be reached from A by time T at all?" with a
+single bisect, so hopeless searches are skipped before any scan.
+
+trip_index and departure_min come precomputed from `build_event_db.py`.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+TRANSFER_BUFFER_MIN = 5  # minutter til bytte mellem to busser
+
+
+def time_to_minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def minutes_to_time(minutes: int) -> str:
+    minutes = minutes % MINUTES_PER_DAY
+    hours, minute = divmod(minutes, 60)
+    return f"{hours:02d}:{minute:02d}"
+
+
+@dataclass(frozen=True)
+class StopTime:
+    route_stop_time_id: int
+    route_id: int
+    service_day: str
+    stop_id: int
+    stop_order: int
+    departure_time: str
+    departure_min: int
+    trip_index: int
+
+
+@dataclass(frozen=True)
+class TripOption:
+    """A direct ride on one trip between two stops."""
+
+    route_id: int
+    trip_index: int
+    departure_time: str
+    departure_min: int
+    departure_route_stop_time_id: int
+    departure_stop_id: int
+    arrival_time: str
+    arrival_min: int
+    arrival_route_stop_time_id: int
+    arrival_stop_id: int
+
+
+def trip_option(board: StopTime, alight: StopTime) -> TripOption:
+    return TripOption(
+        route_id=board.route_id,
+        trip_index=board.trip_index,
+        departure_time=board.departure_time,
+        departure_min=board.departure_min,
+        departure_route_stop_time_id=board.route_stop_time_id,
+        departure_stop_id=board.stop_id,
+        arrival_time=alight.departure_time,
+        arrival_min=alight.departure_min,
+        arrival_route_stop_time_id=alight.route_stop_time_id,
+        arrival_stop_id=alight.stop_id,
+    )
+
+
+@dataclass(frozen=True)
+class Connection:
+    """One hop of a trip between two consecutive stops."""
+
+    route_id: int
+    trip_index: int
+    departure_stop: StopTime
+    arrival_stop: StopTime
+
+    @property
+    def departure_min(self) -> int:
+        return self.departure_stop.departure_min
+
+    @property
+    def arrival_min(self) -> int:
+        return self.arrival_stop.departure_min
+
+
+TripKey = Tuple[str, int, int]  # (service_day, route_id, trip_index)
+BoardingCheck = Callable[[str, int, int], bool]  # (service_day, route_id, trip_index) -> may board
+# (service_day, origin, destination, depart_min, arrival_min, route_id, trip_index, legs)
+ProfileRow = Tuple[str, int, int, int, int, int, int, int]
+
+
+class TimetableIndex:
+    """Presorted departures per (service_day, stop_id) and stop sequences per trip."""
+
+    def __init__(self, stop_times: Iterable[StopTime]) -> None:
+        departures: Dict[Tuple[str, int], List[StopTime]] = defaultdict(list)
+        trips: Dict[TripKey, List[StopTime]] = defaultdict(list)
+        for stop_time in stop_times:
+            departures[(stop_time.service_day, stop_time.stop_id)].append(stop_time)
+            trips[(stop_time.service_day, stop_time.route_id, stop_time.trip_index)].append(stop_time)
+
+        for rows in departures.values():
+            rows.sort(key=lambda st: (st.departure_min, st.route_id, st.trip_index, st.stop_order))
+        for rows in trips.values():
+            rows.sort(key=lambda st: st.stop_order)
+
+        self._departures = dict(departures)
+        self._departure_minutes = {key: [st.departure_min for st in rows] for key, rows in departures.items()}
+        self._trips = dict(trips)
+        self._connections: Dict[str, Tuple[List[Connection], List[int]]] = {}
+        self._profiles: Dict[Tuple[str, int, int], Tuple[List[int], List[int]]] = {}
+        self.profile_transfer_buffer: Optional[int] = None
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "TimetableIndex":
+        rows = conn.execute(
+            """
+            SELECT route_stop_time_id, route_id, service_day, stop_id, stop_order,
+                   departure_time, departure_min, trip_index
+            FROM transport_trip_instances
+            """
+        )
+        index = cls(StopTime(*row) for row in rows)
+        buffer_row = conn.execute(
+            "SELECT value FROM build_metadata WHERE key = 'arrival_profile_transfer_buffer'"
+        ).fetchone()
+        if buffer_row is not None:
+            index.load_profiles(
+                conn.execute(
+                    """
+                    SELECT service_day, origin_stop_id, destination_stop_id, depart_min, arrival_min
+                    FROM transport_arrival_profiles
+                    ORDER BY service_day, origin_stop_id, destination_stop_id, depart_min
+                    """
+                ),
+                int(buffer_row[0]),
+            )
+        return index
+
+    def load_profiles(self, rows: Iterable[Tuple[str, int, int, int, int]], transfer_buffer: int) -> None:
+        """Keep (depart_min, arrival_min) fronts per (day, origin, destination); rows must be sorted."""
+        profiles: Dict[Tuple[str, int, int], Tuple[List[int], List[int]]] = {}
+        for service_day, origin_stop_id, destination_stop_id, depart_min, arrival_min in rows:
+            departs, arrivals = profiles.setdefault((service_day, origin_stop_id, destination_stop_id), ([], []))
+            departs.append(depart_min)
+            arrivals.append(arrival_min)
+        self._profiles = profiles
+        self.profile_transfer_buffer = transfer_buffer
+
+    def departures(self, service_day: str, stop_id: int, earliest_depart_min: int) -> List[StopTime]:
+        """Stop times at `stop_id` departing at or after `earliest_depart_min`, in time order."""
+        key = (service_day, stop_id)
+        rows = self._departures.get(key)
+        if not rows:
+            return []
+        start = bisect_left(self._departure_minutes[key], earliest_depart_min)
+        return rows[start:]
+
+    def trip_stops(self, service_day: str, route_id: int, trip_index: int) -> List[StopTime]:
+        """All stop times of one trip ordered by stop_order."""
+        return self._trips.get((service_day, route_id, trip_index), [])
+
+    def trips_between(
+        self,
+        service_day: str,
+        origin_stop_id: int,
+        destination_stop_id: int,
+        earliest_depart_min: int,
+    ) -> List[TripOption]:
+        # Circular routes visit some stops twice, so arrival is matched on time
+        # rather than stop_order (same rule as the original SQL self-join).
+        options: List[TripOption] = []
+        for dep in self.departures(service_day, origin_stop_id, earliest_depart_min):
+            for arr in self._trips[(service_day, dep.route_id, dep.trip_index)]:
+                if arr.stop_id != destination_stop_id or arr.departure_min <= dep.departure_min:
+                    continue
+                options.append(trip_option(dep, arr))
+        return options
+
+    def connections(self, service_day: str) -> Tuple[List[Connection], List[int]]:
+        """Connections of one service day sorted by departure, plus their departure minutes.
+
+        A trip's stop times are chained in time order, so any two stops of the
+        same trip with a later arrival are connected, which is the rule
+        `trips_between` uses for direct rides.
+        """
+        cached = self._connections.get(service_day)
+        if cached is not None:
+            return cached
+        connections: List[Connection] = []
+        for (day, route_id, trip_index), rows in self._trips.items():
+            if day != service_day:
+                continue
+            chain = sorted(rows, key=lambda st: (st.departure_min, st.stop_order))
+            for departure, arrival in zip(chain, chain[1:]):
+                connections.append(Connection(route_id, trip_index, departure, arrival))
+        connections.sort(
+            key=lambda c: (c.departure_min, c.arrival_min, c.route_id, c.trip_index, c.departure_stop.stop_order)
+        )
+        result = (connections, [c.departure_min for c in connections])
+        self._connections[service_day] = result
+        return result
+
+    def earliest_arrival(
+        self,
+        service_day: str,
+        origin_stop_id: int,
+        destination_stop_id: int,
+        earliest_depart_min: int,
+    ) -> Optional[int]:
+        """Precomputed earliest arrival leaving at or after `earliest_depart_min`; None if unreachable."""
+        profile = self._profiles.get((service_day, origin_stop_id, destination_stop_id))
+        if profile is None:
+            return None
+        departs, arrivals = profile
+        position = bisect_left(departs, earliest_depart_min)
+        if position == len(departs):
+            return None
+        return arrivals[position]
+
+    def may_reach(
+        self,
+        service_day: str,
+        origin_stop_id: int,
+        destination_stop_id: int,
+        earliest_depart_min: int,
+        latest_arrival_min: Optional[int],
+        transfer_buffer: Optional[int] = None,
+    ) -> bool:
+        """False only when the profiles prove no bus arrives by `latest_arrival_min`.
+
+        Profiles ignore capacity, so they are a lower bound for every search;
+        `transfer_buffer=None` means direct rides only, which any profile covers.
+        Without loaded profiles, or with a shorter buffer than they were built
+        with, the answer is always True.
+        """
+        if latest_arrival_min is None or self.profile_transfer_buffer is None:
+            return True
+        if origin_stop_id == destination_stop_id:
+            return True
+        if transfer_buffer is not None and transfer_buffer < self.profile_transfer_buffer:
+            return True
+        arrival_min = self.earliest_arrival(service_day, origin_stop_id, destination_stop_id, earliest_depart_min)
+        return arrival_min is not None and arrival_min <= latest_arrival_min
+
+
+def connection_scan(
+    timetable: TimetableIndex,
+    service_day: str,
+    origin_stop_id: int,
+    earliest_depart_min: int,
+    latest_arrival_min: Optional[int] = None,
+    transfer_buffer: int = TRANSFER_BUFFER_MIN,
+    can_board: Optional[BoardingCheck] = None,
+    destination_stop_id: Optional[int] = None,
+) -> Dict[int, Tuple[Connection, Connection]]:
+    """One Connection Scan from `origin_stop_id`, returning `(boarded, alighted)` per reached stop.
+
+    Any number of transfers is allowed; changing trips at a stop requires
+    `transfer_buffer` minutes after arriving there. `can_board` lets the caller
+    prune trips (e.g. full buses) during the scan. With a `destination_stop_id`
+    the scan stops as soon as that stop cannot be improved any more.
+    """
+    connections, departure_minutes = timetable.connections(service_day)
+    never = float("inf")
+    reached: Dict[int, float] = {origin_stop_id: earliest_depart_min}
+    ready: Dict[int, float] = {origin_stop_id: earliest_depart_min}
+    boarded: Dict[Tuple[int, int], Connection] = {}
+    came_from: Dict[int, Tuple[Connection, Connection]] = {}
+
+    for connection in connections[bisect_left(departure_minutes, earliest_depart_min):]:
+        if destination_stop_id is not None and connection.departure_min > reached.get(destination_stop_id, never):
+            break
+        if latest_arrival_min is not None and connection.departure_min > latest_arrival_min:
+            break
+        trip = (connection.route_id, connection.trip_index)
+        entry = boarded.get(trip)
+        if entry is None:
+            if ready.get(connection.departure_stop.stop_id, never) > connection.departure_min:
+                continue
+            if can_board is not None and not can_board(service_day, connection.route_id, connection.trip_index):
+                continue
+            entry = boarded[trip] = connection
+        stop_id = connection.arrival_stop.stop_id
+        arrival_min = connection.arrival_min
+        if arrival_min <= entry.departure_min:
+            continue
+        if latest_arrival_min is not None and arrival_min > latest_arrival_min:
+            continue
+        if arrival_min >= reached.get(stop_id, never):
+            continue
+        reached[stop_id] = arrival_min
+        ready[stop_id] = arrival_min + transfer_buffer
+        came_from[stop_id] = (entry, connection)
+    return came_from
+
+
+def journey_legs(
+    came_from: Dict[int, Tuple[Connection, Connection]],
+    origin_stop_id: int,
+    destination_stop_id: int,
+) -> Optional[List[TripOption]]:
+    """Walk the scan pointers back from the destination; one TripOption per ridden trip."""
+    if destination_stop_id == origin_stop_id or destination_stop_id not in came_from:
+        return None
+    legs: List[TripOption] = []
+    stop_id = destination_stop_id
+    while stop_id != origin_stop_id:
+        entry, exit_connection = came_from[stop_id]
+        legs.append(trip_option(entry.departure_stop, exit_connection.arrival_stop))
+        stop_id = entry.departure_stop.stop_id
+    legs.reverse()
+    return legs
+
+
+def earliest_arrival_journey(
+    timetable: TimetableIndex,
+    service_day: str,
+    origin_stop_id: int,
+    destination_stop_id: int,
+    earliest_depart_min: int,
+    latest_arrival_min: Optional[int] = None,
+    transfer_buffer: int = TRANSFER_BUFFER_MIN,
+    can_board: Optional[BoardingCheck] = None,
+) -> Optional[List[TripOption]]:
+    """Connection Scan for the earliest arrival at `destination_stop_id`.
+
+    Returns the journey as one TripOption per ridden trip, or None when the
+    destination is unreachable. See `connection_scan` for the rules.
+    """
+    if origin_stop_id == destination_stop_id:
+        return None
+    came_from = connection_scan(
+        timetable,
+        service_day,
+        origin_stop_id,
+        earliest_depart_min,
+        latest_arrival_min=latest_arrival_min,
+        transfer_buffer=transfer_buffer,
+        can_board=can_board,
+        destination_stop_id=destination_stop_id,
+    )
+    return journey_legs(came_from, origin_stop_id, destination_stop_id)
+
+
+def build_arrival_profiles(
+    timetable: TimetableIndex,
+    transfer_buffer: int = TRANSFER_BUFFER_MIN,
+) -> List[ProfileRow]:
+    """Earliest-arrival profiles between all stop pairs, one scan per departure.
+
+    For every (service_day, origin) a scan is run from each distinct departure
+    minute at the origin, latest first. A journey is kept only if it arrives
+    strictly earlier than every later-departing journey, so each
+    (day, origin, destination) profile is a Pareto front whose arrivals grow
+    with depart_min. The first row with depart_min >= t is then the earliest
+    arrival when leaving at t or later.
+    """
+    rows: List[ProfileRow] = []
+    for (service_day, origin_stop_id), minutes in sorted(timetable._departure_minutes.items()):
+        best_arrival: Dict[int, int] = {}
+        for depart_min in sorted(set(minutes), reverse=True):
+            came_from = connection_scan(
+                timetable, service_day, origin_stop_id, depart_min, transfer_buffer=transfer_buffer
+            )
+            for destination_stop_id in sorted(came_from):
+                legs = journey_legs(came_from, origin_stop_id, destination_stop_id)
+                if not legs:
+                    continue
+                arrival_min = legs[-1].arrival_min
+                if arrival_min >= best_arrival.get(destination_stop_id, MINUTES_PER_DAY * 2):
+                    continue
+                best_arrival[destination_stop_id] = arrival_min
+                rows.append(
+                    (
+                        service_day,
+                        origin_stop_id,
+                        destination_stop_id,
+                        legs[0].departure_min,
+                        arrival_min,
+                        legs[0].route_id,
+                        legs[0].trip_index,
+                        len(legs),
+                    )
+                )
+    return rows
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""Run `generate_itineraries.main` on a scratch copy of the built database (shared by the planner tests)."""
+
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def run_on_copy(tmp_dir: str, *argv: str) -> Path:
+    """Run the planner with `argv` on `tmp_dir`/event_planner.db, copied from the build on first use."""
+    copy = Path(tmp_dir) / "event_planner.db"
+    if not copy.exists():
+        shutil.copyfile(DB_PATH, copy)
+    saved = planner.DB_PATH
+    planner.DB_PATH = copy
+    try:
+        planner.main(list(argv))
+    finally:
+        planner.DB_PATH = saved
+    return copy
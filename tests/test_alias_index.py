@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""`ScheduleSlugIndex` in `scripts/map_team_aliases.py` must find exactly the teams the full scan finds."""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import map_team_aliases as aliases  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def scan_candidates(schedule, division_key, slugs):
+    """The original O(teams x variants x slugs) scan, kept as the reference."""
+    return [
+        team
+        for team in schedule.values()
+        if division_key in team.division_keys
+        and any(slug in variant for variant in team.slug_variants for slug in slugs)
+    ]
+
+
+def team(team_id: int, name: str, *division_keys: str) -> aliases.ScheduleTeam:
+    return aliases.ScheduleTeam(team_id, name, set(division_keys), aliases.schedule_variants(name))
+
+
+def test_index_matches_scan_for_every_lodging_team():
+    with sqlite3.connect(DB_PATH) as conn:
+        schedule = aliases.load_schedule_teams(conn)
+        lodging = aliases.load_lodging_teams(conn)
+    index = aliases.ScheduleSlugIndex(schedule)
+    for lodging_team in lodging:
+        if not lodging_team.division_key:
+            continue
+        slugs = aliases.club_slugs(lodging_team.club_name)
+        expected = scan_candidates(schedule, lodging_team.division_key, slugs)
+        assert index.candidates(lodging_team.division_key, slugs) == expected, lodging_team.club_name
+
+
+def test_short_long_and_missing_slugs():
+    schedule = {
+        team_id: sched
+        for team_id, sched in (
+            (7, team(7, "Elverum 2", "J2012")),
+            (3, team(3, "Gjøvik HK", "J2012", "G2012")),
+            (5, team(5, "AFSK Blå", "J2012")),
+            (9, team(9, "Elverum", "G2012")),
+        )
+    }
+    index = aliases.ScheduleSlugIndex(schedule)
+    cases = [
+        ("J2012", {"elverum"}),
+        ("J2012", {"verum", "afsk"}),
+        ("J2012", {"2"}),
+        ("J2012", {"hk"}),
+        ("J2012", {"gjovikhk"}),
+        ("J2012", {"x", "elverumx"}),
+        ("G2012", {"elverum", "gjovik"}),
+        ("J2099", {"elverum"}),
+    ]
+    for division_key, slugs in cases:
+        expected = scan_candidates(schedule, division_key, slugs)
+        assert index.candidates(division_key, slugs) == expected, (division_key, slugs)
+    assert [sched.team_id for sched in index.candidates("J2012", {"k", "2"})] == [7, 3, 5], "Results keep schedule order"
+
+
+if __name__ == "__main__":
+    test_index_matches_scan_for_every_lodging_team()
+    test_short_long_and_missing_slugs()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""`benchmarks/run_benchmarks.py`: a small synthetic run writes JSON, and the baseline check flags regressions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import run_benchmarks as bench  # noqa: E402
+
+BUILD_DIR = Path("data/build")
+
+
+def result(name: str, best: float, kind: str = "function") -> bench.Result:
+    return bench.Result("synth-40", kind, name, 1, 1, best, best)
+
+
+def test_compare_flags_only_real_slowdowns():
+    baseline = [result("list_trips", 0.100), result("render_pdf", 1.0), result("load_lookup_data", 0.001), result("gone", 0.5)]
+    current = [result("list_trips", 0.140), result("render_pdf", 0.5), result("load_lookup_data", 0.003), result("added", 0.2)]
+    rows = bench.compare_results(current, baseline, tolerance=0.25, min_delta=0.005)
+    status = {row["key"].split("/")[-1]: row["status"] for row in rows}
+    assert status == {
+        "list_trips": "regression",
+        "render_pdf": "faster",
+        "load_lookup_data": "ok",  # 3x slower, but only 2 ms
+        "added": "new",
+        "gone": "missing",
+    }
+
+
+def test_synthetic_run_writes_results_and_leaves_the_build_alone():
+    before = {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in BUILD_DIR.glob("*.db")}
+    with tempfile.TemporaryDirectory() as tmp:
+        output, baseline = Path(tmp) / "results.json", Path(tmp) / "baseline.json"
+        common = ["--dataset", "synth-40", "--repeat", "1", "--skip-render", "--baseline", str(baseline)]
+        bench.main([*common, "--output", str(output), "--save-baseline"])
+
+        data = json.loads(output.read_text(encoding="utf-8"))
+        names = {(entry["kind"], entry["name"]) for entry in data["results"]}
+        assert {("stage", "synth_event"), ("stage", "generate_itineraries"), ("function", "plan_game_travel")} <= names
+        assert ("view", "vw_game_transport_candidates") in names
+        assert {("query", name) for name, _, _ in bench.ACCESS_PATHS} <= names
+        assert ("stage", "render") not in names
+        assert all(entry["best"] >= 0 and entry["best"] <= entry["median"] for entry in data["results"])
+
+        # Pretend the baseline was much faster: the comparison must fail.
+        stored = json.loads(baseline.read_text(encoding="utf-8"))
+        for entry in stored["results"]:
+            entry["best"] /= 100
+        baseline.write_text(json.dumps(stored), encoding="utf-8")
+        try:
+            bench.main([*common, "--output", str(output), "--compare", "--min-delta", "0"])
+        except SystemExit as exc:
+            assert "slower" in str(exc)
+        else:
+            raise AssertionError("a 100x slowdown must fail --compare")
+    after = {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in BUILD_DIR.glob("*.db")}
+    assert after == before, "Benchmarks must run in a temp directory"
+
+
+if __name__ == "__main__":
+    test_compare_flags_only_real_slowdowns()
+    test_synthetic_run_writes_results_and_leaves_the_build_alone()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Streaming DOCX reader in `scripts/build_lodging.py`, checked on small documents built in a temp dir."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+from zipfile import ZipFile
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_lodging  # noqa: E402
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+
+def para(*runs: str) -> str:
+    return "<w:p>" + "".join(f"<w:r><w:t xml:space=\"preserve\">{run}</w:t></w:r>" for run in runs) + "</w:p>"
+
+
+def table(*rows) -> str:
+    return (
+        "<w:tbl><w:tblPr/><w:tblGrid/>"
+        + "".join("<w:tr>" + "".join(f"<w:tc>{cell}</w:tc>" for cell in row) + "</w:tr>" for row in rows)
+        + "</w:tbl>"
+    )
+
+
+def write_docx(path: Path, body: str) -> None:
+    with ZipFile(path, "w") as zf:
+        zf.writestr("word/document.xml", f'<w:document xmlns:w="{W}"><w:body>{body}<w:sectPr/></w:body></w:document>')
+
+
+def test_tables_are_yielded_per_school_in_document_order():
+    body = "".join(
+        [
+            table([para("ignored: no school yet")]),
+            para("Skole", "fordeling"),
+            table([para("Skolefordeling is a summary table")]),
+            para("Elverum ", "ungdomsskole:"),
+            para("Hvem bor hvor"),
+            para(),
+            table(
+                [para("Klubb/lag"), para("Antall")],
+                [para("Elverum\xa0 J2012"), para("1", "4")],
+                [para("Rom"), table([para("A1")], [para("A2")])],
+                [],
+            ),
+            para("Hanstad skole"),
+            table([para("Flisa")]),
+            para("Elverum ungdomsskole"),
+            table([para("Gjøvik")]),
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "lodging.docx"
+        write_docx(path, body)
+        tables = list(build_lodging.iter_school_tables(path))
+    assert tables == [
+        (
+            "Elverum ungdomsskole",
+            [["Klubb/lag", "Antall"], ["Elverum J2012", "14"], ["Rom", "A1A2"], []],
+        ),
+        ("Hanstad skole", [["Flisa"]]),
+        ("Elverum ungdomsskole", [["Gjøvik"]]),
+    ]
+
+
+if __name__ == "__main__":
+    test_tables_are_yielded_per_school_in_document_order()
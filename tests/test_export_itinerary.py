@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Checks the streaming `export_itinerary.py --all` export against the per-alias export."""
+
+from __future__ import annotations
+
+import io
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import export_itinerary  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def get_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_bulk_export_matches_per_alias_export():
+    with get_connection() as conn:
+        alias_ids = [row[0] for row in conn.execute("SELECT DISTINCT alias_id FROM vw_team_alignment ORDER BY alias_id")]
+        itineraries = list(export_itinerary.iter_itineraries(conn))
+        assert [itinerary["alias_id"] for itinerary in itineraries] == alias_ids
+        for itinerary in itineraries:
+            assert itinerary == export_itinerary.fetch_itinerary(conn, itinerary["alias_id"])
+
+
+def test_ndjson_and_json_formats_round_trip():
+    with get_connection() as conn:
+        expected = list(export_itinerary.iter_itineraries(conn))
+
+        ndjson = io.StringIO()
+        assert export_itinerary.write_itineraries(iter(expected), "ndjson", ndjson) == len(expected)
+        lines = ndjson.getvalue().splitlines()
+        assert len(lines) == len(expected)
+        assert [json.loads(line) for line in lines] == expected
+
+        array = io.StringIO()
+        export_itinerary.write_itineraries(iter(expected), "json", array)
+        assert json.loads(array.getvalue()) == expected
+
+        empty = io.StringIO()
+        assert export_itinerary.write_itineraries(iter([]), "json", empty) == 0
+        assert json.loads(empty.getvalue()) == []
+
+
+if __name__ == "__main__":
+    test_bulk_export_matches_per_alias_export()
+    test_ndjson_and_json_formats_round_trip()
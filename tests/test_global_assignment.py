@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Min-cost flow solver and `generate_itineraries.py --assignment flow`."""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+from min_cost_flow import MinCostFlow  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+TEST_CAPACITY = 120
+
+
+def get_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def reference_min_cost(node_count, arcs, source, sink, demand):
+    """Successive shortest paths with Bellman-Ford, for cross-checking."""
+    graph = [[] for _ in range(node_count)]
+    edges = []
+    for tail, head, capacity, cost in arcs:
+        graph[tail].append(len(edges))
+        edges.append([head, capacity, cost])
+        graph[head].append(len(edges))
+        edges.append([tail, 0, -cost])
+    sent = total = 0
+    while sent < demand:
+        distance = [float("inf")] * node_count
+        via = [-1] * node_count
+        distance[source] = 0
+        for _ in range(node_count):
+            for node in range(node_count):
+                if distance[node] == float("inf"):
+                    continue
+                for edge_id in graph[node]:
+                    head, capacity, cost = edges[edge_id]
+                    if capacity > 0 and distance[node] + cost < distance[head]:
+                        distance[head] = distance[node] + cost
+                        via[head] = edge_id
+        if distance[sink] == float("inf"):
+            break
+        push, node = demand - sent, sink
+        while node != source:
+            push = min(push, edges[via[node]][1])
+            node = edges[via[node] ^ 1][0]
+        node = sink
+        while node != source:
+            edges[via[node]][1] -= push
+            edges[via[node] ^ 1][1] += push
+            node = edges[via[node] ^ 1][0]
+        sent += push
+        total += push * distance[sink]
+    return sent, total
+
+
+def test_min_cost_flow_matches_reference():
+    rng = random.Random(2025)
+    for _ in range(40):
+        node_count = rng.randint(4, 9)
+        arcs = [
+            (rng.randrange(node_count), rng.randrange(node_count), rng.randint(1, 6), rng.randint(0, 9))
+            for _ in range(rng.randint(6, 20))
+        ]
+        arcs = [arc for arc in arcs if arc[0] != arc[1]]
+        network = MinCostFlow(node_count)
+        for arc in arcs:
+            network.add_arc(*arc)
+        demand = rng.randint(1, 12)
+        assert network.solve(0, node_count - 1, demand) == reference_min_cost(node_count, arcs, 0, node_count - 1, demand)
+
+
+def test_flow_reservations_respect_capacity_and_buffer():
+    with get_connection() as conn:
+        aliases = planner.fetch_aliases(conn)
+        lookup = planner.load_lookup_data(conn)
+        demands = planner.collect_travel_demands(conn, aliases, lookup)
+        plan, report = planner.solve_global_assignment(demands, TEST_CAPACITY)
+        assert report.assigned == len(plan) and report.assigned + report.unassigned == report.demands
+        by_owner = {(demand.alias_id, demand.game_id): demand for demand in demands}
+        loads = {}
+        for owner, trip in plan.items():
+            demand = by_owner[owner]
+            assert trip.arrival_min <= demand.latest_arrival_min, "40-minute buffer is a hard constraint"
+            key = (demand.service_day, trip.route_id, trip.trip_index)
+            loads[key] = loads.get(key, 0) + demand.headcount
+        assert max(loads.values()) <= TEST_CAPACITY
+
+
+def count_overrides(conn, aliases, lookup, flow):
+    tracker = planner.BusLoadTracker(TEST_CAPACITY)
+    if flow:
+        planner.reserve_global_assignment(conn, aliases, lookup, tracker)
+    overrides = 0
+    for alias in aliases:
+        for seg in planner.generate_segments_for_alias(conn, alias, lookup, tracker):
+            overrides += "capacity override" in (seg.notes or "")
+        tracker.release_reservations(alias["alias_id"])
+    return overrides
+
+
+def test_flow_mode_needs_fewer_overrides_than_greedy():
+    with get_connection() as conn:
+        aliases = planner.fetch_aliases(conn)
+        lookup = planner.load_lookup_data(conn)
+        greedy = count_overrides(conn, aliases, lookup, flow=False)
+        flow = count_overrides(conn, aliases, lookup, flow=True)
+        assert flow < greedy, f"Flow mode should reduce capacity overrides ({flow} vs {greedy})"
+
+
+if __name__ == "__main__":
+    test_min_cost_flow_matches_reference()
+    test_flow_reservations_respect_capacity_and_buffer()
+    test_flow_mode_needs_fewer_overrides_than_greedy()
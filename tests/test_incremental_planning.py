@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Incremental re-planning (`--changed-games`) and persisted bus loads (`bus_trip_loads`)."""
+
+from __future__ import annotations
+
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+from planner_runs import run_on_copy  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def scratch_connection(tmp_dir: str) -> sqlite3.Connection:
+    copy = Path(tmp_dir) / "event_planner.db"
+    shutil.copyfile(DB_PATH, copy)
+    conn = sqlite3.connect(copy)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def segments_by_alias(conn: sqlite3.Connection):
+    rows = conn.execute(
+        """
+        SELECT alias_id, sequence_no, segment_type, service_day, start_time, end_time,
+               route_id, trip_index, notes
+        FROM team_itinerary_segments
+        ORDER BY alias_id, sequence_no
+        """
+    ).fetchall()
+    result = {}
+    for row in rows:
+        result.setdefault(row["alias_id"], []).append(tuple(row))
+    return result
+
+
+def assert_loads_match_segments(conn: sqlite3.Connection) -> None:
+    expected = {
+        tuple(row[:3]): row[3]
+        for row in conn.execute(
+            """
+            SELECT seg.service_day, seg.route_id, seg.trip_index, SUM(lt.headcount)
+            FROM team_itinerary_segments seg
+            JOIN team_aliases ta ON ta.alias_id = seg.alias_id
+            JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
+            WHERE seg.segment_type = 'bus' AND seg.route_id IS NOT NULL
+            GROUP BY seg.service_day, seg.route_id, seg.trip_index
+            """
+        )
+    }
+    stored = {
+        tuple(row[:3]): row[3]
+        for row in conn.execute(
+            "SELECT service_day, route_id, trip_index, headcount FROM bus_trip_loads WHERE headcount <> 0"
+        )
+    }
+    assert stored == expected, "bus_trip_loads must equal the bus segments' headcount per trip"
+
+
+def test_bus_trip_loads_persisted_and_loaded_lazily():
+    with sqlite3.connect(DB_PATH) as conn:
+        assert_loads_match_segments(conn)
+        tracker = planner.BusLoadTracker(planner.BUS_CAPACITY_LIMIT, conn)
+        service_day, route_id, trip_index, headcount = conn.execute(
+            "SELECT service_day, route_id, trip_index, headcount FROM bus_trip_loads ORDER BY headcount DESC LIMIT 1"
+        ).fetchone()
+        assert tracker.current(service_day, route_id, trip_index) == headcount
+
+
+def test_snapshot_matches_schedule_after_full_run():
+    with sqlite3.connect(DB_PATH) as conn:
+        assert planner.changed_games_since_snapshot(conn) == []
+
+
+def test_unchanged_games_replan_to_identical_segments():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = scratch_connection(tmp_dir)
+        before = segments_by_alias(conn)
+        game_id = conn.execute("SELECT game_id FROM vw_team_games ORDER BY game_id LIMIT 1").fetchone()[0]
+        alias_ids = planner.affected_alias_ids(conn, [game_id])
+        assert alias_ids
+        planner.regenerate_aliases(conn, alias_ids, [game_id])
+        assert segments_by_alias(conn) == before
+        conn.close()
+
+
+def test_moved_game_only_touches_its_squads():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = scratch_connection(tmp_dir)
+        before = segments_by_alias(conn)
+        game = conn.execute(
+            "SELECT game_id FROM vw_team_games WHERE service_day_code = 'sat' ORDER BY game_id LIMIT 1"
+        ).fetchone()
+        conn.execute(
+            "UPDATE schedule_games SET start_time = '16:00', start_min = 960 WHERE game_id = ?", (game["game_id"],)
+        )
+        conn.commit()
+
+        assert planner.changed_games_since_snapshot(conn) == [game["game_id"]]
+        alias_ids = planner.affected_alias_ids(conn, [game["game_id"]])
+        planner.regenerate_aliases(conn, alias_ids, [game["game_id"]])
+        after = segments_by_alias(conn)
+
+        for alias_id in set(before) | set(after):
+            if alias_id not in alias_ids:
+                assert after.get(alias_id) == before.get(alias_id), f"Alias {alias_id} should be untouched"
+        moved = [
+            seg
+            for alias_id in alias_ids
+            for seg in after[alias_id]
+            if seg[2] == "game" and seg[4] == "16:00"
+        ]
+        assert moved, "Re-planned squads should play the moved game at 16:00"
+        assert planner.changed_games_since_snapshot(conn) == []
+        assert_loads_match_segments(conn)
+        conn.close()
+
+
+def test_bulk_rewrite_matches_row_by_row_ids_and_rebuilds_indexes():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = scratch_connection(tmp_dir)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete", "The build must leave a rollback journal"
+        before = conn.execute("SELECT * FROM team_itinerary_segments ORDER BY segment_id").fetchall()
+        last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'team_itinerary_segments'").fetchone()[0]
+        planned = {}
+        for row in before:
+            planned.setdefault(row["alias_id"], []).append(planner.Segment.from_row(row))
+
+        assert planner.replace_all_segments(conn, planner.fetch_aliases(conn), planned) == len(before)
+        conn.commit()
+        after = conn.execute("SELECT * FROM team_itinerary_segments ORDER BY segment_id").fetchall()
+        # AUTOINCREMENT would number the rows on from sqlite_sequence in insert order.
+        assert [row["segment_id"] for row in after] == list(range(last_id + 1, last_id + 1 + len(before)))
+        assert [tuple(row)[1:] for row in after] == [tuple(row)[1:] for row in before]
+        assert conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'team_itinerary_segments'"
+        ).fetchone()[0] == last_id + len(before)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert set(planner.SEGMENT_INDEXES) <= indexes, "The segment indexes must be rebuilt"
+        assert_loads_match_segments(conn)
+        conn.close()
+
+
+def test_partial_run_keeps_other_changed_games_pending():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = scratch_connection(tmp_dir)
+        first, second = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT game_id FROM vw_team_games WHERE service_day_code = 'sat' ORDER BY game_id LIMIT 2"
+            )
+        ]
+        unplayed = conn.execute(
+            "SELECT game_id FROM schedule_games WHERE game_id NOT IN (SELECT game_id FROM vw_team_games) LIMIT 1"
+        ).fetchone()[0]
+        conn.executemany(
+            "UPDATE schedule_games SET start_time = '16:00', start_min = 960 WHERE game_id = ?",
+            [(first,), (second,), (unplayed,)],
+        )
+        conn.commit()
+        conn.close()
+
+        path = run_on_copy(tmp_dir, "--changed-games", str(first), "--slowest", "0")
+        with sqlite3.connect(path) as conn:
+            assert planner.changed_games_since_snapshot(conn) == sorted([second, unplayed])
+
+        # A game no squad plays only needs its snapshot row refreshed.
+        run_on_copy(tmp_dir, "--changed-games", str(unplayed), "--slowest", "0")
+        with sqlite3.connect(path) as conn:
+            assert planner.changed_games_since_snapshot(conn) == [second]
+
+        run_on_copy(tmp_dir, "--changed-games", "auto", "--slowest", "0")
+        with sqlite3.connect(path) as conn:
+            assert planner.changed_games_since_snapshot(conn) == []
+
+
+def test_changed_games_honour_bus_capacity():
+    overrides = {}
+    for capacity in (str(planner.BUS_CAPACITY_LIMIT), "1"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = scratch_connection(tmp_dir)
+            game_id = conn.execute("SELECT game_id FROM vw_team_games ORDER BY game_id LIMIT 1").fetchone()[0]
+            alias_ids = sorted(planner.affected_alias_ids(conn, [game_id]))
+            conn.close()
+            path = run_on_copy(tmp_dir, "--changed-games", str(game_id), "--bus-capacity", capacity, "--slowest", "0")
+            with sqlite3.connect(path) as conn:
+                overrides[capacity] = conn.execute(
+                    f"""
+                    SELECT COUNT(*) FROM team_itinerary_segments
+                    WHERE alias_id IN ({",".join("?" * len(alias_ids))}) AND notes LIKE '%capacity override%'
+                    """,
+                    alias_ids,
+                ).fetchone()[0]
+    assert overrides["1"] > overrides[str(planner.BUS_CAPACITY_LIMIT)], overrides
+
+
+def test_changed_games_rejects_workers():
+    try:
+        planner.main(["--changed-games", "auto", "--workers", "2"])
+    except SystemExit as exc:
+        assert exc.code == 2
+    else:
+        raise AssertionError("--changed-games must not silently ignore --workers")
+
+
+if __name__ == "__main__":
+    test_bus_trip_loads_persisted_and_loaded_lazily()
+    test_snapshot_matches_schedule_after_full_run()
+    test_unchanged_games_replan_to_identical_segments()
+    test_moved_game_only_touches_its_squads()
+    test_bulk_rewrite_matches_row_by_row_ids_and_rebuilds_indexes()
+    test_partial_run_keeps_other_changed_games_pending()
+    test_changed_games_honour_bus_capacity()
+    test_changed_games_rejects_workers()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Parallel planning (`--workers`) must give the same itineraries as the sequential run, at any capacity."""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def get_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_partition_keeps_schools_together():
+    with get_connection() as conn:
+        aliases = planner.fetch_aliases(conn)
+        chunks = planner.partition_aliases(aliases, 3)
+        school_of = {alias["alias_id"]: alias["school_id"] for alias in aliases}
+        assert sorted(alias_id for chunk in chunks for alias_id in chunk) == sorted(school_of)
+        seen = {}
+        for chunk_no, chunk in enumerate(chunks):
+            for alias_id in chunk:
+                assert seen.setdefault(school_of[alias_id], chunk_no) == chunk_no, "School split across workers"
+
+
+def plan_sequentially(conn, aliases, limit):
+    lookup = planner.load_lookup_data(conn)
+    tracker = planner.BusLoadTracker(limit)
+    return {alias["alias_id"]: planner.generate_segments_for_alias(conn, alias, lookup, tracker) for alias in aliases}
+
+
+def test_parallel_matches_sequential_within_capacity():
+    with get_connection() as conn:
+        aliases = planner.fetch_aliases(conn)
+        sequential = plan_sequentially(conn, aliases, planner.BUS_CAPACITY_LIMIT)
+        parallel, _ = planner.plan_in_parallel(conn, aliases, 3)
+        assert parallel == sequential
+        for segments in sequential.values():
+            keys = [seg.sort_key() for seg in segments]
+            assert keys == sorted(keys), "write_segments numbers segments in the order they are planned"
+
+        merged = planner.BusLoadTracker(planner.BUS_CAPACITY_LIMIT)
+        for alias in aliases:
+            headcount = int(alias["headcount"] or 0)
+            for seg in parallel[alias["alias_id"]]:
+                if seg.segment_type == "bus" and "capacity override" not in (seg.notes or ""):
+                    assert merged.assign(seg.service_day, seg.route_id, seg.trip_index, headcount)
+
+
+def test_parallel_matches_sequential_at_binding_capacity():
+    with get_connection() as conn:
+        aliases = planner.fetch_aliases(conn)
+        sequential = plan_sequentially(conn, aliases, 120)
+        assert any(
+            "capacity override" in (seg.notes or "") for segments in sequential.values() for seg in segments
+        ), "120 seats must make buses fill up"
+
+        parallel, replanned = planner.plan_in_parallel(conn, aliases, 3, 120)
+        assert parallel == sequential
+        assert 0 < replanned <= len(aliases), "Workers that start empty must be caught by the merge"
+
+        # With the final loads as the prediction, most worker plans survive the merge.
+        headcount = {alias["alias_id"]: int(alias["headcount"] or 0) for alias in aliases}
+        predicted = {
+            alias_id: [
+                (seg.service_day, seg.route_id, seg.trip_index, headcount[alias_id])
+                for seg in segments
+                if seg.segment_type == "bus" and seg.route_id is not None and seg.trip_index is not None
+            ]
+            for alias_id, segments in sequential.items()
+        }
+        informed, informed_replanned = planner.plan_in_parallel(conn, aliases, 3, 120, predicted=predicted)
+        assert informed == sequential
+        assert informed_replanned < replanned
+
+
+def test_replay_is_all_or_nothing():
+    tracker = planner.BusLoadTracker(10)
+    tracker.journal = journal = []
+    assert tracker.assign("sat", 1, 1, 6)
+    tracker.release("sat", 1, 1, 6)
+    assert tracker.assign("sat", 1, 2, 6)
+    tracker.journal = None
+
+    shared = planner.BusLoadTracker(10)
+    assert shared.replay(journal)
+    assert (shared.current("sat", 1, 1), shared.current("sat", 1, 2)) == (0, 6)
+
+    # Trip 2 is now full, so the last check would be answered differently: nothing is booked.
+    assert not shared.replay(journal)
+    assert (shared.current("sat", 1, 1), shared.current("sat", 1, 2)) == (0, 6)
+
+
+if __name__ == "__main__":
+    test_partition_keeps_schools_together()
+    test_parallel_matches_sequential_within_capacity()
+    test_parallel_matches_sequential_at_binding_capacity()
+    test_replay_is_all_or_nothing()
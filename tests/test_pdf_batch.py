@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Batch PDF rendering: bulk fetches, font cache, --jobs pool and the content-hash manifest."""
+
+from __future__ import annotations
+
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_all_pdfs  # noqa: E402
+import generate_itineraries as planner  # noqa: E402
+import render_pdf  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def pdf_content(path: Path) -> bytes:
+    # The document /ID is a hash that includes the creation timestamp.
+    return re.sub(rb"/(CreationDate \(.*?\)|ID \[.*?\])", b"", path.read_bytes())
+
+
+def get_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_bulk_fetch_matches_per_alias_fetch():
+    with get_connection() as conn:
+        headers = render_pdf.fetch_all_headers(conn)
+        itineraries = render_pdf.fetch_all_itineraries(conn)
+        manual = render_pdf.fetch_all_manual_segments(conn)
+        games = render_pdf.fetch_all_games(conn)
+        assert len(headers) == 80, "Expected all 80 aliases in the bulk header fetch"
+        for alias_id, header in headers.items():
+            assert header == render_pdf.fetch_alias_header(conn, alias_id)
+            assert itineraries.get(alias_id, []) == render_pdf.fetch_itinerary(conn, alias_id)
+            assert manual.get(alias_id, []) == render_pdf.fetch_manual_segments(conn, alias_id)
+            assert games.get(alias_id, []) == render_pdf.fetch_games(conn, alias_id)
+
+
+def test_font_cache_renders_identical_pdfs():
+    if not render_pdf.HAS_FPDF:
+        return
+    with get_connection() as conn:
+        alias_id = conn.execute("SELECT MIN(alias_id) FROM vw_team_alignment").fetchone()[0]
+        data = (
+            render_pdf.fetch_alias_header(conn, alias_id),
+            render_pdf.fetch_itinerary(conn, alias_id),
+            render_pdf.fetch_manual_segments(conn, alias_id),
+            render_pdf.fetch_games(conn, alias_id),
+        )
+    fonts = render_pdf.FontCache()
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = Path(tmp) / "reference.pdf"
+        render_pdf.render_pdf(*data, reference)
+        outputs = []
+        # Render twice from the same cache: fpdf2 subsets fonts in place on output.
+        for name in ("first.pdf", "second.pdf"):
+            path = Path(tmp) / name
+            render_pdf.render_pdf(*data, path, fonts=fonts)
+            outputs.append(path)
+        for path in outputs:
+            assert pdf_content(path) == pdf_content(reference), f"{path.name} differs from an uncached render"
+
+
+def test_chunks_cover_aliases_in_order():
+    alias_ids = list(range(1, 81))
+    for jobs in (1, 2, 3, 8, 100):
+        chunks = generate_all_pdfs.chunk_aliases(alias_ids, jobs)
+        assert [alias_id for chunk in chunks for alias_id in chunk] == alias_ids
+        assert all(chunks), "Chunks must not be empty"
+
+
+def test_render_fetches_every_alias_unfiltered_or_in_chunks():
+    fetched = []
+    saved = generate_all_pdfs.fetch_all_headers, generate_all_pdfs.FETCH_CHUNK_SIZE
+
+    def recording_fetch(conn, alias_ids=None):
+        fetched.append(None if alias_ids is None else list(alias_ids))
+        return saved[0](conn, alias_ids)
+
+    generate_all_pdfs.fetch_all_headers = recording_fetch
+    generate_all_pdfs.FETCH_CHUNK_SIZE = 2
+    try:
+        with get_connection() as conn, tempfile.TemporaryDirectory() as tmp:
+            alias_ids = [row[0] for row in conn.execute("SELECT alias_id FROM vw_team_alignment ORDER BY alias_id")]
+            stale = alias_ids[:5]
+            results = generate_all_pdfs.render_aliases(conn, stale, render_pdf.FontCache(), Path(tmp), "20250101_000000")
+            assert [alias_id for alias_id, _ in results] == stale
+            assert fetched == [stale[0:2], stale[2:4], stale[4:5]]
+
+            fetched.clear()
+            results = generate_all_pdfs.render_aliases(
+                conn, alias_ids, render_pdf.FontCache(), Path(tmp), "20250101_000000", every_alias=True
+            )
+            assert [alias_id for alias_id, _ in results] == alias_ids
+            assert fetched == [None], "A full run must not bind every alias id"
+    finally:
+        generate_all_pdfs.fetch_all_headers, generate_all_pdfs.FETCH_CHUNK_SIZE = saved
+
+
+def test_pool_matches_sequential_render():
+    if not render_pdf.HAS_FPDF:
+        return
+    with get_connection() as conn:
+        alias_ids = [row[0] for row in conn.execute("SELECT alias_id FROM vw_team_alignment ORDER BY alias_id LIMIT 6")]
+        with tempfile.TemporaryDirectory() as tmp:
+            sequential_dir = Path(tmp) / "sequential"
+            pool_dir = Path(tmp) / "pool"
+            timestamp = "20250101_000000"
+            sequential = list(
+                generate_all_pdfs.render_aliases(conn, alias_ids, render_pdf.FontCache(), sequential_dir, timestamp)
+            )
+            pooled = list(generate_all_pdfs.render_in_pool(alias_ids, 2, pool_dir, timestamp))
+            assert pooled == sequential == [(alias_id, None) for alias_id in alias_ids]
+            names = sorted(path.name for path in sequential_dir.iterdir())
+            assert names == sorted(path.name for path in pool_dir.iterdir())
+            for name in names:
+                assert pdf_content(pool_dir / name) == pdf_content(sequential_dir / name), f"{name} differs"
+
+
+def test_manifest_marks_only_changed_or_missing_aliases():
+    hashes = {1: "a", 2: "b", 3: "c", 4: "d"}
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp) / "itineraries"
+        output_dir.mkdir()
+        manifest_path = Path(tmp) / "itineraries.manifest.json"
+        manifest = {}
+        for alias_id in (1, 2, 3):
+            (output_dir / f"{alias_id}.pdf").write_bytes(b"%PDF")
+            manifest[alias_id] = {"hash": hashes[alias_id], "file": f"{alias_id}.pdf"}
+        manifest[2]["hash"] = "old"
+        (output_dir / "3.pdf").unlink()
+        generate_all_pdfs.save_manifest(manifest_path, manifest)
+
+        loaded = generate_all_pdfs.load_manifest(manifest_path)
+        assert loaded == manifest
+        assert generate_all_pdfs.stale_aliases(hashes, loaded, output_dir) == [2, 3, 4]
+        assert generate_all_pdfs.stale_aliases(hashes, loaded, output_dir, force=True) == [1, 2, 3, 4]
+
+        manifest_path.write_text('{"version": 0, "aliases": {}}', encoding="utf-8")
+        assert generate_all_pdfs.load_manifest(manifest_path) == {}, "Outdated manifests must be ignored"
+
+
+def test_moved_game_changes_only_its_squads_hashes():
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "event_planner.db"
+        shutil.copyfile(DB_PATH, copy)
+        conn = sqlite3.connect(copy)
+        conn.row_factory = sqlite3.Row
+        before = generate_all_pdfs.render_input_hashes(conn)
+        assert generate_all_pdfs.render_input_hashes(conn) == before, "Hashes must be stable between runs"
+
+        game_id = conn.execute(
+            "SELECT game_id FROM vw_team_games WHERE service_day_code = 'sat' ORDER BY game_id LIMIT 1"
+        ).fetchone()[0]
+        conn.execute("UPDATE schedule_games SET start_time = '16:00', start_min = 960 WHERE game_id = ?", (game_id,))
+        conn.commit()
+        alias_ids = planner.affected_alias_ids(conn, [game_id])
+        planner.regenerate_aliases(conn, alias_ids, [game_id])
+        after = generate_all_pdfs.render_input_hashes(conn)
+        conn.close()
+
+        changed = {alias_id for alias_id in before if after[alias_id] != before[alias_id]}
+        assert changed, "Moving a game must change the hash of the squads playing it"
+        assert changed <= set(alias_ids), "Only squads in the moved game may need a new PDF"
+
+
+if __name__ == "__main__":
+    test_bulk_fetch_matches_per_alias_fetch()
+    test_font_cache_renders_identical_pdfs()
+    test_chunks_cover_aliases_in_order()
+    test_render_fetches_every_alias_unfiltered_or_in_chunks()
+    test_pool_matches_sequential_render()
+    test_manifest_marks_only_changed_or_missing_aliases()
+    test_moved_game_changes_only_its_squads_hashes()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Caching rules of `scripts/pipeline.py`, exercised with small stand-in stages in a temp dir."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from argparse import Namespace
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import pipeline  # noqa: E402
+
+
+def copy_stage(name: str, source: Path, target: Path, calls: list, upstream=None) -> pipeline.Stage:
+    def run(args: Namespace) -> None:
+        calls.append(name)
+        target.write_text(source.read_text(encoding="utf-8").strip(), encoding="utf-8")
+
+    return pipeline.Stage(name, run, scripts=[], inputs=[source], upstream=upstream or [], outputs=[target])
+
+
+def run(stages, state_path: Path, **overrides):
+    args = Namespace(force=False, stop_after=None, jobs=1)
+    vars(args).update(overrides)
+    return {entry["stage"]: entry["status"] for entry in pipeline.run_pipeline(args, stages, state_path)}
+
+
+def test_unchanged_inputs_are_skipped_and_identical_outputs_stop_propagation():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        raw, extra = tmp_dir / "raw.txt", tmp_dir / "extra.txt"
+        raw.write_text("games", encoding="utf-8")
+        extra.write_text("rooms", encoding="utf-8")
+        state_path = tmp_dir / "state.json"
+        calls: list = []
+        stages = [
+            copy_stage("parse", raw, tmp_dir / "parsed.txt", calls),
+            copy_stage("combine", extra, tmp_dir / "combined.txt", calls, upstream=["parse"]),
+        ]
+
+        assert run(stages, state_path) == {"parse": "ran", "combine": "ran"}
+        assert run(stages, state_path) == {"parse": "cached", "combine": "cached"}
+
+        # Whitespace-only change: parse re-runs but writes the same bytes, so combine stays cached.
+        raw.write_text("games\n", encoding="utf-8")
+        assert run(stages, state_path) == {"parse": "ran", "combine": "cached"}
+
+        raw.write_text("moved game", encoding="utf-8")
+        assert run(stages, state_path) == {"parse": "ran", "combine": "ran"}
+
+        (tmp_dir / "combined.txt").unlink()
+        assert run(stages, state_path) == {"parse": "cached", "combine": "ran"}
+        assert run(stages, state_path, force=True) == {"parse": "ran", "combine": "ran"}
+        assert run(stages, state_path, stop_after="parse") == {"parse": "cached"}
+        assert calls == ["parse", "combine", "parse", "parse", "combine", "combine", "parse", "combine"]
+
+
+def test_rerun_stage_forces_later_writers_of_the_same_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        raw = tmp_dir / "raw.txt"
+        raw.write_text("schedule", encoding="utf-8")
+        shared = tmp_dir / "event.db"
+        state_path = tmp_dir / "state.json"
+        calls: list = []
+
+        def append(args: Namespace) -> None:
+            calls.append("append")
+            shared.write_text(shared.read_text(encoding="utf-8") + "+aliases", encoding="utf-8")
+
+        stages = [
+            copy_stage("build", raw, shared, calls),
+            pipeline.Stage("append", append, scripts=[], upstream=["build"], outputs=[shared]),
+        ]
+        assert run(stages, state_path) == {"build": "ran", "append": "ran"}
+        # Forced rebuild recreates the shared file with identical bytes; append must still redo its work.
+        assert run(stages, state_path, force=True) == {"build": "ran", "append": "ran"}
+        assert shared.read_text(encoding="utf-8") == "schedule+aliases"
+        assert run(stages, state_path) == {"build": "cached", "append": "cached"}
+
+
+def test_outputs_changed_outside_the_pipeline_are_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        raw = tmp_dir / "raw.txt"
+        raw.write_text("schedule", encoding="utf-8")
+        shared, rendered = tmp_dir / "event.db", tmp_dir / "rendered.txt"
+        state_path = tmp_dir / "state.json"
+        calls: list = []
+
+        def append(args: Namespace) -> None:
+            calls.append("append")
+            shared.write_text(shared.read_text(encoding="utf-8") + "+aliases", encoding="utf-8")
+
+        stages = [
+            copy_stage("build", raw, shared, calls),
+            pipeline.Stage("append", append, scripts=[], upstream=["build"], outputs=[shared]),
+            copy_stage("render", shared, rendered, calls, upstream=["append"]),
+        ]
+        assert run(stages, state_path) == {"build": "ran", "append": "ran", "render": "ran"}
+
+        # A hand edit of the shared file (e.g. --changed-games) rebuilds it from its first writer on;
+        # the rebuilt file has the bytes render last saw, so render stays cached.
+        shared.write_text("schedule+aliases+replanned", encoding="utf-8")
+        assert run(stages, state_path) == {"build": "ran", "append": "ran", "render": "cached"}
+        assert shared.read_text(encoding="utf-8") == "schedule+aliases"
+
+        rendered.write_text("stale", encoding="utf-8")
+        assert run(stages, state_path) == {"build": "cached", "append": "cached", "render": "ran"}
+
+        # The file now holds build's output only, so append must redo its work on the next run.
+        assert run(stages, state_path, force=True, stop_after="build") == {"build": "ran"}
+        assert run(stages, state_path) == {"build": "cached", "append": "ran", "render": "cached"}
+        assert shared.read_text(encoding="utf-8") == "schedule+aliases"
+
+
+def test_failed_stage_is_not_recorded():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        output = tmp_dir / "out.txt"
+        state_path = tmp_dir / "state.json"
+
+        def fail(args: Namespace) -> None:
+            output.write_text("partial", encoding="utf-8")
+            raise RuntimeError("boom")
+
+        stage = pipeline.Stage("flaky", fail, scripts=[], outputs=[output])
+        try:
+            run([stage], state_path)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("The stage error must propagate")
+        stages, files = pipeline.load_state(state_path)
+        assert "flaky" not in stages and str(output) not in files
+
+
+def test_real_stages_reference_existing_scripts_and_inputs():
+    names = [stage.name for stage in pipeline.STAGES]
+    for stage in pipeline.STAGES:
+        for script in stage.scripts:
+            assert (pipeline.SCRIPTS_DIR / script).exists(), script
+        for path in stage.inputs:
+            assert path.exists(), path
+        for upstream in stage.upstream:
+            assert names.index(upstream) < names.index(stage.name), "Upstream stages must run first"
+
+
+if __name__ == "__main__":
+    test_unchanged_inputs_are_skipped_and_identical_outputs_stop_propagation()
+    test_rerun_stage_forces_later_writers_of_the_same_file()
+    test_outputs_changed_outside_the_pipeline_are_rebuilt()
+    test_failed_stage_is_not_recorded()
+    test_real_stages_reference_existing_scripts_and_inputs()
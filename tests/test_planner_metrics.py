@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Per-squad planning metrics (`planner_metrics`) recorded by `generate_itineraries.py`."""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+from planner_runs import run_on_copy  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def stored_metrics(path: Path):
+    with sqlite3.connect(path) as conn:
+        return {row[0]: row[1:] for row in conn.execute("SELECT * FROM planner_metrics ORDER BY alias_id")}
+
+
+def test_full_run_stores_one_row_per_squad():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = run_on_copy(tmp, "--slowest", "0")
+        metrics = stored_metrics(path)
+        with sqlite3.connect(path) as conn:
+            segments = dict(conn.execute("SELECT alias_id, COUNT(*) FROM team_itinerary_segments GROUP BY alias_id"))
+            aliases = [row[0] for row in conn.execute("SELECT alias_id FROM team_aliases")]
+        assert sorted(metrics) == sorted(aliases)
+        for alias_id, (plan_ms, routing, multi_leg, releases, segment_count) in metrics.items():
+            assert plan_ms > 0 and routing >= multi_leg >= 0 and releases >= 0
+            assert segment_count == segments.get(alias_id, 0)
+        assert any(row[2] > 0 for row in metrics.values()), "Some squads need multi-leg searches"
+
+
+def test_counters_follow_the_tracker():
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.row_factory = sqlite3.Row
+        lookup = planner.load_lookup_data(conn)
+        tracker = planner.BusLoadTracker(planner.BUS_CAPACITY_LIMIT)
+        alias = planner.fetch_aliases(conn)[0]
+        metrics = {}
+        segments = planner.plan_alias(conn, alias, lookup, tracker, metrics)
+        assert segments == planner.generate_segments_for_alias(
+            conn, alias, lookup, planner.BusLoadTracker(planner.BUS_CAPACITY_LIMIT)
+        ), "Measuring must not change the plan"
+        entry = metrics[alias["alias_id"]]
+        assert (entry.routing_calls, entry.multi_leg_attempts, entry.capacity_releases) == (
+            tracker.counters.routing_calls,
+            tracker.counters.multi_leg_attempts,
+            tracker.counters.capacity_releases,
+        )
+
+        bus = [seg for seg in segments if seg.segment_type == "bus"]
+        before = tracker.counters.capacity_releases
+        planner.release_bus_segments(tracker, alias, bus)
+        assert tracker.counters.capacity_releases == before + len(bus)
+
+        text = planner.format_planner_metrics(conn, metrics, slowest=5)
+        assert "Planning time per squad (1 squads" in text and "Slowest 1 squads:" in text
+
+
+def test_changed_games_replace_only_their_squads():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = run_on_copy(tmp, "--slowest", "0")
+        before = stored_metrics(path)
+        with sqlite3.connect(path) as conn:
+            game_id = conn.execute("SELECT MIN(game_id) FROM schedule_games").fetchone()[0]
+            conn.row_factory = sqlite3.Row
+            affected = planner.affected_alias_ids(conn, [game_id])
+        run_on_copy(tmp, "--changed-games", str(game_id), "--slowest", "0")
+        after = stored_metrics(path)
+        assert affected and sorted(after) == sorted(before)
+        for alias_id in before:
+            if alias_id not in affected:
+                assert after[alias_id] == before[alias_id]
+            else:
+                assert after[alias_id][4] == before[alias_id][4], "Same schedule, same number of segments"
+
+
+if __name__ == "__main__":
+    test_full_run_stores_one_row_per_squad()
+    test_counters_follow_the_tracker()
+    test_changed_games_replace_only_their_squads()
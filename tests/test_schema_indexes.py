@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""`build_event_db.INDEX_SQL`, the UNION ALL `vw_team_games`, and the query plans of the planner's lookups."""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_event_db  # noqa: E402
+import sql_profile  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+INDEX_NAME = re.compile(r"CREATE (?:UNIQUE )?INDEX IF NOT EXISTS (\w+)")
+
+# vw_team_games as it was written before, with an OR join.
+OR_JOIN_GAMES = """
+SELECT ta.alias_id, g.game_id, d.date, g.start_time, h.name,
+       CASE WHEN g.home_team_id = st.team_id THEN 'home' ELSE 'away' END,
+       opp.name
+FROM team_aliases ta
+JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
+JOIN schedule_teams st ON st.team_id = ta.schedule_team_id
+JOIN schedule_games g ON g.home_team_id = st.team_id OR g.away_team_id = st.team_id
+JOIN schedule_event_days d ON d.day_id = g.day_id
+JOIN schedule_halls h ON h.hall_id = g.hall_id
+JOIN schedule_tournaments t ON t.tournament_id = g.tournament_id
+JOIN schedule_teams opp ON opp.team_id = CASE WHEN g.home_team_id = st.team_id THEN g.away_team_id ELSE g.home_team_id END
+"""
+UNION_GAMES = "SELECT alias_id, game_id, date, start_time, hall_name, role, opponent_name FROM vw_team_games"
+
+
+def plan(conn: sqlite3.Connection, sql: str, params) -> str:
+    return "\n".join(sql_profile.query_plan(conn, sql, params))
+
+
+def test_every_index_is_built_and_analyzed():
+    with sqlite3.connect(DB_PATH) as conn:
+        built = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert set(INDEX_NAME.findall(build_event_db.INDEX_SQL)) <= built
+        analyzed = {row[0] for row in conn.execute("SELECT tbl FROM sqlite_stat1")}
+        assert {"transport_stop_links", "transport_trip_instances", "schedule_games"} <= analyzed
+
+
+def test_union_view_matches_the_or_join():
+    with sqlite3.connect(DB_PATH) as source, sqlite3.connect(":memory:") as conn:
+        source.backup(conn)
+        assert sorted(conn.execute(UNION_GAMES)) == sorted(conn.execute(OR_JOIN_GAMES))
+
+        # A team listed on both sides must still give one row, not one per branch.
+        team_id = conn.execute("SELECT MIN(schedule_team_id) FROM team_aliases").fetchone()[0]
+        conn.execute(
+            """
+            INSERT INTO schedule_games (tournament_id, hall_id, day_id, start_time, start_min, home_team_id, away_team_id)
+            SELECT tournament_id, hall_id, day_id, start_time, start_min, ?, ? FROM schedule_games LIMIT 1
+            """,
+            (team_id, team_id),
+        )
+        assert sorted(conn.execute(UNION_GAMES)) == sorted(conn.execute(OR_JOIN_GAMES))
+
+
+def test_planner_lookups_search_the_indexes():
+    with sqlite3.connect(DB_PATH) as conn:
+        alias_id, game_id = conn.execute(
+            "SELECT alias_id, game_id FROM vw_team_games ORDER BY alias_id, game_id LIMIT 1"
+        ).fetchone()
+
+        sequence = plan(conn, "SELECT * FROM vw_team_game_sequence WHERE alias_id = ?", (alias_id,))
+        assert "idx_games_home_team" in sequence and "idx_games_away_team" in sequence
+        assert "SCAN g" not in sequence
+
+        assert "idx_aliases_schedule_team" in plan(conn, "SELECT alias_id FROM vw_team_games WHERE game_id = ?", (game_id,))
+
+        candidates = plan(
+            conn, "SELECT * FROM vw_game_transport_candidates WHERE alias_id = ? AND game_id = ?", (alias_id, game_id)
+        )
+        assert "idx_stop_links_school" in candidates and "idx_stop_links_hall" in candidates
+        assert "AUTOMATIC COVERING INDEX (lodging_school_id" not in candidates
+        # Every trip-instance search is bound to a stop or a trip, not to the whole service day.
+        assert not [line for line in candidates.splitlines() if line.endswith("(service_day=?)")], candidates
+
+        flat = plan(
+            conn,
+            "SELECT * FROM vw_team_itinerary_flat WHERE alias_id = ? ORDER BY service_day, sequence_no",
+            (alias_id,),
+        )
+        assert "idx_segments_alias_day" in flat and "TEMP B-TREE FOR ORDER BY" not in flat
+
+
+if __name__ == "__main__":
+    test_every_index_is_built_and_analyzed()
+    test_union_view_matches_the_or_join()
+    test_planner_lookups_search_the_indexes()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Opt-in dumps from `scripts/sql_dump.py`, written for a small temp database."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import sql_dump  # noqa: E402
+
+
+def build_sample(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE teams (team_id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+        CREATE INDEX idx_teams_name ON teams(name);
+        INSERT INTO teams (name) VALUES ('Bergen, 1'), ('Ås "B"'), ('Tromsø');
+        """
+    )
+    return conn
+
+
+def test_no_format_writes_nothing_and_removes_old_dumps():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "sample.db"
+        conn = build_sample(db_path)
+        sql_dump.write_dump(conn, db_path, "csv")
+        db_path.with_suffix(".sql").write_text("stale", encoding="utf-8")
+
+        assert sql_dump.write_dump(conn, db_path, None) == []
+        conn.close()
+        assert sorted(path.name for path in Path(tmp).iterdir()) == ["sample.db"]
+
+
+def test_sql_dump_round_trips_and_is_deterministic():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "sample.db"
+        conn = build_sample(db_path)
+        (target,) = sql_dump.write_dump(conn, db_path, "sql")
+        first = target.read_bytes()
+        sql_dump.write_dump(conn, db_path, "sql")
+        assert target.read_bytes() == first, "An unchanged database must give an identical dump"
+
+        text = gzip.decompress(first).decode("utf-8")
+        assert text == "".join(f"{line}\n" for line in conn.iterdump())
+        restored = sqlite3.connect(":memory:")
+        restored.executescript(text)
+        query = "SELECT team_id, name FROM teams ORDER BY team_id"
+        assert restored.execute(query).fetchall() == conn.execute(query).fetchall()
+        conn.close()
+
+
+def test_csv_dump_has_schema_and_rowid_ordered_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "sample.db"
+        conn = build_sample(db_path)
+        schema_path, csv_dir = sql_dump.write_dump(conn, db_path, "csv")
+        conn.close()
+
+        schema = schema_path.read_text(encoding="utf-8")
+        assert "CREATE TABLE teams" in schema and "CREATE INDEX idx_teams_name" in schema
+        assert sorted(path.name for path in csv_dir.iterdir()) == ["teams.csv.gz"]
+        with gzip.open(csv_dir / "teams.csv.gz", "rt", encoding="utf-8", newline="") as handle:
+            rows = list(csv.reader(handle))
+        assert rows == [["team_id", "name"], ["1", "Bergen, 1"], ["2", 'Ås "B"'], ["3", "Tromsø"]]
+
+        restored = sqlite3.connect(":memory:")
+        restored.executescript(schema)
+        restored.executemany("INSERT INTO teams VALUES (?, ?)", rows[1:])
+        assert restored.execute("SELECT COUNT(*) FROM teams").fetchone()[0] == 3
+
+
+if __name__ == "__main__":
+    test_no_format_writes_nothing_and_removes_old_dumps()
+    test_sql_dump_round_trips_and_is_deterministic()
+    test_csv_dump_has_schema_and_rowid_ordered_rows()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""`scripts/sql_profile.py` and `generate_itineraries.py --profile-sql`."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import generate_itineraries as planner  # noqa: E402
+import sql_profile  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def test_templates_fold_literals_and_placeholder_lists():
+    template = sql_profile.statement_template
+    assert template("SELECT *\n  FROM t\n WHERE a = 12 AND b = 'x''y'") == "SELECT * FROM t WHERE a = ? AND b = ?"
+    assert template("SELECT * FROM t WHERE id IN (?, ?, ?)") == template("SELECT * FROM t WHERE id IN (?,?)")
+    assert template("SELECT col2, t1.x FROM t1 LIMIT 1") == "SELECT col2, t1.x FROM t1 LIMIT ?"
+
+
+def test_calls_rows_and_plans_are_recorded():
+    profiler = sql_profile.SqlProfiler()
+    conn = profiler.wrap(sqlite3.connect(":memory:"))
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    conn.executemany("INSERT INTO t (id, v) VALUES (?, ?)", ((i, str(i)) for i in range(10)))
+    conn.commit()
+    for i in range(3):
+        assert conn.execute("SELECT v FROM t WHERE id = ?", (i,)).fetchone() == (str(i),)
+    assert len(list(conn.execute("SELECT * FROM t WHERE id < 5"))) == 5
+    assert len(conn.execute("SELECT * FROM t WHERE id < 7").fetchall()) == 7
+
+    report = profiler.report(conn)
+    by_template = {entry["template"]: entry for entry in report["templates"]}
+    lookup = by_template["SELECT v FROM t WHERE id = ?"]
+    assert (lookup["calls"], lookup["rows"]) == (3, 3)
+    assert by_template["SELECT * FROM t WHERE id < ?"]["rows"] == 12
+    assert by_template["INSERT INTO t (id, v) VALUES (?, ...)"]["calls"] == 1
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 10, "executemany must still insert every row"
+    assert [entry["total_ms"] for entry in report["templates"]] == sorted(
+        (entry["total_ms"] for entry in report["templates"]), reverse=True
+    )
+    planned = [entry for entry in report["templates"] if "query_plan" in entry]
+    assert len(planned) == min(sql_profile.PLAN_TOP, len(report["templates"]))
+    assert planned[0]["template"] == report["templates"][0]["template"]
+    assert sql_profile.query_plan(conn.raw, "SELECT v FROM t WHERE id = ?", (1,)) == [
+        "SEARCH t USING INTEGER PRIMARY KEY (rowid=?)"
+    ]
+    sql_profile.query_plan(conn.raw, "INSERT INTO t (id, v) VALUES (?, ?)", (99, "x"))
+    assert not conn.in_transaction, "Explaining DML must not leave a transaction open"
+
+
+def test_profiled_run_writes_the_report_and_the_same_segments():
+    with tempfile.TemporaryDirectory() as tmp:
+        copy = Path(tmp) / "event_planner.db"
+        shutil.copyfile(DB_PATH, copy)
+        saved = planner.DB_PATH, sql_profile.PROFILE_DIR
+        planner.DB_PATH, sql_profile.PROFILE_DIR = copy, Path(tmp) / "profile"
+        try:
+            planner.main(["--profile-sql"])
+        finally:
+            planner.DB_PATH, sql_profile.PROFILE_DIR = saved
+
+        reports = sorted((Path(tmp) / "profile").glob("sql_profile_*.json"))
+        assert len(reports) == 1 and reports[0].with_suffix(".txt").exists()
+        report = json.loads(reports[0].read_text(encoding="utf-8"))
+        templates = [entry["template"] for entry in report["templates"]]
+        assert any("vw_game_transport_candidates" in template for template in templates)
+        assert all(entry["p95_ms"] <= entry["total_ms"] for entry in report["templates"])
+        assert "query_plan" in report["templates"][0]
+
+        query = "SELECT alias_id, sequence_no, segment_type, start_time, end_time, notes FROM team_itinerary_segments ORDER BY 1, 2"
+        with sqlite3.connect(copy) as profiled, sqlite3.connect(DB_PATH) as plain:
+            assert profiled.execute(query).fetchall() == plain.execute(query).fetchall()
+
+
+if __name__ == "__main__":
+    test_templates_fold_literals_and_placeholder_lists()
+    test_calls_rows_and_plans_are_recorded()
+    test_profiled_run_writes_the_report_and_the_same_segments()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""`scripts/synth_event.py`: reproducible output in the build schemas, planned end to end in a temp dir."""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_event_db  # noqa: E402
+import generate_itineraries  # noqa: E402
+import map_team_aliases  # noqa: E402
+import synth_event  # noqa: E402
+
+BUILD_DIR = Path("data/build")
+DOMAIN_DBS = ("bus_routes.db", "lodging.db", "tournament.db")
+SMALL_EVENT = ["--teams", "60", "--schools", "3", "--halls", "3", "--routes", "2"]
+
+
+def schema(path: Path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(
+            "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name"
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def event_db_in(directory: Path):
+    """Point the downstream scripts at the databases in `directory`."""
+    saved = (
+        build_event_db.BUS_DB,
+        build_event_db.LODGING_DB,
+        build_event_db.TOURNAMENT_DB,
+        build_event_db.TARGET_DB,
+        map_team_aliases.DB_PATH,
+        generate_itineraries.DB_PATH,
+    )
+    target = directory / "event_planner.db"
+    build_event_db.BUS_DB, build_event_db.LODGING_DB, build_event_db.TOURNAMENT_DB = (
+        directory / name for name in DOMAIN_DBS
+    )
+    build_event_db.TARGET_DB = map_team_aliases.DB_PATH = generate_itineraries.DB_PATH = target
+    try:
+        yield target
+    finally:
+        (
+            build_event_db.BUS_DB,
+            build_event_db.LODGING_DB,
+            build_event_db.TOURNAMENT_DB,
+            build_event_db.TARGET_DB,
+            map_team_aliases.DB_PATH,
+            generate_itineraries.DB_PATH,
+        ) = saved
+
+
+def test_same_seed_gives_same_bytes_in_the_build_schemas():
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = Path(tmp) / "a", Path(tmp) / "b"
+        synth_event.main([*SMALL_EVENT, "--out-dir", str(first)])
+        synth_event.main([*SMALL_EVENT, "--out-dir", str(second)])
+        for name in DOMAIN_DBS:
+            assert (first / name).read_bytes() == (second / name).read_bytes(), name
+            assert schema(first / name) == schema(BUILD_DIR / name), f"{name} must use the build script's schema"
+
+
+def test_synthetic_event_is_linked_matched_and_planned():
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        synth_event.main([*SMALL_EVENT, "--out-dir", str(out_dir)])
+        with event_db_in(out_dir) as target:
+            build_event_db.main([])
+            map_team_aliases.main()
+            generate_itineraries.main([])
+
+        conn = sqlite3.connect(target)
+        try:
+            unlinked = conn.execute(
+                """
+                SELECT name FROM schedule_halls
+                WHERE hall_id NOT IN (SELECT schedule_hall_id FROM transport_stop_links WHERE schedule_hall_id IS NOT NULL)
+                UNION ALL
+                SELECT name FROM lodging_schools
+                WHERE school_id NOT IN (SELECT lodging_school_id FROM transport_stop_links WHERE lodging_school_id IS NOT NULL)
+                """
+            ).fetchall()
+            assert unlinked == [], "Every synthetic hall and school must get a stop"
+
+            # A trip visits each stop of its route once, so build_event_db numbers the trips correctly.
+            split_trips = conn.execute(
+                """
+                SELECT COUNT(*) FROM (
+                    SELECT route_id, service_day, trip_index, COUNT(*) AS visits
+                    FROM transport_trip_instances
+                    GROUP BY route_id, service_day, trip_index
+                ) trips
+                JOIN (SELECT route_id, COUNT(*) AS visits FROM transport_route_stops GROUP BY route_id) routes
+                  ON routes.route_id = trips.route_id
+                WHERE trips.visits <> routes.visits
+                """
+            ).fetchone()[0]
+            assert split_trips == 0
+
+            # Only a squad alone in its division (no pool, no games) may stay unmatched.
+            unmatched = conn.execute(
+                """
+                SELECT COUNT(*) FROM team_aliases ta
+                JOIN lodging_teams lt ON lt.team_id = ta.lodging_team_id
+                WHERE ta.schedule_team_id IS NULL
+                  AND (SELECT SUM(other.num_teams) FROM lodging_teams other WHERE other.division_key = lt.division_key) > 1
+                """
+            ).fetchone()[0]
+            assert unmatched == 0
+            games = conn.execute("SELECT COUNT(*) FROM team_itinerary_segments WHERE segment_type = 'game'").fetchone()[0]
+            stranded = conn.execute(
+                "SELECT COUNT(*) FROM team_itinerary_segments WHERE notes LIKE 'INGEN BUS%'"
+            ).fetchone()[0]
+            assert games > 0 and stranded == 0, "Every synthetic game must be reachable by bus"
+        finally:
+            conn.close()
+
+
+def test_too_few_courts_or_routes_are_reported():
+    with tempfile.TemporaryDirectory() as tmp:
+        for args, message in (
+            (["--teams", "2000", "--halls", "1"], "raise --halls"),
+            (["--schools", "40", "--routes", "1"], "raise --routes or --cadence"),
+        ):
+            try:
+                synth_event.main([*args, "--out-dir", tmp])
+            except SystemExit as exc:
+                assert message in str(exc)
+            else:
+                raise AssertionError(f"{args} should not fit")
+
+
+if __name__ == "__main__":
+    test_same_seed_gives_same_bytes_in_the_build_schemas()
+    test_synthetic_event_is_linked_matched_and_planned()
+    test_too_few_courts_or_routes_are_reported()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Cross-checks the in-memory TimetableIndex and CSA router against the bus data."""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from timetable import TimetableIndex, earliest_arrival_journey  # noqa: E402
+
+DB_PATH = Path("data/build/event_planner.db")
+
+
+def get_connection():
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def test_trip_indexes_match_view():
+    with get_connection() as conn:
+        index = TimetableIndex.from_connection(conn)
+        rows = conn.execute(
+            "SELECT service_day, route_id, trip_index, route_stop_time_id FROM vw_transport_trip_instances"
+        ).fetchall()
+        assert rows, "Expected trip instances in the view"
+        for row in rows:
+            stops = index.trip_stops(row["service_day"], row["route_id"], row["trip_index"])
+            assert row["route_stop_time_id"] in {st.route_stop_time_id for st in stops}
+
+
+def test_trips_between_matches_sql_join():
+    with get_connection() as conn:
+        index = TimetableIndex.from_connection(conn)
+        # Rute 2 EUS -> Terningen Arena on Friday, and Rute 1 Ydalir loop on Saturday.
+        for service_day, origin, destination, earliest in (("fri", 2, 3, 9 * 60), ("sat", 1, 2, 12 * 60)):
+            expected = conn.execute(
+                """
+                SELECT dep.route_stop_time_id, arr.route_stop_time_id
+                FROM vw_transport_trip_instances dep
+                JOIN vw_transport_trip_instances arr
+                  ON arr.route_id = dep.route_id
+                 AND arr.service_day = dep.service_day
+                 AND arr.trip_index = dep.trip_index
+                WHERE dep.service_day = ?
+                  AND dep.stop_id = ?
+                  AND arr.stop_id = ?
+                  AND arr.departure_time > dep.departure_time
+                  AND dep.departure_time >= ?
+                """,
+                (service_day, origin, destination, f"{earliest // 60:02d}:{earliest % 60:02d}"),
+            ).fetchall()
+            options = index.trips_between(service_day, origin, destination, earliest)
+            assert options, "Expected at least one direct trip"
+            assert sorted(tuple(row) for row in expected) == sorted(
+                (opt.departure_route_stop_time_id, opt.arrival_route_stop_time_id) for opt in options
+            )
+            departures = [opt.departure_min for opt in options]
+            assert departures == sorted(departures), "Trips must be ordered by departure time"
+
+
+def test_csa_journeys_are_valid_and_not_slower_than_direct():
+    with get_connection() as conn:
+        index = TimetableIndex.from_connection(conn)
+        stop_ids = [row[0] for row in conn.execute("SELECT stop_id FROM transport_stops")]
+        found = 0
+        for origin in stop_ids:
+            for destination in stop_ids:
+                if origin == destination:
+                    continue
+                journey = earliest_arrival_journey(index, "sat", origin, destination, 8 * 60, transfer_buffer=5)
+                direct = index.trips_between("sat", origin, destination, 8 * 60)
+                if journey is None:
+                    assert not direct, "CSA must find a journey whenever a direct trip exists"
+                    continue
+                found += 1
+                assert journey[0].departure_stop_id == origin and journey[0].departure_min >= 8 * 60
+                assert journey[-1].arrival_stop_id == destination
+                for leg in journey:
+                    assert leg in index.trips_between("sat", leg.departure_stop_id, leg.arrival_stop_id, leg.departure_min)
+                for previous, following in zip(journey, journey[1:]):
+                    assert following.departure_stop_id == previous.arrival_stop_id
+                    assert following.departure_min >= previous.arrival_min + 5, "Transfer buffer violated"
+                if direct:
+                    assert journey[-1].arrival_min <= min(opt.arrival_min for opt in direct)
+        assert found, "Expected reachable stop pairs on Saturday"
+
+
+def test_arrival_profiles_match_live_scan():
+    with get_connection() as conn:
+        index = TimetableIndex.from_connection(conn)
+        assert index.profile_transfer_buffer is not None, "Expected transport_arrival_profiles in the build"
+        stop_ids = [row[0] for row in conn.execute("SELECT stop_id FROM transport_stops")]
+        for service_day in ("fri", "sat", "sun"):
+            for earliest in range(6 * 60, 23 * 60, 37):
+                for origin in stop_ids:
+                    for destination in stop_ids:
+                        if origin == destination:
+                            continue
+                        journey = earliest_arrival_journey(
+                            index,
+                            service_day,
+                            origin,
+                            destination,
+                            earliest,
+                            transfer_buffer=index.profile_transfer_buffer,
+                        )
+                        expected = journey[-1].arrival_min if journey else None
+                        assert index.earliest_arrival(service_day, origin, destination, earliest) == expected
+
+
+def test_csa_respects_boarding_check():
+    with get_connection() as conn:
+        index = TimetableIndex.from_connection(conn)
+        first = earliest_arrival_journey(index, "fri", 2, 3, 9 * 60)
+        assert first is not None
+        blocked = {(leg.route_id, leg.trip_index) for leg in first}
+        second = earliest_arrival_journey(
+            index, "fri", 2, 3, 9 * 60, can_board=lambda day, route_id, trip_index: (route_id, trip_index) not in blocked
+        )
+        assert second is not None
+        assert not blocked & {(leg.route_id, leg.trip_index) for leg in second}
+        assert second[-1].arrival_min > first[-1].arrival_min
+
+
+if __name__ == "__main__":
+    test_trip_indexes_match_view()
+    test_trips_between_matches_sql_join()
+    test_csa_journeys_are_valid_and_not_slower_than_direct()
+    test_arrival_profiles_match_live_scan()
+    test_csa_respects_boarding_check()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Streaming XLSX reader in `scripts/build_tournament.py`: several sheets, wide rows, sparse cells."""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+from zipfile import ZipFile
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+
+import build_tournament  # noqa: E402
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def write_workbook(path: Path, sheets: Dict[str, str], shared_strings: List[str]) -> None:
+    """Minimal xlsx with the given `<sheetData>` bodies; the sheet files are numbered in reverse tab order."""
+    names = list(sheets)
+    with ZipFile(path, "w") as zf:
+        zf.writestr(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{MAIN}" xmlns:r="{DOC_REL}"><sheets>'
+            + "".join(f'<sheet name="{name}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i, name in enumerate(names))
+            + "</sheets></workbook>",
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            f'<Relationships xmlns="{PACKAGE_REL}">'
+            + "".join(
+                f'<Relationship Id="rId{i + 1}" Type="{DOC_REL}/worksheet" Target="worksheets/sheet{len(names) - i}.xml"/>'
+                for i in range(len(names))
+            )
+            + "</Relationships>",
+        )
+        zf.writestr(
+            "xl/sharedStrings.xml",
+            f'<sst xmlns="{MAIN}">' + "".join(f"<si><t>{text}</t></si>" for text in shared_strings) + "</sst>",
+        )
+        for i, name in enumerate(names):
+            zf.writestr(
+                f"xl/worksheets/sheet{len(names) - i}.xml",
+                f'<worksheet xmlns="{MAIN}"><sheetData>{sheets[name]}</sheetData></worksheet>',
+            )
+
+
+def test_column_letters_decode():
+    assert [build_tournament.column_index(ref) for ref in ("A", "F", "Z", "AA", "AZ", "XFD")] == [0, 5, 25, 26, 51, 16383]
+
+
+def test_reads_every_sheet_in_tab_order_with_wide_and_sparse_rows():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "schedule.xlsx"
+        write_workbook(
+            path,
+            {
+                "Fredag": (
+                    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="C1"><v>7</v></c></row>'
+                    '<row r="3"><c r="B3" t="inlineStr"><is><r><t>Hal</t></r><r><t>l A </t></r></is></c>'
+                    '<c r="AB3" t="s"><v>1</v></c></row>'
+                ),
+                "Lørdag": '<row r="1"><c t="s"><v>1</v></c><c><v>0.75</v></c></row>',
+            },
+            ["Fredag 25.04.25", "Elverum"],
+        )
+        sheets = [(name, list(rows)) for name, rows in build_tournament.iter_sheets(path)]
+        assert [name for name, _ in sheets] == ["Fredag", "Lørdag"]
+        fredag, lordag = (rows for _, rows in sheets)
+        assert fredag[0] == ["Fredag 25.04.25", "", "7", "", "", ""]
+        assert len(fredag[1]) == 28 and fredag[1][1] == "Hall A" and fredag[1][27] == "Elverum"
+        assert lordag == [["Elverum", "0.75", "", "", "", ""]]
+        assert build_tournament.read_sheet(path, "Lørdag") == lordag
+
+
+def test_each_sheet_is_parsed_with_its_own_headings():
+    game = '<c r="A{0}"><v>0.75</v></c>' + "".join(
+        f'<c r="{col}{{0}}" t="inlineStr"><is><t>{text}</t></is></c>'
+        for col, text in zip("BCEF", ("EYC - Jenter 12 år", "K1", "Elverum", "Gjøvik HK"))
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "schedule.xlsx"
+        write_workbook(
+            path,
+            {
+                "Hall 1": '<row r="1"><c r="A1" t="s"><v>0</v></c></row><row r="2"><c r="A2" t="s"><v>1</v></c></row>'
+                + f'<row r="3">{game.format(3)}</row>',
+                # No headings: the day and hall from the first sheet must not leak into this one.
+                "Notes": f'<row r="1">{game.format(1)}</row>',
+            },
+            ["Fredag 25.04.25", "Elverumshallen"],
+        )
+        games = [game for _, rows in build_tournament.iter_sheets(path) for game in build_tournament.parse_schedule(rows)]
+    assert [(game["day_iso"], game["hall"], game["time"], game["home"]) for game in games] == [
+        ("2025-04-25", "Elverumshallen", "18:00", "Elverum")
+    ]
+
+
+if __name__ == "__main__":
+    test_column_letters_decode()
+    test_reads_every_sheet_in_tab_order_with_wide_and_sparse_rows()
+    test_each_sheet_is_parsed_with_its_own_headings()